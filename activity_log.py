@@ -0,0 +1,413 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_LOG_FILE = "admin_activity.jsonl"
+LEGACY_LOG_FILE = "admin_activity.json"
+
+# Rotate once the active file reaches this size or its oldest entry this age
+MAX_LOG_BYTES = int(os.environ.get('ACTIVITY_LOG_MAX_BYTES', 5 * 1024 * 1024))
+MAX_LOG_AGE_DAYS = float(os.environ.get('ACTIVITY_LOG_MAX_AGE_DAYS', 30))
+BACKUP_COUNT = int(os.environ.get('ACTIVITY_LOG_BACKUP_COUNT', 5))
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def _reverse_lines(path, chunk_size=READ_CHUNK_SIZE):
+    """Yield the lines of a file last-first, reading it backwards in chunks"""
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return
+    with f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b''
+        while position > 0:
+            step = min(chunk_size, position)
+            position -= step
+            f.seek(position)
+            lines = (f.read(step) + remainder).split(b'\n')
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                if line.strip():
+                    yield line
+        if remainder.strip():
+            yield remainder
+
+
+def _parse(line):
+    try:
+        return json.loads(line)
+    except ValueError:
+        logger.warning("Skipping unreadable activity log line")
+        return None
+
+
+class ActivityLog:
+    """Append-only JSON Lines activity log with size and age based rotation.
+
+    Each entry is one line appended with a single write, so logging never
+    reads or rewrites earlier entries. The active file rolls over to
+    path.1 ... path.N (oldest dropped) and readers stream entries newest
+    first across the active and rotated files.
+    """
+
+    def __init__(self, path=ACTIVITY_LOG_FILE, max_bytes=MAX_LOG_BYTES, max_age_days=MAX_LOG_AGE_DAYS,
+                 backup_count=BACKUP_COUNT, legacy_file=LEGACY_LOG_FILE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = timedelta(days=max_age_days) if max_age_days else None
+        self.backup_count = backup_count
+        self._lock = threading.Lock()
+        self._started_at = None  # timestamp of the active file's first entry
+        self._listeners = []
+        if legacy_file:
+            self._migrate_legacy(legacy_file)
+
+    def _migrate_legacy(self, legacy_file):
+        """Copy entries from the old JSON array log the first time the JSONL log is used"""
+        if os.path.exists(self.path) or not os.path.exists(legacy_file):
+            return
+        try:
+            with open(legacy_file, 'r') as f:
+                entries = json.load(f)
+        except Exception as e:
+            logger.warning(f"Could not migrate {legacy_file}: {e}")
+            return
+        with open(self.path, 'a') as f:
+            f.writelines(json.dumps(entry) + '\n' for entry in entries)
+        logger.info(f"Migrated {len(entries)} activity log entries from {legacy_file}")
+
+    def subscribe(self, callback):
+        """Call callback() after the log is cleared"""
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def files(self):
+        """Active file followed by rotated files, newest first"""
+        return [self.path] + [f"{self.path}.{n}" for n in range(1, self.backup_count + 1)]
+
+    def _first_timestamp(self):
+        if self._started_at is None:
+            try:
+                with open(self.path, 'r') as f:
+                    entry = _parse(f.readline())
+                self._started_at = datetime.fromisoformat(entry['timestamp'])
+            except Exception:
+                return None
+        return self._started_at
+
+    def _should_rotate(self, now):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return False
+        if size == 0:
+            return False
+        if self.max_bytes and size >= self.max_bytes:
+            return True
+        started_at = self._first_timestamp()
+        return bool(self.max_age and started_at and now - started_at >= self.max_age)
+
+    def rotate(self):
+        """Roll the active file over to path.1, dropping the oldest backup"""
+        with self._lock:
+            self._rotate_locked()
+
+    def _rotate_locked(self):
+        files = self.files()
+        if self.backup_count < 1:
+            open(self.path, 'w').close()
+        else:
+            if os.path.exists(files[-1]):
+                os.remove(files[-1])
+            for newer, older in zip(reversed(files[:-1]), reversed(files[1:])):
+                if os.path.exists(newer):
+                    os.replace(newer, older)
+        self._started_at = None
+        logger.info(f"Rotated activity log {self.path}")
+
+    def append(self, entry):
+        """Append one entry (a JSON-serializable dict with an ISO 'timestamp')"""
+        entry.setdefault('timestamp', datetime.now().isoformat())
+        line = json.dumps(entry, default=str) + '\n'
+        with self._lock:
+            if self._should_rotate(datetime.now()):
+                self._rotate_locked()
+            with open(self.path, 'a') as f:
+                f.write(line)
+            if self._started_at is None:
+                self._started_at = datetime.fromisoformat(entry['timestamp'])
+
+    def iter_entries(self):
+        """Stream every entry newest first without loading whole files"""
+        for path in self.files():
+            for line in _reverse_lines(path):
+                entry = _parse(line)
+                if entry is not None:
+                    yield entry
+
+    def tail(self, limit=50, offset=0, action=None, admin_email=None):
+        """Newest-first page of entries, optionally filtered by action and admin"""
+        page = []
+        skipped = 0
+        for entry in self.iter_entries():
+            if action and entry.get('action') != action:
+                continue
+            if admin_email and entry.get('admin_email') != admin_email:
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            page.append(entry)
+            if len(page) >= limit:
+                break
+        return page
+
+    def clear(self):
+        """Empty the active log and delete the rotated files"""
+        with self._lock:
+            # The (empty) active file stays so the legacy log is not migrated again
+            open(self.path, 'w').close()
+            for path in self.files()[1:]:
+                if os.path.exists(path):
+                    os.remove(path)
+            self._started_at = None
+        for callback in list(self._listeners):
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Activity log listener failed on clear: {e}")
+
+
+class ActivityIndex:
+    """SQLite sidecar index over an ActivityLog for filtered, paged queries.
+
+    The JSONL files stay the source of truth. Before each query the index
+    reads only the bytes appended since the last sync (following the active
+    file across rotations by inode), so queries never scan the history.
+    Entries are indexed by timestamp, action and admin email.
+    """
+
+    def __init__(self, log, db_file=None):
+        self.log = log
+        self.db_file = db_file or os.path.splitext(log.path)[0] + '_index.db'
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._init_schema()
+        # Truncating keeps the inode, so a sync can't always tell the log was cleared
+        log.subscribe(self.reset)
+
+    def _connect(self):
+        """Return this thread's connection (sqlite3 connections are per-thread)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    ts REAL,
+                    action TEXT,
+                    admin_email TEXT,
+                    entry TEXT
+                )
+            """)
+            conn.execute("CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value INTEGER)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_ts ON entries (ts)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_action_ts ON entries (action, ts)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_admin_ts ON entries (admin_email, ts)")
+
+    def _state(self, conn):
+        state = dict(conn.execute("SELECT key, value FROM sync_state").fetchall())
+        return state.get('inode'), state.get('offset', 0)
+
+    def _index_file(self, conn, path, offset=0):
+        """Index complete lines of path from offset, returning the offset after them"""
+        try:
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return offset
+        # A writer may be mid-line; leave the partial line for the next sync
+        end = data.rfind(b'\n') + 1
+        rows = []
+        for line in data[:end].split(b'\n'):
+            entry = _parse(line) if line.strip() else None
+            if entry is None:
+                continue
+            try:
+                ts = datetime.fromisoformat(entry['timestamp']).timestamp()
+            except Exception:
+                continue
+            rows.append((ts, entry.get('action'), entry.get('admin_email'), json.dumps(entry)))
+        conn.executemany("INSERT INTO entries (ts, action, admin_email, entry) VALUES (?, ?, ?, ?)", rows)
+        return offset + end
+
+    def _rebuild(self, conn):
+        conn.execute("DELETE FROM entries")
+        for path in reversed(self.log.files()[1:]):
+            self._index_file(conn, path)
+
+    def _prune(self, conn):
+        """Drop index rows older than the oldest entry still on disk"""
+        for path in reversed(self.log.files()):
+            try:
+                with open(path, 'r') as f:
+                    entry = _parse(f.readline())
+                oldest = datetime.fromisoformat(entry['timestamp']).timestamp()
+            except Exception:
+                continue
+            conn.execute("DELETE FROM entries WHERE ts < ?", (oldest,))
+            return
+
+    def reset(self):
+        """Drop every indexed entry; the next sync rebuilds from the files on disk"""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM entries")
+                conn.execute("DELETE FROM sync_state")
+
+    def sync(self):
+        """Index entries appended (or rotated) since the last sync"""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                inode, offset = self._state(conn)
+                try:
+                    active = os.stat(self.log.path)
+                except OSError:
+                    active = None
+
+                if inode is None or active is None or (active.st_ino == inode and active.st_size < offset):
+                    # First run, or the log was cleared or replaced
+                    self._rebuild(conn)
+                    offset = 0
+                elif active.st_ino != inode:
+                    # The file we were reading was rotated; finish it, then index anything rotated after it
+                    backups = self.log.files()[1:]
+                    inodes = [os.stat(path).st_ino if os.path.exists(path) else None for path in backups]
+                    if inode in inodes:
+                        position = inodes.index(inode)
+                        self._index_file(conn, backups[position], offset)
+                        for path in reversed(backups[:position]):
+                            self._index_file(conn, path)
+                    else:
+                        self._rebuild(conn)
+                    self._prune(conn)
+                    offset = 0
+
+                if active is not None:
+                    offset = self._index_file(conn, self.log.path, offset)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)",
+                    [('inode', active.st_ino if active else None), ('offset', offset)]
+                )
+
+    def _where(self, action=None, admin_email=None, since=None, until=None):
+        clauses, params = [], []
+        if action:
+            clauses.append("action = ?")
+            params.append(action)
+        if admin_email:
+            clauses.append("admin_email = ?")
+            params.append(admin_email)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since.timestamp())
+        if until is not None:
+            clauses.append("ts <= ?")
+            params.append(until.timestamp())
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, limit=50, offset=0, action=None, admin_email=None, since=None, until=None):
+        """Newest-first page of entries matching the filters"""
+        self.sync()
+        where, params = self._where(action, admin_email, since, until)
+        rows = self._connect().execute(
+            f"SELECT entry FROM entries{where} ORDER BY ts DESC, rowid DESC LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def count(self, action=None, admin_email=None, since=None, until=None):
+        """Number of entries matching the filters"""
+        self.sync()
+        where, params = self._where(action, admin_email, since, until)
+        return self._connect().execute(f"SELECT COUNT(*) FROM entries{where}", params).fetchone()[0]
+
+    def counts_by(self, column, since=None, until=None):
+        """{value: count} for 'action' or 'admin_email', most frequent first"""
+        if column not in ('action', 'admin_email'):
+            raise ValueError(f"Cannot group activity by {column}")
+        self.sync()
+        where, params = self._where(since=since, until=until)
+        rows = self._connect().execute(
+            f"SELECT {column}, COUNT(*) FROM entries{where} GROUP BY {column} ORDER BY COUNT(*) DESC, {column}",
+            params
+        ).fetchall()
+        return {value or '': count for value, count in rows}
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_activity_log():
+    """Get the process-wide activity log"""
+    global _log
+    if _log is None:
+        with _log_lock:
+            if _log is None:
+                _log = ActivityLog()
+    return _log
+
+
+_index = None
+
+
+def get_activity_index():
+    """Get the process-wide index over the activity log"""
+    global _index
+    if _index is None:
+        log = get_activity_log()
+        with _log_lock:
+            if _index is None:
+                _index = ActivityIndex(log)
+    return _index
+
+
+def append_activity(entry):
+    """Convenience function to append an entry to the activity log"""
+    get_activity_log().append(entry)
+
+
+def tail_activity(limit=50, offset=0, action=None, admin_email=None):
+    """Convenience function to page through the activity log, newest first"""
+    return get_activity_log().tail(limit, offset, action, admin_email)
+
+
+def query_activity(limit=50, offset=0, action=None, admin_email=None, since=None, until=None):
+    """Convenience function for an indexed, newest-first page of activity"""
+    return get_activity_index().query(limit, offset, action, admin_email, since, until)
+
+
+def count_activity(action=None, admin_email=None, since=None, until=None):
+    """Convenience function to count matching activity entries"""
+    return get_activity_index().count(action, admin_email, since, until)
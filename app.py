@@ -1,21 +1,22 @@
 import streamlit as st
 import pandas as pd
-import smtplib
-import ssl
 from email.mime.text import MIMEText
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import os
-import json
-import uuid
 import logging
-import time
 
 # Import our custom modules
 from auth import (
     require_admin_login, show_admin_management, get_current_admin, get_current_user_info,
     is_admin_logged_in, is_user_logged_in, show_login_page, get_current_user
 )
-from scheduler_manager import schedule_reminder, cancel_reminder, get_scheduled_jobs, reschedule_all_reminders
+from scheduler_manager import schedule_reminder, cancel_reminder, get_scheduled_count, reschedule_all_reminders
+from streamlit_cloud_scheduler import get_cloud_scheduler, show_cloud_scheduler_status, initialize_cloud_scheduler
+import file_cache
+import outbox
+import reminder_store
+import send_stats
+from smtp_pool import get_smtp_pool
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -56,45 +57,40 @@ if 'scheduler_initialized' not in st.session_state:
     st.session_state.scheduler_initialized = True
 
 def load_email_config():
-    """Load email configuration from file"""
-    if os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, 'r') as f:
-            return json.load(f)
-    return {}
+    """Load email configuration from file (re-read only when the file changes)"""
+    return file_cache.load_json(CONFIG_FILE, default={})
 
 def save_email_config(config):
     """Save email configuration to file"""
-    with open(CONFIG_FILE, 'w') as f:
-        json.dump(config, f, indent=2)
+    file_cache.save_json(CONFIG_FILE, config)
 
 def load_reminders():
-    """Load reminders from Excel file"""
+    """Load reminders from the reminder store, reusing the last read until a write or file change"""
     try:
-        if os.path.exists(EXCEL_FILE):
-            df = pd.read_excel(EXCEL_FILE, sheet_name="Reminders")
-            # Add ID column if it doesn't exist
-            if 'ID' not in df.columns:
-                df['ID'] = [str(uuid.uuid4()) for _ in range(len(df))]
-                save_reminders(df)
-            return df
-        else:
-            # Create empty DataFrame with required columns
-            columns = ['ID', 'Name', 'Email', 'Header Name', 'Due Date', 'Due Time', 'Message', 'Status', 'Last Sent']
-            return pd.DataFrame(columns=columns)
+        return reminder_store.load_reminders_cached()
     except Exception as e:
         st.error(f"Error loading reminders: {str(e)}")
         return pd.DataFrame()
 
 def save_reminders(df):
-    """Save reminders to Excel file"""
+    """Replace all reminders in the reminder store"""
     try:
-        with pd.ExcelWriter(EXCEL_FILE, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name="Reminders", index=False)
-        return True
+        return reminder_store.save_reminders(df)
     except Exception as e:
         st.error(f"Error saving reminders: {str(e)}")
         return False
 
+def mark_reminder_sent(reminder_id):
+    """Record the Last Sent timestamp for a single reminder"""
+    try:
+        return reminder_store.update_reminder(reminder_id, {
+            'Last Sent': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'Send State': reminder_store.SEND_SENT
+        })
+    except Exception as e:
+        logger.error(f"Error updating reminder {reminder_id}: {str(e)}")
+        return False
+
 def send_email(recipient, subject, body, sender_email=None, app_password=None):
     """Enhanced email sending with multiple SMTP configurations for better external email support"""
     try:
@@ -110,64 +106,36 @@ def send_email(recipient, subject, body, sender_email=None, app_password=None):
             sender_email = default_account["email"]
             app_password = default_account["password"]
 
-        msg = MIMEText(body)
-        msg['Subject'] = subject
-        msg['From'] = sender_email
-        msg['To'] = recipient
-
-        # Try multiple SMTP configurations for better compatibility
-        smtp_configs = [
-            {'host': 'smtp.gmail.com', 'port': 587, 'use_tls': True},  # TLS - better for external emails
-            {'host': 'smtp.gmail.com', 'port': 465, 'use_ssl': True}   # SSL - fallback
-        ]
-
-        last_error = None
-        for config in smtp_configs:
-            try:
-                if config.get('use_ssl'):
-                    # SSL connection
-                    context = ssl.create_default_context()
-                    server = smtplib.SMTP_SSL(config['host'], config['port'], context=context)
-                else:
-                    # TLS connection
-                    server = smtplib.SMTP(config['host'], config['port'])
-                    if config.get('use_tls'):
-                        server.starttls()
-
-                # Login and send
-                server.login(sender_email, app_password)
-                server.sendmail(sender_email, recipient, msg.as_string())
-                server.quit()
-
-                # Update email usage statistics
-                try:
-                    from auth import load_email_accounts, save_email_accounts
-                    accounts = load_email_accounts()
-                    if sender_email in accounts:
-                        accounts[sender_email]["total_sent"] = accounts[sender_email].get("total_sent", 0) + 1
-                        accounts[sender_email]["last_used"] = datetime.now().isoformat()
-                        save_email_accounts(accounts)
-                except:
-                    pass  # Don't fail email sending if stats update fails
-
-                return True
+        try:
+            deliver_email(recipient, subject, body, sender_email, app_password)
+        except Exception as e:
+            st.error(f"Error sending email to {recipient}: {e}")
+            return False
 
-            except Exception as e:
-                last_error = e
-                try:
-                    server.quit()
-                except:
-                    pass
-                continue
-
-        # If all configurations failed, show the last error
-        st.error(f"Error sending email to {recipient}: {last_error}")
-        return False
+        return True
 
     except Exception as e:
         st.error(f"Error sending email: {str(e)}")
         return False
 
+def deliver_email(recipient, subject, body, sender_email, app_password):
+    """Send one email and update usage statistics; raises on failure (safe to call from worker threads)"""
+    msg = MIMEText(body)
+    msg['Subject'] = subject
+    msg['From'] = sender_email
+    msg['To'] = recipient
+
+    # Pooled connection - tries TLS (587) then SSL (465) and reuses the login
+    get_smtp_pool().send_message(sender_email, app_password, recipient, msg)
+
+    # Update email usage statistics (buffered in memory, flushed to email_accounts.json periodically)
+    try:
+        send_stats.record_send(sender_email)
+    except:
+        pass  # Don't fail email sending if stats update fails
+
+    return True
+
 def check_and_send_reminders():
     """Check for due reminders and send them"""
     # Check if email accounts are configured in admin management
@@ -201,32 +169,26 @@ def check_and_send_reminders():
     if df.empty:
         return "No reminders found"
 
-    today = datetime.today().date()
-    current_time = datetime.now().time()
-    sent_count = 0
-
-    for index, row in df.iterrows():
-        if pd.notna(row['Due Date']):
-            due_date = pd.to_datetime(row['Due Date']).date()
-            due_time = pd.to_datetime(row.get('Due Time', '09:00')).time() if pd.notna(row.get('Due Time')) else datetime.strptime('09:00', '%H:%M').time()
-
-            if due_date == today and current_time >= due_time and row.get('Status', 'Active') == 'Active':
-                try:
-                    # Safely get header name with fallback for old data
-                    header_name = row.get('Header Name', row.get('Agreement Name', 'Reminder'))
+    # Active, unsent reminders due earlier today
+    now = datetime.now()
+    start_of_day = datetime.combine(now.date(), datetime.min.time())
+    due_rows = reminder_store.select_due_reminders(df, until=now, since=start_of_day).to_dict('records')
 
-                    subject = f"Reminder - {header_name}"
-                    body = f"Dear {row['Name']},\n\n{row['Message']}\n\nRegards,\nAccounts Team"
+    # Claim and queue every due reminder in one transaction so reruns and other schedulers skip them
+    outbox_ids = outbox.enqueue_reminders(due_rows, sender_email)
 
-                    if send_email(row['Email'], subject, body, sender_email, app_password):
-                        df.at[index, 'Last Sent'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        sent_count += 1
-                except Exception as e:
-                    logger.error(f"Error processing reminder {row.get('ID', 'unknown')}: {str(e)}")
+    def send_one(message):
+        deliver_email(message['recipient'], message['subject'], message['body'], sender_email, app_password)
+        return True
 
-    if sent_count > 0:
-        save_reminders(df)
+    # Send concurrently, rate limited per sender account; failures are retried from the outbox
+    results = outbox.drain_outbox(send_one, ids=outbox_ids) if outbox_ids else {}
 
+    sent_count = len([ok for ok in results.values() if ok])
+    failed_count = len(results) - sent_count
+    if failed_count:
+        logger.error(f"{failed_count} reminders failed to send and were queued for retry")
+        return f"Sent {sent_count} reminders ({failed_count} failed, will be retried automatically)"
     return f"Sent {sent_count} reminders"
 
 def send_selected_reminders(selected_ids):
@@ -235,7 +197,6 @@ def send_selected_reminders(selected_ids):
     try:
         import base64
         from auth import get_default_email_account
-from streamlit_cloud_scheduler import get_cloud_scheduler, show_cloud_scheduler_status, initialize_cloud_scheduler
         default_account = get_default_email_account()
         if not default_account:
             return "No email account configured in Admin Management"
@@ -259,15 +220,11 @@ from streamlit_cloud_scheduler import get_cloud_scheduler, show_cloud_scheduler_
         sender_email = config['sender_email']
         app_password = config['app_password']
 
-    df = load_reminders()
-    if df.empty:
-        return "No reminders found"
-
     sent_count = 0
     failed_count = 0
 
     for reminder_id in selected_ids:
-        row = df[df['ID'] == reminder_id].iloc[0] if not df[df['ID'] == reminder_id].empty else None
+        row = reminder_store.get_reminder(reminder_id)
         if row is not None:
             try:
                 # Safely get header name with fallback for old data
@@ -277,7 +234,7 @@ from streamlit_cloud_scheduler import get_cloud_scheduler, show_cloud_scheduler_
                 body = f"Dear {row['Name']},\n\n{row['Message']}\n\nRegards,\nAccounts Team"
 
                 if send_email(row['Email'], subject, body, sender_email, app_password):
-                    df.loc[df['ID'] == reminder_id, 'Last Sent'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    mark_reminder_sent(reminder_id)
                     sent_count += 1
                 else:
                     failed_count += 1
@@ -285,68 +242,53 @@ from streamlit_cloud_scheduler import get_cloud_scheduler, show_cloud_scheduler_
                 logger.error(f"Error processing reminder {reminder_id}: {str(e)}")
                 failed_count += 1
 
-    if sent_count > 0:
-        save_reminders(df)
+    if sent_count == 0 and failed_count == 0:
+        return "No reminders found"
 
     return f"Sent {sent_count} reminders, {failed_count} failed"
 
 def delete_selected_reminders(selected_ids):
     """Delete selected reminders"""
-    df = load_reminders()
-    if df.empty:
-        return "No reminders found"
-
-    initial_count = len(df)
-
     # Cancel scheduled jobs for deleted reminders
     for reminder_id in selected_ids:
         cancel_reminder(reminder_id)
         logger.info(f"Cancelled scheduled job for deleted reminder {reminder_id}")
 
-    df = df[~df['ID'].isin(selected_ids)]
-    deleted_count = initial_count - len(df)
+    deleted_count = reminder_store.delete_reminders(selected_ids)
 
     if deleted_count > 0:
-        save_reminders(df)
-        st.session_state.reminders_df = df
+        st.session_state.reminders_df = load_reminders()
 
     return f"Deleted {deleted_count} reminders"
 
 def update_reminder(reminder_id, updated_data):
     """Update a specific reminder"""
-    df = load_reminders()
-    if df.empty or reminder_id not in df['ID'].values:
+    old_row = reminder_store.get_reminder(reminder_id)
+    if old_row is None:
         return False
 
     # Get old data for comparison
-    old_row = df[df['ID'] == reminder_id].iloc[0]
     old_due_date = old_row['Due Date']
-    old_due_time = old_row.get('Due Time', '09:00')
-    old_status = old_row.get('Status', 'Active')
+    old_due_time = old_row.get('Due Time') or '09:00'
+    old_status = old_row.get('Status') or 'Active'
 
-    # Update the data
-    for key, value in updated_data.items():
-        df.loc[df['ID'] == reminder_id, key] = value
-
-    if save_reminders(df):
-        st.session_state.reminders_df = df
+    if reminder_store.update_reminder(reminder_id, updated_data):
+        st.session_state.reminders_df = load_reminders()
 
         # Handle rescheduling if date, time, or status changed
         new_due_date = updated_data.get('Due Date', old_due_date)
         new_due_time = updated_data.get('Due Time', old_due_time)
         new_status = updated_data.get('Status', old_status)
+        new_timezone = updated_data.get('Timezone', old_row.get('Timezone'))
 
         # Cancel existing scheduled job
         cancel_reminder(reminder_id)
 
         # Reschedule if active and in the future
         if new_status == 'Active':
-            if isinstance(new_due_date, str):
-                new_due_date = datetime.strptime(new_due_date, '%Y-%m-%d').date()
-
-            scheduled_datetime = datetime.combine(new_due_date, datetime.strptime(new_due_time, '%H:%M').time())
-            if scheduled_datetime > datetime.now():
-                schedule_reminder(reminder_id, new_due_date, new_due_time)
+            scheduled_datetime = reminder_store.scheduled_at_for(new_due_date, new_due_time, new_timezone)
+            if scheduled_datetime and scheduled_datetime > datetime.now(timezone.utc):
+                schedule_reminder(reminder_id, new_due_date, new_due_time, new_timezone)
                 logger.info(f"Rescheduled reminder {reminder_id} for {scheduled_datetime}")
 
         return True
@@ -409,16 +351,15 @@ else:
 st.session_state.reminders_df = load_reminders()
 st.session_state.email_config = load_email_config()
 
-# Main content based on selected page
-if page == "🏠 Dashboard":
-    
 def setup_cloud_scheduler():
     """Setup cloud scheduler for automatic emails"""
     if 'cloud_scheduler_setup' not in st.session_state:
         st.session_state.cloud_scheduler_setup = True
         initialize_cloud_scheduler()
 
-st.title("🏠 Enhanced Reminder Dashboard")
+# Main content based on selected page
+if page == "🏠 Dashboard":
+    st.title("🏠 Enhanced Reminder Dashboard")
 
     # Get current user info
     user_info = get_current_user_info()
@@ -477,9 +418,9 @@ st.title("🏠 Enhanced Reminder Dashboard")
         st.metric("📆 This Week", upcoming)
 
     with col5:
-        # Get scheduled jobs count
-        jobs = get_scheduled_jobs()
-        st.metric("⏰ Scheduled", len(jobs))
+        # Reminders still waiting to be sent
+        scheduled_count = get_scheduled_count()
+        st.metric("⏰ Scheduled", scheduled_count)
 
     # System status indicators
     st.subheader("🔧 System Status")
@@ -495,8 +436,8 @@ st.title("🏠 Enhanced Reminder Dashboard")
         else:
             st.warning("⚠️ Email Setup Needed")
     with col_status4:
-        if len(jobs) > 0:
-            st.info(f"⏰ {len(jobs)} Jobs Queued")
+        if scheduled_count > 0:
+            st.info(f"⏰ {scheduled_count} Reminders Queued")
         else:
             st.info("⏰ No Jobs Scheduled")
 
@@ -547,36 +488,61 @@ elif page == "🔧 Scheduler Status":
         
         # Show reminders summary
         try:
-            df = pd.read_excel('payment_reminders.xlsx', sheet_name='Reminders')
+            df = load_reminders()
             active_reminders = df[df.get('Status', 'Active') == 'Active']
             st.metric("📋 Active Reminders", len(active_reminders))
             
             # Show next few due reminders
-            now = datetime.now()
-            upcoming = []
-            for _, row in active_reminders.iterrows():
-                try:
-                    due_date = pd.to_datetime(row['Due Date']).date()
-                    due_time = datetime.strptime(row.get('Due Time', '09:00'), '%H:%M').time()
-                    scheduled_datetime = datetime.combine(due_date, due_time)
-                    
-                    if scheduled_datetime > now and (pd.isna(row.get('Last Sent', '')) or row.get('Last Sent', '') == ''):
-                        upcoming.append({
-                            'name': row['Name'],
-                            'email': row['Email'],
-                            'time': scheduled_datetime
-                        })
-                except:
-                    continue
+            upcoming = reminder_store.select_due_reminders(df, since=datetime.now()).head(5)
             
-            upcoming.sort(key=lambda x: x['time'])
-            
-            if upcoming:
+            if not upcoming.empty:
                 st.subheader("📅 Upcoming Reminders")
-                for reminder in upcoming[:5]:
-                    st.info(f"📧 {reminder['name']} ({reminder['email']}) - {reminder['time'].strftime('%Y-%m-%d %H:%M')}")
+                for reminder in upcoming.to_dict('records'):
+                    st.info(f"📧 {reminder['Name']} ({reminder['Email']}) - {reminder['Scheduled At'].strftime('%Y-%m-%d %H:%M')}")
             
         except Exception as e:
             st.error(f"Error loading reminders: {e}")
+        
+        # Outbox: retries in flight and messages that ran out of attempts
+        try:
+            st.subheader("📮 Send Outbox")
+            counts = reminder_store.outbox_counts()
+            col_outbox1, col_outbox2, col_outbox3 = st.columns(3)
+            with col_outbox1:
+                st.metric("⏳ Queued / Retrying", counts.get(reminder_store.OUTBOX_QUEUED, 0))
+            with col_outbox2:
+                st.metric("📤 Delivering", counts.get(reminder_store.OUTBOX_DELIVERING, 0))
+            with col_outbox3:
+                st.metric("💀 Dead Letters", counts.get(reminder_store.OUTBOX_DEAD, 0))
+            st.caption(f"Failed sends are retried with backoff up to {outbox.MAX_ATTEMPTS} times before they become dead letters.")
+            
+            dead = reminder_store.dead_letters(limit=500)
+            if dead:
+                dead_df = pd.DataFrame(dead)
+                st.dataframe(dead_df[['id', 'recipient', 'subject', 'attempts', 'error', 'state_at']].rename(columns={
+                    'id': 'ID', 'recipient': 'Recipient', 'subject': 'Subject', 'attempts': 'Attempts',
+                    'error': 'Last Error', 'state_at': 'Failed At'
+                }), use_container_width=True)
+                
+                selected = st.multiselect(
+                    "Select dead letters to re-drive",
+                    options=[letter['id'] for letter in dead],
+                    format_func=lambda outbox_id: next(f"#{letter['id']} {letter['recipient']} - {letter['subject']}"
+                                                       for letter in dead if letter['id'] == outbox_id)
+                )
+                col_redrive1, col_redrive2 = st.columns(2)
+                with col_redrive1:
+                    if st.button("🔁 Re-drive Selected", disabled=not selected):
+                        requeued = outbox.redrive_dead_letters(selected)
+                        st.success(f"✅ Requeued {len(requeued)} of {len(selected)} messages; the scheduler will send them shortly")
+                with col_redrive2:
+                    if st.button("🔁 Re-drive All"):
+                        requeued = outbox.redrive_dead_letters()
+                        st.success(f"✅ Requeued {len(requeued)} messages; the scheduler will send them shortly")
+            else:
+                st.success("✅ No dead letters")
+            
+        except Exception as e:
+            st.error(f"Error loading outbox: {e}")
 
 
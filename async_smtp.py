@@ -0,0 +1,257 @@
+import asyncio
+import base64
+import logging
+import re
+import smtplib
+import ssl
+
+from smtp_pool import SMTP_CONFIGS, MAX_CONNECTIONS_PER_ACCOUNT, MAX_MESSAGES_PER_CONNECTION, CONNECT_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean the connection itself is unusable, not the message
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError)
+
+
+def _encode_data(data):
+    """Normalise line endings to CRLF and dot-stuff a message for DATA"""
+    data = re.sub(r'(?:\r\n|\n|\r(?!\n))', '\r\n', data)
+    data = re.sub(r'(?m)^\.', '..', data)
+    if not data.endswith('\r\n'):
+        data += '\r\n'
+    return (data + '.\r\n').encode('utf-8')
+
+
+class AsyncSMTPConnection:
+    """A single SMTP session driven by asyncio streams.
+
+    When the server advertises PIPELINING, MAIL/RCPT/DATA for a message are
+    written in one go and their replies read back together, so each message
+    costs two round trips instead of four or more.
+    """
+
+    def __init__(self, config, timeout=CONNECT_TIMEOUT):
+        self.config = config
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+        self.features = set()
+        self.auth_methods = set()
+        self.messages_sent = 0
+
+    async def _read_reply(self):
+        lines = []
+        while True:
+            line = await asyncio.wait_for(self.reader.readline(), self.timeout)
+            if not line:
+                raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+            line = line.decode('utf-8', errors='replace').rstrip('\r\n')
+            lines.append(line[4:])
+            if len(line) < 4 or line[3] != '-':
+                return int(line[:3]), '\n'.join(lines)
+
+    async def _write(self, data):
+        self.writer.write(data)
+        await asyncio.wait_for(self.writer.drain(), self.timeout)
+
+    async def command(self, line):
+        await self._write(f"{line}\r\n".encode('utf-8'))
+        return await self._read_reply()
+
+    async def ehlo(self):
+        code, text = await self.command("EHLO localhost")
+        if code != 250:
+            raise smtplib.SMTPHeloError(code, text)
+        self.features = {feature.split()[0].upper() for feature in text.split('\n')[1:] if feature}
+        self.auth_methods = set()
+        for feature in text.split('\n')[1:]:
+            if feature.upper().startswith('AUTH'):
+                self.auth_methods = set(feature.upper().split()[1:])
+
+    async def connect(self):
+        host, port = self.config['host'], self.config['port']
+        context = ssl.create_default_context() if self.config.get('use_ssl') else None
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=context), self.timeout)
+
+        code, text = await self._read_reply()
+        if code != 220:
+            raise smtplib.SMTPConnectError(code, text)
+        await self.ehlo()
+
+        if self.config.get('use_tls'):
+            code, text = await self.command("STARTTLS")
+            if code != 220:
+                raise smtplib.SMTPNotSupportedError(f"STARTTLS failed: {code} {text}")
+            await self.writer.start_tls(ssl.create_default_context(), server_hostname=host)
+            await self.ehlo()
+
+    async def login(self, username, password):
+        if 'PLAIN' in self.auth_methods or not self.auth_methods:
+            token = base64.b64encode(f"\0{username}\0{password}".encode('utf-8')).decode('ascii')
+            code, text = await self.command(f"AUTH PLAIN {token}")
+        else:
+            code, text = await self.command("AUTH LOGIN")
+            if code == 334:
+                code, text = await self.command(base64.b64encode(username.encode('utf-8')).decode('ascii'))
+            if code == 334:
+                code, text = await self.command(base64.b64encode(password.encode('utf-8')).decode('ascii'))
+        if code not in (235, 503):
+            raise smtplib.SMTPAuthenticationError(code, text)
+
+    async def _reset(self):
+        try:
+            await self.command("RSET")
+        except Exception:
+            pass
+
+    async def send(self, sender, recipients, data):
+        """Send one message, pipelining the envelope when the server allows it"""
+        envelope = [f"MAIL FROM:<{sender}>"] + [f"RCPT TO:<{r}>" for r in recipients] + ["DATA"]
+
+        if 'PIPELINING' in self.features:
+            await self._write(''.join(f"{line}\r\n" for line in envelope).encode('utf-8'))
+            replies = [await self._read_reply() for _ in envelope]
+        else:
+            replies = []
+            for line in envelope:
+                replies.append(await self.command(line))
+                if replies[-1][0] >= 400 and line.startswith('MAIL'):
+                    break
+
+        code, text = replies[0]
+        if code != 250:
+            if code == 421:
+                raise smtplib.SMTPServerDisconnected(f"{code} {text}")
+            await self._reset()
+            raise smtplib.SMTPSenderRefused(code, text, sender)
+
+        refused = {r: reply for r, reply in zip(recipients, replies[1:-1]) if reply[0] not in (250, 251)}
+        data_code, data_text = replies[-1] if len(replies) == len(envelope) else (503, "DATA not sent")
+
+        if data_code != 354:
+            await self._reset()
+            if len(refused) == len(recipients):
+                raise smtplib.SMTPRecipientsRefused(refused)
+            raise smtplib.SMTPDataError(data_code, data_text)
+
+        await self._write(_encode_data(data))
+        code, text = await self._read_reply()
+        if code == 421:
+            raise smtplib.SMTPServerDisconnected(f"{code} {text}")
+        if code != 250:
+            raise smtplib.SMTPDataError(code, text)
+        if len(refused) == len(recipients):
+            raise smtplib.SMTPRecipientsRefused(refused)
+
+        self.messages_sent += 1
+        return refused
+
+    async def close(self):
+        if self.writer is None:
+            return
+        try:
+            await asyncio.wait_for(self.command("QUIT"), 5)
+        except Exception:
+            pass
+        try:
+            self.writer.close()
+            await asyncio.wait_for(self.writer.wait_closed(), 5)
+        except Exception:
+            pass
+        self.writer = None
+
+
+async def _open_connection(smtp_configs, sender_email, app_password, preferred, timeout):
+    """Open and authenticate a session, trying each config starting from the last one that worked"""
+    start = preferred.get('index', 0)
+    order = smtp_configs[start:] + smtp_configs[:start]
+    last_error = None
+
+    for config in order:
+        conn = AsyncSMTPConnection(config, timeout=timeout)
+        try:
+            await conn.connect()
+            if app_password is not None:
+                await conn.login(sender_email, app_password)
+            preferred['index'] = smtp_configs.index(config)
+            logger.debug(f"Opened async SMTP connection for {sender_email} via {config['host']}:{config['port']}")
+            return conn
+        except Exception as e:
+            last_error = e
+            logger.warning(f"Failed to connect via {config['host']}:{config['port']}: {e}")
+            await conn.close()
+
+    raise last_error or smtplib.SMTPException("No SMTP configurations available")
+
+
+async def send_many(messages, sender_email, app_password, max_connections=MAX_CONNECTIONS_PER_ACCOUNT,
+                    smtp_configs=None, max_messages_per_connection=MAX_MESSAGES_PER_CONNECTION,
+                    timeout=CONNECT_TIMEOUT):
+    """Send many email.message.Message objects over a few authenticated connections.
+
+    Recipients are taken from each message's To header. Up to max_connections
+    sessions are opened and each one drains a shared queue, so a slow round
+    trip on one session never stalls the others. A session that drops is
+    reopened once per message.
+
+    Returns one {'item', 'success', 'error'} dict per message, in input order.
+    """
+    messages = list(messages)
+    results = [None] * len(messages)
+    if not messages:
+        return results
+
+    smtp_configs = smtp_configs or SMTP_CONFIGS
+    preferred = {}
+    queue = asyncio.Queue()
+    for index, msg in enumerate(messages):
+        queue.put_nowait(index)
+
+    async def worker():
+        conn = None
+        try:
+            while not queue.empty():
+                index = queue.get_nowait()
+                msg = messages[index]
+                recipients = [addr.strip() for addr in (msg['To'] or '').split(',') if addr.strip()]
+                error = None
+
+                for attempt in range(2):
+                    try:
+                        if conn is None:
+                            conn = await _open_connection(smtp_configs, sender_email, app_password, preferred, timeout)
+                        await conn.send(sender_email, recipients, msg.as_string())
+                        error = None
+                        break
+                    except CONNECTION_ERRORS as e:
+                        error = e
+                        if conn is not None:
+                            await conn.close()
+                            conn = None
+                        if attempt == 0:
+                            logger.warning(f"Async SMTP connection for {sender_email} dropped ({e}), reconnecting")
+                    except Exception as e:
+                        error = e
+                        break
+
+                results[index] = {'item': msg, 'success': error is None, 'error': None if error is None else str(error)}
+
+                if conn is not None and conn.messages_sent >= max_messages_per_connection:
+                    await conn.close()
+                    conn = None
+        finally:
+            if conn is not None:
+                await conn.close()
+
+    workers = min(max_connections, len(messages))
+    await asyncio.gather(*(worker() for _ in range(workers)))
+
+    failed = len([r for r in results if not r['success']])
+    logger.info(f"Async send finished {len(results)} messages ({failed} failed) over {workers} connections")
+    return results
+
+
+def send_many_sync(messages, sender_email, app_password, **kwargs):
+    """Blocking wrapper around send_many() for callers without an event loop"""
+    return asyncio.run(send_many(messages, sender_email, app_password, **kwargs))
@@ -1,7 +1,5 @@
 import streamlit as st
-import bcrypt
 import json
-import os
 from datetime import datetime, timedelta
 import uuid
 import time
@@ -9,10 +7,17 @@ import random
 import string
 import re
 import pandas as pd
+import copy
+
+from file_cache import FileCache
+import activity_log
+import password_hashing
+import login_state
+import send_stats
 
 # Constants
 ADMIN_FILE = "admin_credentials.json"
-ADMIN_LOGS_FILE = "admin_activity.json"
+ADMIN_LOGS_FILE = activity_log.ACTIVITY_LOG_FILE
 EMAIL_ACCOUNTS_FILE = "email_accounts.json"
 USER_ACCOUNTS_FILE = "user_accounts.json"
 
@@ -91,22 +96,50 @@ def check_password_strength(password):
         'feedback': feedback
     }
 
+def _read_registry(path):
+    """Parse an account file and index its records by lower-cased email"""
+    with open(path, 'r') as f:
+        accounts = json.load(f)
+    return {"accounts": accounts, "index": {email.lower(): email for email in accounts}}
+
+# Account files are parsed once and re-read only when they change on disk
+_registries = FileCache(_read_registry)
+
+def _registry(path):
+    """Shared (read-only) registry for an account file, or None if the file is missing"""
+    return _registries.get(path, copy_result=False)
+
+def _find_account(path, email):
+    """Copy of the record for email (case-insensitive) in an account file, or None"""
+    registry = _registry(path)
+    if registry is None or not email:
+        return None
+    key = registry["index"].get(email.lower())
+    return copy.deepcopy(registry["accounts"][key]) if key is not None else None
+
 def load_email_accounts():
     """Load email accounts from JSON file"""
-    if os.path.exists(EMAIL_ACCOUNTS_FILE):
-        try:
-            with open(EMAIL_ACCOUNTS_FILE, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error loading email accounts: {e}")
-            return {}
-    return {}
+    try:
+        registry = _registry(EMAIL_ACCOUNTS_FILE)
+        return copy.deepcopy(registry["accounts"]) if registry else {}
+    except Exception as e:
+        print(f"Error loading email accounts: {e}")
+        return {}
+
+def get_email_account(email):
+    """Look up a single email account without copying the whole registry"""
+    try:
+        return _find_account(EMAIL_ACCOUNTS_FILE, email)
+    except Exception as e:
+        print(f"Error loading email accounts: {e}")
+        return None
 
 def save_email_accounts(accounts):
     """Save email accounts to JSON file"""
     try:
         with open(EMAIL_ACCOUNTS_FILE, 'w') as f:
             json.dump(accounts, f, indent=4)
+        _registries.invalidate(EMAIL_ACCOUNTS_FILE)
         return True
     except Exception as e:
         print(f"Error saving email accounts: {e}")
@@ -230,10 +263,8 @@ def test_email_account(email, password):
     except Exception as e:
         return {"success": False, "message": f"Connection failed: {str(e)}"}
 
-def get_default_email_account():
-    """Get the default email account for sending"""
-    accounts = load_email_accounts()
-
+def _pick_default_sender(accounts):
+    """The default active account, else the first active one"""
     for email, data in accounts.items():
         if data.get("is_default") and data.get("status") == "active":
             return {
@@ -253,23 +284,48 @@ def get_default_email_account():
 
     return None
 
+def get_default_email_account():
+    """Get the default email account for sending (worked out once per version of the file)"""
+    try:
+        registry = _registry(EMAIL_ACCOUNTS_FILE)
+    except Exception as e:
+        print(f"Error loading email accounts: {e}")
+        return None
+    if registry is None:
+        return None
+
+    # Memoized on the cached registry, so it is recomputed whenever the file changes
+    if "default_sender" not in registry:
+        registry["default_sender"] = _pick_default_sender(registry["accounts"])
+    sender = registry["default_sender"]
+    return dict(sender) if sender else None
+
 # User Account Management Functions
 def load_user_accounts():
-    """Load user accounts from JSON file"""
-    if os.path.exists(USER_ACCOUNTS_FILE):
-        try:
-            with open(USER_ACCOUNTS_FILE, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error loading user accounts: {e}")
+    """Load user accounts from JSON file, with login attempts/locks/last login from the login state store"""
+    try:
+        registry = _registry(USER_ACCOUNTS_FILE)
+        if not registry:
             return {}
-    return {}
+        return login_state.get_login_state_store().overlay("user", copy.deepcopy(registry["accounts"]))
+    except Exception as e:
+        print(f"Error loading user accounts: {e}")
+        return {}
+
+def get_user_account(email):
+    """Look up a single user account without copying the whole registry"""
+    try:
+        return _find_account(USER_ACCOUNTS_FILE, email)
+    except Exception as e:
+        print(f"Error loading user accounts: {e}")
+        return None
 
 def save_user_accounts(accounts):
     """Save user accounts to JSON file"""
     try:
         with open(USER_ACCOUNTS_FILE, 'w') as f:
             json.dump(accounts, f, indent=4)
+        _registries.invalidate(USER_ACCOUNTS_FILE)
         return True
     except Exception as e:
         print(f"Error saving user accounts: {e}")
@@ -332,7 +388,7 @@ def create_user_account(email, password, confirm_password):
         return {"success": False, "message": "Email address already registered as admin"}
 
     # Create new user account
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    hashed_password = hash_password(password)
 
     user_accounts[email] = {
         "id": str(uuid.uuid4()),
@@ -356,53 +412,50 @@ def create_user_account(email, password, confirm_password):
 
 def authenticate_user(email, password):
     """Authenticate user credentials"""
-    user_accounts = load_user_accounts()
-
-    if email not in user_accounts:
+    registry = _registry(USER_ACCOUNTS_FILE)
+    if not registry or email not in registry["accounts"]:
         return {"success": False, "message": "Invalid email or password", "user": None}
 
-    user = user_accounts[email]
+    user = copy.deepcopy(registry["accounts"][email])
+    states = login_state.get_login_state_store()
+    state = states.get("user", email, fallback=user)
 
-    # Check if account is locked
-    if user.get("locked_until"):
-        locked_until = datetime.fromisoformat(user["locked_until"])
+    # Check if account is locked (an expired lock is cleared by the next attempt)
+    if state["locked_until"]:
+        locked_until = datetime.fromisoformat(state["locked_until"])
         if datetime.now() < locked_until:
             remaining = locked_until - datetime.now()
             minutes = int(remaining.total_seconds() / 60)
             return {"success": False, "message": f"Account locked for {minutes} more minutes", "user": None}
-        else:
-            # Unlock account
-            user["locked_until"] = None
-            user["login_attempts"] = 0
 
     # Check if account is active
     if user.get("status") != "active":
         return {"success": False, "message": "Account is deactivated. Contact administrator.", "user": None}
 
     # Verify password
-    if bcrypt.checkpw(password.encode('utf-8'), user["password"].encode('utf-8')):
-        # Successful login
-        user["last_login"] = datetime.now().isoformat()
-        user["login_attempts"] = 0
-        user["locked_until"] = None
-        save_user_accounts(user_accounts)
+    if verify_password(password, user["password"]):
+        # Successful login; upgrade hashes made at an old cost factor while we have the password
+        if password_hashing.needs_rehash(user["password"]):
+            user_accounts = load_user_accounts()
+            user_accounts[email]["password"] = password_hashing.get_password_hasher().rehash(password)
+            save_user_accounts(user_accounts)
+            user["password"] = user_accounts[email]["password"]
+
+        # Login bookkeeping lives in the login state store, not in user_accounts.json
+        user.update(states.record_success("user", email, fallback=user))
 
         log_admin_activity(email, "user_login_success", {"timestamp": datetime.now().isoformat()})
         return {"success": True, "message": "Login successful", "user": user}
     else:
-        # Failed login
-        user["login_attempts"] = user.get("login_attempts", 0) + 1
+        # Failed login; lock for 30 minutes after 5 attempts
+        state = states.record_failure("user", email, max_attempts=5, lock_for=timedelta(minutes=30), fallback=user)
 
-        if user["login_attempts"] >= 5:
-            # Lock account for 30 minutes
-            user["locked_until"] = (datetime.now() + timedelta(minutes=30)).isoformat()
-            save_user_accounts(user_accounts)
-            log_admin_activity(email, "user_account_locked", {"attempts": user["login_attempts"]})
+        if state["locked"]:
+            log_admin_activity(email, "user_account_locked", {"attempts": state["login_attempts"]})
             return {"success": False, "message": "Account locked due to too many failed attempts. Try again in 30 minutes.", "user": None}
 
-        save_user_accounts(user_accounts)
-        remaining_attempts = 5 - user["login_attempts"]
-        log_admin_activity(email, "user_login_failed", {"attempts": user["login_attempts"]})
+        remaining_attempts = max(0, 5 - state["login_attempts"])
+        log_admin_activity(email, "user_login_failed", {"attempts": state["login_attempts"]})
         return {"success": False, "message": f"Invalid email or password. {remaining_attempts} attempts remaining.", "user": None}
 
 def login_user(email, user_info):
@@ -434,9 +487,7 @@ def get_current_user():
 
 def get_current_user_info():
     """Get current user information"""
-    user_accounts = load_user_accounts()
-    email = get_current_user()
-    return user_accounts.get(email, {})
+    return get_user_account(get_current_user()) or {}
 
 def update_user_status(email, status, updated_by=""):
     """Update user account status (admin function)"""
@@ -465,26 +516,38 @@ def delete_user_account(email, deleted_by=""):
     del user_accounts[email]
 
     if save_user_accounts(user_accounts):
+        login_state.get_login_state_store().forget("user", email)
         log_admin_activity(deleted_by, "user_account_deleted", {"email": email})
         return {"success": True, "message": "User account deleted successfully"}
     else:
         return {"success": False, "message": "Failed to delete user account"}
 
 def hash_password(password: str) -> str:
-    """Hash a password using bcrypt"""
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
+    """Hash a password using bcrypt (BCRYPT_ROUNDS cost, off the calling thread)"""
+    return password_hashing.hash_password(password)
 
 def verify_password(password: str, hashed: str) -> bool:
     """Verify a password against its hash"""
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+    verified = password_hashing.verify_password(password, hashed)
+    if not verified:
+        password_hashing.get_password_hasher().record_failure()
+    return verified
 
 def load_admin_credentials():
     """Load admin credentials from file"""
-    if os.path.exists(ADMIN_FILE):
-        with open(ADMIN_FILE, 'r') as f:
-            return json.load(f)
+    registry = _registry(ADMIN_FILE)
+    if registry is not None:
+        credentials = copy.deepcopy(registry["accounts"])
+        # Manual locks keep their expiry in the credentials; only counters and last login are overlaid
+        for email, state in login_state.get_login_state_store().get_all("admin").items():
+            if email not in credentials:
+                continue
+            credentials[email]["login_attempts"] = state["login_attempts"]
+            credentials[email]["last_login"] = state["last_login"]
+            if state["locked_until"] and datetime.now() < datetime.fromisoformat(state["locked_until"]):
+                credentials[email]["status"] = "locked"
+                credentials[email]["locked_until"] = state["locked_until"]
+        return credentials
     else:
         # Create default primary admin if file doesn't exist
         admin_id = str(uuid.uuid4())
@@ -511,20 +574,21 @@ def load_admin_credentials():
         log_admin_activity("system", "admin_created", {"email": "admin@reminder.com", "role": "primary_admin"})
         return default_admin
 
+def get_admin_account(email):
+    """Look up a single admin without copying the whole registry"""
+    if _registry(ADMIN_FILE) is None:
+        load_admin_credentials()
+    return _find_account(ADMIN_FILE, email)
+
 def save_admin_credentials(credentials):
     """Save admin credentials to file"""
     with open(ADMIN_FILE, 'w') as f:
         json.dump(credentials, f, indent=2)
+    _registries.invalidate(ADMIN_FILE)
 
 def log_admin_activity(admin_email: str, action: str, details: dict = None):
     """Log admin activity"""
     try:
-        if os.path.exists(ADMIN_LOGS_FILE):
-            with open(ADMIN_LOGS_FILE, 'r') as f:
-                logs = json.load(f)
-        else:
-            logs = []
-
         log_entry = {
             "timestamp": datetime.now().isoformat(),
             "admin_email": admin_email,
@@ -534,28 +598,24 @@ def log_admin_activity(admin_email: str, action: str, details: dict = None):
             "session_id": st.session_state.get('session_id', 'unknown')
         }
 
-        logs.append(log_entry)
-
-        # Keep only last 1000 entries
-        if len(logs) > 1000:
-            logs = logs[-1000:]
-
-        with open(ADMIN_LOGS_FILE, 'w') as f:
-            json.dump(logs, f, indent=2)
+        # One appended line per entry; old entries are never re-read or rewritten
+        activity_log.append_activity(log_entry)
     except Exception as e:
         st.error(f"Error logging activity: {e}")
 
 def authenticate_admin(email: str, password: str) -> dict:
     """Authenticate admin credentials - returns dict with status and user info"""
-    credentials = load_admin_credentials()
+    registry = _registry(ADMIN_FILE)
+    credentials = registry["accounts"] if registry else load_admin_credentials()
 
     if email not in credentials:
         log_admin_activity(email, "login_failed", {"reason": "email_not_found"})
         return {"success": False, "message": "Invalid email or password", "user": None}
 
-    user = credentials[email]
+    user = copy.deepcopy(credentials[email])
+    states = login_state.get_login_state_store()
 
-    # Check if account is locked
+    # Check if account is locked by an admin
     if user.get("status") == "locked":
         locked_until = user.get("locked_until")
         if locked_until:
@@ -565,37 +625,46 @@ def authenticate_admin(email: str, password: str) -> dict:
                 return {"success": False, "message": "Account is locked. Contact administrator.", "user": None}
             else:
                 # Auto-unlock if lock period expired
-                user["status"] = "active"
-                user["locked_until"] = None
-                user["login_attempts"] = 0
+                credentials = load_admin_credentials()
+                credentials[email]["status"] = "active"
+                credentials[email]["locked_until"] = None
+                save_admin_credentials(credentials)
+                states.reset("admin", email)
+                user.update(status="active", locked_until=None, login_attempts=0)
         else:
             log_admin_activity(email, "login_failed", {"reason": "account_locked_permanent"})
             return {"success": False, "message": "Account is permanently locked. Contact administrator.", "user": None}
 
+    # Check if account is locked after failed attempts
+    state = states.get("admin", email, fallback=user)
+    if state["locked_until"] and datetime.now() < datetime.fromisoformat(state["locked_until"]):
+        log_admin_activity(email, "login_failed", {"reason": "account_locked"})
+        return {"success": False, "message": "Account locked due to multiple failed attempts. Try again in 1 hour.", "user": None}
+
     # Check password
     stored_hash = user["password_hash"]
     if verify_password(password, stored_hash):
-        # Successful login
-        user["last_login"] = datetime.now().isoformat()
-        user["login_attempts"] = 0
-        save_admin_credentials(credentials)
+        # Successful login; upgrade hashes made at an old cost factor while we have the password
+        if password_hashing.needs_rehash(stored_hash):
+            credentials = load_admin_credentials()
+            credentials[email]["password_hash"] = password_hashing.get_password_hasher().rehash(password)
+            save_admin_credentials(credentials)
+            user["password_hash"] = credentials[email]["password_hash"]
+
+        # Login bookkeeping lives in the login state store, not in admin_credentials.json
+        user.update(states.record_success("admin", email, fallback=user))
         log_admin_activity(email, "login_success", {"role": user.get("role", "admin")})
         return {"success": True, "message": "Login successful", "user": user}
     else:
-        # Failed login - increment attempts
-        user["login_attempts"] = user.get("login_attempts", 0) + 1
-
-        # Lock account after 5 failed attempts
-        if user["login_attempts"] >= 5:
-            user["status"] = "locked"
-            user["locked_until"] = (datetime.now() + timedelta(hours=1)).isoformat()
-            log_admin_activity(email, "account_auto_locked", {"attempts": user["login_attempts"]})
-            save_admin_credentials(credentials)
+        # Failed login - lock account for an hour after 5 failed attempts
+        state = states.record_failure("admin", email, max_attempts=5, lock_for=timedelta(hours=1), fallback=user)
+
+        if state["locked"]:
+            log_admin_activity(email, "account_auto_locked", {"attempts": state["login_attempts"]})
             return {"success": False, "message": "Account locked due to multiple failed attempts. Try again in 1 hour.", "user": None}
 
-        save_admin_credentials(credentials)
-        log_admin_activity(email, "login_failed", {"reason": "wrong_password", "attempts": user["login_attempts"]})
-        return {"success": False, "message": f"Invalid email or password. {5 - user['login_attempts']} attempts remaining.", "user": None}
+        log_admin_activity(email, "login_failed", {"reason": "wrong_password", "attempts": state["login_attempts"]})
+        return {"success": False, "message": f"Invalid email or password. {max(0, 5 - state['login_attempts'])} attempts remaining.", "user": None}
 
 def add_new_admin(email: str, password: str, role: str, current_admin_email: str) -> dict:
     """Add a new admin (only existing admins can do this)"""
@@ -681,6 +750,7 @@ def lock_unlock_user(target_email: str, action: str, current_admin_email: str, d
         target_user["status"] = "active"
         target_user["locked_until"] = None
         target_user["login_attempts"] = 0
+        login_state.get_login_state_store().reset("admin", target_email)
 
         log_admin_activity(current_admin_email, "user_unlocked", {"target_user": target_email})
         message = f"User {target_email} unlocked successfully"
@@ -721,6 +791,7 @@ def delete_admin(target_email: str, current_admin_email: str) -> dict:
 
     del credentials[target_email]
     save_admin_credentials(credentials)
+    login_state.get_login_state_store().forget("admin", target_email)
     log_admin_activity(current_admin_email, "admin_deleted", {"deleted_admin": target_email})
 
     return {"success": True, "message": f"Admin {target_email} deleted successfully"}
@@ -758,7 +829,9 @@ def change_admin_email(old_email: str, new_email: str, current_admin_email: str)
     credentials[new_email] = target_user
     del credentials[old_email]
 
+    # The saved record carries the login state over to the new address
     save_admin_credentials(credentials)
+    login_state.get_login_state_store().forget("admin", old_email)
     log_admin_activity(current_admin_email, "email_changed", {
         "old_email": old_email,
         "new_email": new_email
@@ -792,6 +865,7 @@ def change_admin_password(target_email: str, new_password: str, current_admin_em
     # Update password
     credentials[target_email]["password_hash"] = hash_password(new_password)
     credentials[target_email]["login_attempts"] = 0  # Reset failed attempts
+    login_state.get_login_state_store().reset("admin", target_email)
 
     save_admin_credentials(credentials)
     log_admin_activity(current_admin_email, "password_changed", {"target_email": target_email})
@@ -811,9 +885,7 @@ def get_current_user_info() -> dict:
     if not is_admin_logged_in():
         return {}
 
-    credentials = load_admin_credentials()
-    email = get_current_admin()
-    return credentials.get(email, {})
+    return get_admin_account(get_current_admin()) or {}
 
 def login_admin(email: str, user_info: dict):
     """Set admin as logged in"""
@@ -1227,6 +1299,7 @@ def show_admin_management():
                                 if st.button(f"🔄 Reset", key=f"reset_{email}", help="Reset failed login attempts"):
                                     credentials[email]['login_attempts'] = 0
                                     save_admin_credentials(credentials)
+                                    login_state.get_login_state_store().reset("admin", email)
                                     log_admin_activity(current_admin, "attempts_reset", {"target_user": email})
                                     st.success("Login attempts reset!")
                                     st.rerun()
@@ -1704,6 +1777,7 @@ def show_admin_management():
                                 # Unlock account by clearing lock and attempts
                                 user_accounts[action_user]["locked_until"] = None
                                 user_accounts[action_user]["login_attempts"] = 0
+                                login_state.get_login_state_store().reset("user", action_user)
                                 if save_user_accounts(user_accounts):
                                     log_admin_activity(current_admin, "user_account_unlocked", {"email": action_user})
                                     st.success("✅ Account unlocked successfully!")
@@ -1735,6 +1809,8 @@ def show_admin_management():
         if not current_user.get('permissions', {}).get('manage_users'):
             st.error("❌ You don't have permission to manage email accounts.")
         else:
+            # Write buffered send counters so the totals below are current
+            send_stats.flush_send_stats()
             # Load email accounts
             email_accounts = load_email_accounts()
 
@@ -1758,7 +1834,8 @@ def show_admin_management():
                                 status = data.get('status', 'active')
                                 status_color = "🟢" if status == 'active' else "🔴"
                                 st.markdown(f"**Status:** {status_color} {status.title()}")
-                                st.markdown(f"**Sent:** {data.get('total_sent', 0)} emails")
+                                sent_today = (data.get('daily_sent') or {}).get(datetime.now().strftime('%Y-%m-%d'), 0)
+                                st.markdown(f"**Sent:** {data.get('total_sent', 0)} emails ({sent_today} today)")
 
                             with col3:
                                 added_date = data.get('added_at', '')
@@ -1970,6 +2047,26 @@ def show_admin_management():
             else:
                 st.metric("📈 Active Rate", "0%")
 
+        st.divider()
+
+        # Password hashing
+        st.markdown("### 🔐 **Password Verification**")
+        hash_metrics = password_hashing.get_hash_metrics()
+
+        col_hash1, col_hash2, col_hash3, col_hash4 = st.columns(4)
+        with col_hash1:
+            st.metric("🔑 Verifications", hash_metrics['verifications'])
+        with col_hash2:
+            st.metric("❌ Failed", hash_metrics['failures'])
+        with col_hash3:
+            if 'latency_p95' in hash_metrics:
+                st.metric("⏱️ p95 Latency", f"{hash_metrics['latency_p95'] * 1000:.0f} ms")
+            else:
+                st.metric("⏱️ p95 Latency", "-")
+        with col_hash4:
+            st.metric("⚙️ bcrypt Cost", hash_metrics['rounds'])
+        st.caption(f"{hash_metrics['workers']} hashing worker processes, {hash_metrics['rehashes']} hashes upgraded on login")
+
         # Recent activity summary
         st.subheader("📈 Recent Activity Summary")
 
@@ -1997,33 +2094,51 @@ def show_admin_management():
         if current_user.get('permissions', {}).get('view_logs'):
             st.subheader("📝 Admin Activity Logs")
 
-            # Load and display logs
-            if os.path.exists(ADMIN_LOGS_FILE):
-                with open(ADMIN_LOGS_FILE, 'r') as f:
-                    logs = json.load(f)
+            # Filters, counts and pages come from the SQLite index over the log files
+            log_index = activity_log.get_activity_index()
+            total_logs = log_index.count()
 
+            if total_logs:
                 # Filter options
-                col_log1, col_log2, col_log3 = st.columns(3)
+                col_log1, col_log2, col_log3, col_log4 = st.columns(4)
                 with col_log1:
                     log_limit = st.selectbox("Show entries", [10, 25, 50, 100])
                 with col_log2:
-                    action_filter = st.selectbox("Filter by action", ["All"] + list(set([log.get('action', '') for log in logs])))
+                    time_ranges = {"All time": None, "Last 24 hours": 1, "Last 7 days": 7, "Last 30 days": 30}
+                    time_range = st.selectbox("Time range", list(time_ranges))
+                    since = datetime.now() - timedelta(days=time_ranges[time_range]) if time_ranges[time_range] else None
+                action_counts = log_index.counts_by('action', since=since)
+                admin_counts = log_index.counts_by('admin_email', since=since)
                 with col_log3:
-                    admin_filter = st.selectbox("Filter by admin", ["All"] + list(set([log.get('admin_email', '') for log in logs])))
-
-                # Apply filters
-                filtered_logs = logs[-log_limit:]  # Get recent logs
-                if action_filter != "All":
-                    filtered_logs = [log for log in filtered_logs if log.get('action') == action_filter]
-                if admin_filter != "All":
-                    filtered_logs = [log for log in filtered_logs if log.get('admin_email') == admin_filter]
-
-                # Display logs
-                for log in reversed(filtered_logs):  # Show newest first
-                    timestamp = datetime.fromisoformat(log['timestamp']).strftime("%Y-%m-%d %H:%M:%S")
-                    action = log.get('action', 'unknown')
-                    admin = log.get('admin_email', 'unknown')
-                    details = log.get('details', {})
+                    action_filter = st.selectbox("Filter by action", ["All"] + sorted(action_counts),
+                                                 format_func=lambda a: a if a == "All" else f"{a} ({action_counts[a]})")
+                with col_log4:
+                    admin_filter = st.selectbox("Filter by admin", ["All"] + sorted(admin_counts),
+                                                format_func=lambda a: a if a == "All" else f"{a} ({admin_counts[a]})")
+
+                filters = {
+                    'action': None if action_filter == "All" else action_filter,
+                    'admin_email': None if admin_filter == "All" else admin_filter,
+                    'since': since
+                }
+                matching = log_index.count(**filters)
+
+                # Reset to the newest page whenever the filters change
+                page_key = (log_limit, time_range, action_filter, admin_filter)
+                if st.session_state.get('activity_log_filters') != page_key:
+                    st.session_state.activity_log_filters = page_key
+                    st.session_state.activity_log_offset = 0
+                offset = st.session_state.get('activity_log_offset', 0)
+
+                filtered_logs = log_index.query(log_limit, offset, **filters)
+                has_older = offset + len(filtered_logs) < matching
+
+                # Display logs (newest first)
+                for log_entry in filtered_logs:
+                    timestamp = datetime.fromisoformat(log_entry['timestamp']).strftime("%Y-%m-%d %H:%M:%S")
+                    action = log_entry.get('action', 'unknown')
+                    admin = log_entry.get('admin_email', 'unknown')
+                    details = log_entry.get('details', {})
 
                     # Action icons
                     action_icons = {
@@ -2042,10 +2157,23 @@ def show_admin_management():
                     with st.expander(f"{icon} {timestamp} - {action} by {admin}"):
                         st.json(details)
 
+                # Paging
+                col_page1, col_page2, col_page3 = st.columns([1, 2, 1])
+                with col_page1:
+                    if st.button("⬅️ Newer", disabled=offset == 0):
+                        st.session_state.activity_log_offset = max(0, offset - log_limit)
+                        st.rerun()
+                with col_page2:
+                    st.caption(f"Showing entries {offset + 1}-{offset + len(filtered_logs)} of {matching} ({total_logs} total)")
+                with col_page3:
+                    if st.button("Older ➡️", disabled=not has_older):
+                        st.session_state.activity_log_offset = offset + log_limit
+                        st.rerun()
+
                 # Clear logs button
                 if st.button("🗑️ Clear All Logs", type="secondary"):
-                    with open(ADMIN_LOGS_FILE, 'w') as f:
-                        json.dump([], f)
+                    activity_log.get_activity_log().clear()
+                    st.session_state.activity_log_offset = 0
                     st.success("✅ All logs cleared!")
                     st.rerun()
             else:
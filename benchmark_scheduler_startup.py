@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Scheduler Startup Benchmark
+Measures per-job scheduler cold start and session-start rescheduling with
+10k/100k stored reminders.
+
+    python benchmark_scheduler_startup.py
+    python benchmark_scheduler_startup.py --sizes 1000,10000 --json startup.json
+
+For every size, a child process in a scratch directory seeds future
+reminders and times:
+    import      importing scheduler_manager (starts the APScheduler instance)
+    cold        first reschedule_all_active_reminders(): every job added
+    session     the call each new Streamlit session makes with nothing changed
+    forced      a full diff with nothing to change (force=True)
+    changed     a diff after 1% of the reminders moved to a new due time
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add current directory to path to import modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_send_throughput import peak_rss_mb
+
+DEFAULT_SIZES = (10000, 100000)
+PHASES = ('import', 'cold', 'session', 'forced', 'changed')
+CHANGED_FRACTION = 0.01
+CASE_TIMEOUT = 3600
+RESULT_FILE = 'benchmark_result.json'
+
+
+def run_case_in_process(size):
+    """Seed size future reminders and time each rescheduling phase (runs in the child)"""
+    import logging
+    import pandas as pd
+
+    import reminder_store
+    from create_sample_data import generate_sample_reminders
+
+    store = reminder_store.SQLiteReminderStore('benchmark_reminders.db', excel_file=None)
+    reminder_store.set_reminder_store(store)
+    tomorrow = (datetime.now() + timedelta(days=1)).date()
+    reminders = generate_sample_reminders(size, due_date=tomorrow, due_time='10:00')
+    store.save_reminders(pd.DataFrame(reminders))
+
+    timings = {}
+    start = time.perf_counter()
+    import scheduler_manager
+    timings['import'] = time.perf_counter() - start
+    # One INFO line per added job would dominate the numbers
+    logging.disable(logging.INFO)
+    scheduler = scheduler_manager.get_scheduler()
+
+    def timed(phase, **kwargs):
+        start = time.perf_counter()
+        counts = scheduler.reschedule_all_active_reminders(**kwargs)
+        timings[phase] = time.perf_counter() - start
+        return counts
+
+    counts = {'cold': timed('cold'), 'session': timed('session'), 'forced': timed('forced', force=True)}
+
+    step = max(1, int(1 / CHANGED_FRACTION))
+    for reminder in reminders[::step]:
+        store.update_reminder(reminder['ID'], {'Due Time': '11:00'})
+    counts['changed'] = timed('changed')
+
+    return {'size': size, 'timings': timings, 'counts': counts,
+            'jobs': scheduler.get_scheduled_count(), 'peak_rss_mb': peak_rss_mb()}
+
+
+def run_case(size):
+    """Run one size in a per-job mode child process; returns its result dict"""
+    with tempfile.TemporaryDirectory(prefix='startup_benchmark_') as workdir:
+        env = dict(os.environ)
+        env['REMINDER_DISPATCH_MODE'] = 'per_job'
+        log_path = os.path.join(workdir, 'benchmark_child.log')
+        with open(log_path, 'w') as log:
+            completed = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', str(size)],
+                                       cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT,
+                                       timeout=CASE_TIMEOUT)
+        result_path = os.path.join(workdir, RESULT_FILE)
+        if completed.returncode != 0 or not os.path.exists(result_path):
+            with open(log_path, 'r', errors='replace') as log:
+                tail = log.read()[-2000:]
+            raise RuntimeError(f"Startup benchmark with {size} reminders failed:\n{tail}")
+        with open(result_path, 'r') as f:
+            return json.load(f)
+
+
+def print_results(results):
+    print(f"\n{'Size':>7} " + " ".join(f"{phase + ' s':>11}" for phase in PHASES) + f" {'Jobs':>8} {'Peak RSS MB':>12}")
+    print("-" * (8 + 12 * len(PHASES) + 22))
+    for r in results:
+        rss = f"{r['peak_rss_mb']:.1f}" if r['peak_rss_mb'] is not None else 'n/a'
+        print(f"{r['size']:>7} " + " ".join(f"{r['timings'][phase]:>11.4f}" for phase in PHASES)
+              + f" {r['jobs']:>8} {rss:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-job scheduler startup rescheduling")
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help="comma separated reminder counts (default: %(default)s)")
+    parser.add_argument('--json', dest='json_file', help="also write the results to this JSON file")
+    parser.add_argument('--child', metavar='SIZE', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = run_case_in_process(int(args.child))
+        with open(RESULT_FILE, 'w') as f:
+            json.dump(result, f)
+        return
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    print("📈 Scheduler Startup Benchmark")
+    print("=" * 50)
+
+    results = []
+    for size in sizes:
+        print(f"⏱️  {size} reminders...", flush=True)
+        results.append(run_case(size))
+    print_results(results)
+
+    if args.json_file:
+        with open(args.json_file, 'w') as f:
+            json.dump({'generated_at': datetime.now().isoformat(), 'results': results}, f, indent=2)
+        print(f"\n💾 Results written to {args.json_file}")
+
+
+if __name__ == "__main__":
+    main()
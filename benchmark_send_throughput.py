@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Send Throughput Benchmark
+Runs each reminder send path against a local fake SMTP server and reports
+messages/sec, p50/p99 per-message SMTP latency and peak RSS.
+
+    python benchmark_send_throughput.py
+    python benchmark_send_throughput.py --sizes 100,1000 --paths app,cloud --latency-ms 20
+
+Send paths:
+    app        app.check_and_send_reminders() (SendEngine batch)
+    scheduler  EmailScheduler.send_reminder_email() per reminder, 10 at a time like APScheduler's default pool
+    cloud      StreamlitCloudScheduler.check_and_send_due_emails()
+
+Every (path, size) case runs in its own child process inside a scratch
+directory, so peak RSS is per case and nothing touches the real reminder
+database, email accounts or Gmail. Per-account rate limiting is lifted so
+the numbers reflect the code path, not the configured quota.
+"""
+
+import argparse
+import base64
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Add current directory to path to import modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fake_smtp import FakeSMTPServer
+
+SEND_PATHS = ('app', 'scheduler', 'cloud')
+DEFAULT_SIZES = (100, 1000, 10000, 100000)
+
+SENDER_EMAIL = "benchmark@example.com"
+SENDER_PASSWORD = "benchmark-password"
+UNLIMITED_RATE_PER_MINUTE = 10 ** 9
+SCHEDULER_THREADS = 10  # APScheduler's default ThreadPoolExecutor size
+CASE_TIMEOUT = 3600
+RESULT_FILE = 'benchmark_result.json'
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list, or None if empty"""
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where unsupported"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def write_email_accounts(workdir):
+    """Default sender account for the scratch directory (read by every send path)"""
+    accounts = {
+        SENDER_EMAIL: {
+            "email": SENDER_EMAIL,
+            "password": base64.b64encode(SENDER_PASSWORD.encode('utf-8')).decode('utf-8'),
+            "status": "active",
+            "is_default": True,
+            "last_used": None,
+            "total_sent": 0
+        }
+    }
+    with open(os.path.join(workdir, 'email_accounts.json'), 'w') as f:
+        json.dump(accounts, f, indent=2)
+
+
+def run_case_in_process(path, size, smtp_host, smtp_port):
+    """Seed size due reminders, drive one send path and measure it (runs in the child)"""
+    import pandas as pd
+
+    import reminder_store
+    import send_engine
+    import smtp_pool
+    from create_sample_data import generate_sample_reminders
+
+    latencies = []
+
+    class TimedSMTPPool(smtp_pool.SMTPConnectionPool):
+        def send_message(self, sender_email, app_password, recipient, msg):
+            start = time.perf_counter()
+            try:
+                return super().send_message(sender_email, app_password, recipient, msg)
+            finally:
+                latencies.append(time.perf_counter() - start)
+
+    store = reminder_store.SQLiteReminderStore('benchmark_reminders.db', excel_file=None)
+    reminder_store.set_reminder_store(store)
+    pool = smtp_pool.set_smtp_pool(TimedSMTPPool(smtp_configs=[{'host': smtp_host, 'port': smtp_port}]))
+    send_engine.set_send_engine(send_engine.SendEngine(rate_limits={SENDER_EMAIL: UNLIMITED_RATE_PER_MINUTE}))
+
+    # Import the path's module before seeding so its import-time work is not timed
+    if path == 'app':
+        import app
+        send = app.check_and_send_reminders
+    elif path == 'scheduler':
+        from scheduler_manager import get_scheduler
+        scheduler = get_scheduler()
+
+        def send():
+            ids = [r['ID'] for r in store.get_due_reminders(datetime.now())]
+            with ThreadPoolExecutor(max_workers=SCHEDULER_THREADS) as executor:
+                return sum(1 for ok in executor.map(scheduler.send_reminder_email, ids) if ok)
+    elif path == 'cloud':
+        from streamlit_cloud_scheduler import get_cloud_scheduler
+        send = get_cloud_scheduler().check_and_send_due_emails
+    else:
+        raise ValueError(f"Unknown send path: {path}")
+
+    now = datetime.now()
+    # app only sends reminders due earlier today; cloud only those within two minutes of now
+    due_time = '00:00' if path == 'app' else now.strftime('%H:%M')
+    store.save_reminders(pd.DataFrame(generate_sample_reminders(size, due_date=now.date(), due_time=due_time)))
+
+    start = time.perf_counter()
+    send()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    sent = pool.stats['messages_sent']
+    return {
+        'path': path,
+        'size': size,
+        'sent': sent,
+        'elapsed_s': elapsed,
+        'msgs_per_s': sent / elapsed if elapsed else None,
+        'p50_ms': percentile(latencies, 0.50) * 1000 if latencies else None,
+        'p99_ms': percentile(latencies, 0.99) * 1000 if latencies else None,
+        'connections_opened': pool.stats['connections_opened'],
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def run_case(path, size, server):
+    """Run one (path, size) case in a child process against server; returns its result dict"""
+    with tempfile.TemporaryDirectory(prefix='send_benchmark_') as workdir:
+        write_email_accounts(workdir)
+        env = dict(os.environ)
+        # No dispatcher tick competing with the path under test
+        env['REMINDER_DISPATCH_MODE'] = 'per_job'
+        received_before = len(server.messages)
+
+        # Child output goes to a file: helper processes it spawns may outlive it holding a pipe open
+        log_path = os.path.join(workdir, 'benchmark_child.log')
+        with open(log_path, 'w') as log:
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', path, str(size),
+                 '--smtp-host', server.host, '--smtp-port', str(server.port)],
+                cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT, timeout=CASE_TIMEOUT
+            )
+        result_path = os.path.join(workdir, RESULT_FILE)
+        if completed.returncode != 0 or not os.path.exists(result_path):
+            with open(log_path, 'r', errors='replace') as log:
+                tail = log.read()[-2000:]
+            raise RuntimeError(f"{path} benchmark with {size} reminders failed:\n{tail}")
+
+        with open(result_path, 'r') as f:
+            result = json.load(f)
+        result['received'] = len(server.messages) - received_before
+        return result
+
+
+def format_value(value, pattern):
+    return pattern.format(value) if value is not None else 'n/a'
+
+
+def print_results(results):
+    print(f"\n{'Path':<10} {'Size':>7} {'Sent':>7} {'Msgs/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'Peak RSS MB':>12} {'Elapsed s':>10}")
+    print("-" * 79)
+    for r in results:
+        print(f"{r['path']:<10} {r['size']:>7} {r['sent']:>7} {format_value(r['msgs_per_s'], '{:.1f}'):>9} "
+              f"{format_value(r['p50_ms'], '{:.2f}'):>8} {format_value(r['p99_ms'], '{:.2f}'):>8} "
+              f"{format_value(r['peak_rss_mb'], '{:.1f}'):>12} {r['elapsed_s']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark reminder send paths against a fake SMTP server")
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help="comma separated reminder counts (default: %(default)s)")
+    parser.add_argument('--paths', default=','.join(SEND_PATHS),
+                        help="comma separated send paths: app, scheduler, cloud (default: all)")
+    parser.add_argument('--latency-ms', type=float, default=0.0,
+                        help="delay the fake server adds to every SMTP reply, to mimic a remote server")
+    parser.add_argument('--json', dest='json_file', help="also write the results to this JSON file")
+    parser.add_argument('--child', nargs=2, metavar=('PATH', 'SIZE'), help=argparse.SUPPRESS)
+    parser.add_argument('--smtp-host', default='127.0.0.1', help=argparse.SUPPRESS)
+    parser.add_argument('--smtp-port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        import logging
+        logging.disable(logging.WARNING)  # keep the streamlit bare-mode noise out of the timings
+        result = run_case_in_process(args.child[0], int(args.child[1]), args.smtp_host, args.smtp_port)
+        with open(RESULT_FILE, 'w') as f:
+            json.dump(result, f)
+        return
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    paths = [p.strip() for p in args.paths.split(',') if p.strip()]
+    unknown = set(paths) - set(SEND_PATHS)
+    if unknown:
+        parser.error(f"unknown send paths: {', '.join(sorted(unknown))}")
+
+    print("📈 Send Throughput Benchmark")
+    print("=" * 50)
+    print(f"Fake SMTP reply latency: {args.latency_ms:g} ms, sizes: {sizes}, paths: {paths}")
+
+    results = []
+    with FakeSMTPServer(response_delay=args.latency_ms / 1000.0) as server:
+        for path in paths:
+            for size in sizes:
+                print(f"⏱️  {path}: {size} reminders...", flush=True)
+                result = run_case(path, size, server)
+                if result['received'] != size:
+                    print(f"   ⚠️  server received {result['received']} of {size} messages")
+                server.messages.clear()
+                results.append(result)
+
+    print_results(results)
+
+    if args.json_file:
+        with open(args.json_file, 'w') as f:
+            json.dump({'generated_at': datetime.now().isoformat(), 'latency_ms': args.latency_ms,
+                       'results': results}, f, indent=2)
+        print(f"\n💾 Results written to {args.json_file}")
+
+
+if __name__ == "__main__":
+    main()
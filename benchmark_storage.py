@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Storage I/O Benchmark
+Times load, full save, single-row update and the due query for each reminder
+storage backend at several sizes, and optionally checks the numbers against a
+saved baseline so CI can catch regressions.
+
+    python benchmark_storage.py
+    python benchmark_storage.py --sizes 1000,10000 --save-baseline storage_baseline.json
+    python benchmark_storage.py --sizes 1000,10000 --baseline storage_baseline.json   # exits 1 on regression
+
+Backends:
+    excel    ExcelReminderStore (payment_reminders.xlsx through openpyxl)
+    sqlite   SQLiteReminderStore
+    parquet  the Excel store's whole-file logic on a Parquet file; skipped
+             when neither pyarrow nor fastparquet is installed
+
+Timings are the median of --repeat runs, in seconds. Everything runs in a
+scratch directory; the real reminder files are never touched.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Add current directory to path to import modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+import reminder_store
+from create_sample_data import generate_sample_reminders
+from file_cache import file_signature
+
+BACKENDS = ('excel', 'sqlite', 'parquet')
+OPERATIONS = ('load', 'save', 'update', 'due_query')
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_REPEAT = 3
+
+# A run regresses when it is this much slower than the baseline...
+DEFAULT_TOLERANCE = 0.5
+# ...and at least this many seconds slower, so sub-millisecond jitter never fails CI
+MIN_REGRESSION_SECONDS = 0.005
+
+
+def parquet_available():
+    """True if pandas has a Parquet engine installed"""
+    for engine in ('pyarrow', 'fastparquet'):
+        try:
+            __import__(engine)
+            return True
+        except ImportError:
+            continue
+    return False
+
+
+class ParquetReminderStore(reminder_store.ExcelReminderStore):
+    """Candidate backend: the Excel store's whole-file logic on a Parquet file"""
+
+    name = "parquet"
+
+    def load_reminders(self):
+        with self._lock:
+            if not os.path.exists(self.excel_file):
+                return reminder_store.empty_reminders_frame()
+            return pd.read_parquet(self.excel_file)
+
+    def data_signature(self):
+        return file_signature(self.excel_file)
+
+    def _write(self, df):
+        with self._lock:
+            # Parquet columns need one type; reminder cells are mixed text, dates and blanks
+            df.astype(object).where(df.notna(), '').astype(str).to_parquet(self.excel_file, index=False)
+
+
+def create_store(backend, workdir):
+    """Fresh, empty store for a backend inside workdir"""
+    if backend == 'excel':
+        return reminder_store.ExcelReminderStore(os.path.join(workdir, 'reminders.xlsx'))
+    if backend == 'sqlite':
+        return reminder_store.SQLiteReminderStore(os.path.join(workdir, 'reminders.db'), excel_file=None)
+    if backend == 'parquet':
+        return ParquetReminderStore(os.path.join(workdir, 'reminders.parquet'))
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def benchmark_backend(backend, size, repeat=DEFAULT_REPEAT):
+    """Median seconds per operation for one backend holding size reminders"""
+    reminders = generate_sample_reminders(size)
+    df = pd.DataFrame(reminders)
+    now = datetime.now()
+    since = datetime.combine(now.date(), datetime.min.time())
+    samples = {operation: [] for operation in OPERATIONS}
+
+    with tempfile.TemporaryDirectory(prefix='storage_benchmark_') as workdir:
+        store = create_store(backend, workdir)
+        store.save_reminders(df)
+        for run in range(repeat):
+            samples['save'].append(_timed(store.save_reminders, df))
+            samples['load'].append(_timed(store.load_reminders))
+            # A different row each run, spread across the table
+            reminder_id = reminders[(run * 7919) % size]['ID']
+            samples['update'].append(_timed(store.update_reminder, reminder_id, {'Message': f"Updated {run}"}))
+            samples['due_query'].append(_timed(store.get_due_reminders, now, since))
+
+    return {operation: statistics.median(values) for operation, values in samples.items()}
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, backends=BACKENDS, repeat=DEFAULT_REPEAT, progress=None):
+    """{backend: {size: {operation: seconds}}} for every backend that can run here"""
+    results = {}
+    for backend in backends:
+        if backend == 'parquet' and not parquet_available():
+            if progress:
+                progress("⚠️  Skipping parquet: install pyarrow or fastparquet to include it")
+            continue
+        results[backend] = {}
+        for size in sizes:
+            if progress:
+                progress(f"⏱️  {backend}: {size} reminders...")
+            results[backend][str(size)] = benchmark_backend(backend, size, repeat)
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE, min_seconds=MIN_REGRESSION_SECONDS):
+    """List of regressions: cases slower than the baseline by more than tolerance and min_seconds"""
+    regressions = []
+    for backend, sizes in results.items():
+        for size, operations in sizes.items():
+            for operation, seconds in operations.items():
+                expected = baseline.get(backend, {}).get(size, {}).get(operation)
+                if expected is None:
+                    continue
+                if seconds > expected * (1 + tolerance) and seconds - expected > min_seconds:
+                    regressions.append({'backend': backend, 'size': size, 'operation': operation,
+                                        'baseline': expected, 'current': seconds})
+    return regressions
+
+
+def print_results(results):
+    print(f"\n{'Backend':<9} {'Size':>7} " + " ".join(f"{op + ' ms':>13}" for op in OPERATIONS))
+    print("-" * (18 + 14 * len(OPERATIONS)))
+    for backend, sizes in results.items():
+        for size, operations in sizes.items():
+            print(f"{backend:<9} {size:>7} " + " ".join(f"{operations[op] * 1000:>13.2f}" for op in OPERATIONS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark reminder storage backends")
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help="comma separated reminder counts (default: %(default)s)")
+    parser.add_argument('--backends', default=','.join(BACKENDS),
+                        help="comma separated backends: excel, sqlite, parquet (default: all)")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="runs per operation, median is reported")
+    parser.add_argument('--json', dest='json_file', help="also write the results to this JSON file")
+    parser.add_argument('--save-baseline', help="write the results as a baseline file")
+    parser.add_argument('--baseline', help="compare against this baseline file and exit 1 on regression")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown over the baseline as a fraction (default: %(default)s)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    backends = [b.strip() for b in args.backends.split(',') if b.strip()]
+    unknown = set(backends) - set(BACKENDS)
+    if unknown:
+        parser.error(f"unknown backends: {', '.join(sorted(unknown))}")
+
+    print("📈 Storage I/O Benchmark")
+    print("=" * 50)
+    results = run_benchmark(sizes, backends, max(1, args.repeat), progress=lambda line: print(line, flush=True))
+    print_results(results)
+
+    for path in (args.json_file, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(results, f, indent=2)
+            print(f"\n💾 Results written to {path}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regressions against {args.baseline}:")
+            for r in regressions:
+                print(f"   {r['backend']} {r['size']} {r['operation']}: "
+                      f"{r['baseline'] * 1000:.2f} ms -> {r['current'] * 1000:.2f} ms")
+            sys.exit(1)
+        print(f"\n✅ No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
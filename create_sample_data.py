@@ -61,15 +61,41 @@ sample_data = [
     }
 ]
 
-# Create DataFrame
-df = pd.DataFrame(sample_data)
 
-# Save to Excel file
-with pd.ExcelWriter('payment_reminders.xlsx', engine='openpyxl') as writer:
-    df.to_excel(writer, sheet_name='Reminders', index=False)
+def generate_sample_reminders(count, due_date=None, due_time=None):
+    """Build count synthetic reminders (current 'Header Name' schema) cycling through the samples above.
 
-print("✅ Sample payment reminders Excel file created successfully!")
-print(f"📊 Created {len(sample_data)} sample reminders")
-print("\nSample data includes:")
-for i, reminder in enumerate(sample_data, 1):
-    print(f"{i}. {reminder['Name']} - {reminder['Agreement Name']} (Due: {reminder['Due Date']})")
+    Every reminder gets a unique ID and recipient; due_date/due_time override
+    the sample schedule so benchmarks can make the whole set due at once.
+    """
+    reminders = []
+    for i in range(count):
+        sample = sample_data[i % len(sample_data)]
+        local_part, domain = sample['Email'].split('@')
+        reminders.append({
+            'ID': str(uuid.uuid4()),
+            'Name': f"{sample['Name']} {i + 1}",
+            'Email': f"{local_part}+{i + 1}@{domain}",
+            'Header Name': sample['Agreement Name'],
+            'Due Date': str(due_date or sample['Due Date']),
+            'Due Time': due_time or sample['Due Time'],
+            'Message': sample['Message'],
+            'Status': 'Active',
+            'Last Sent': ''
+        })
+    return reminders
+
+
+if __name__ == "__main__":
+    # Create DataFrame
+    df = pd.DataFrame(sample_data)
+
+    # Save to Excel file
+    with pd.ExcelWriter('payment_reminders.xlsx', engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name='Reminders', index=False)
+
+    print("✅ Sample payment reminders Excel file created successfully!")
+    print(f"📊 Created {len(sample_data)} sample reminders")
+    print("\nSample data includes:")
+    for i, reminder in enumerate(sample_data, 1):
+        print(f"{i}. {reminder['Name']} - {reminder['Agreement Name']} (Due: {reminder['Due Date']})")
@@ -0,0 +1,142 @@
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime
+
+import reminder_store
+
+logger = logging.getLogger(__name__)
+
+# Longest single sleep, so a loop always re-checks its running flag at least this often
+MAX_IDLE_SECONDS = 600
+
+
+class DueQueue:
+    """Min-heap of (scheduled_ts, reminder_id) for active reminders still waiting to be sent.
+
+    The heap is built from the store once and then kept current from the
+    store's change notifications. Edits push a fresh entry and stale ones are
+    skipped when they reach the top (lazy deletion), so no write ever
+    rescans the reminders.
+    """
+
+    def __init__(self, store=None, lookback_seconds=0):
+        self.store = store or reminder_store.get_reminder_store()
+        self.lookback_seconds = lookback_seconds
+        self._heap = []
+        self._entries = {}  # reminder_id -> scheduled_ts of its live heap entry
+        self._lock = threading.Lock()
+        self._changed = threading.Event()
+        self.rebuild()
+        self.store.subscribe(self._on_change)
+
+    def _cutoff(self):
+        return time.time() - self.lookback_seconds
+
+    def rebuild(self):
+        """Reload every pending reminder from the store"""
+        due = reminder_store.select_due_reminders(self.store.load_reminders(), since=datetime.fromtimestamp(self._cutoff()))
+        entries = {rid: int(ts) for rid, ts in zip(due['ID'], due[reminder_store.SCHEDULED_TS_COLUMN])}
+        heap = [(ts, rid) for rid, ts in entries.items()]
+        heapq.heapify(heap)
+        with self._lock:
+            self._heap, self._entries = heap, entries
+        self._changed.set()
+        logger.info(f"Due queue built with {len(entries)} pending reminders")
+
+    def _scheduled_ts(self, reminder):
+        """Epoch seconds the reminder is due, or None if it should not be queued"""
+        if reminder is None or (reminder.get('Status') or 'Active') != 'Active':
+            return None
+        if not reminder_store._can_transition(reminder, (reminder_store.SEND_PENDING,)):
+            return None
+        scheduled_at = reminder_store.scheduled_at_for(reminder.get('Due Date'), reminder.get('Due Time'),
+                                                       reminder.get('Timezone'))
+        if scheduled_at is None:
+            return None
+        scheduled_ts = reminder_store.to_epoch(scheduled_at)
+        return scheduled_ts if scheduled_ts >= self._cutoff() else None
+
+    def refresh(self, reminder_id):
+        """Re-read one reminder and move, add or drop its queue entry"""
+        scheduled_ts = self._scheduled_ts(self.store.get_reminder(reminder_id))
+        with self._lock:
+            if scheduled_ts is None:
+                self._entries.pop(reminder_id, None)
+            elif self._entries.get(reminder_id) != scheduled_ts:
+                self._entries[reminder_id] = scheduled_ts
+                heapq.heappush(self._heap, (scheduled_ts, reminder_id))
+
+    def _on_change(self, event, reminder_ids):
+        if event == 'reset':
+            self.rebuild()
+            return
+        if event == 'deleted':
+            with self._lock:
+                for reminder_id in reminder_ids:
+                    self._entries.pop(reminder_id, None)
+        else:
+            for reminder_id in reminder_ids:
+                self.refresh(reminder_id)
+        self._changed.set()
+
+    def _drop_stale_locked(self):
+        while self._heap and self._entries.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def peek(self):
+        """(scheduled_ts, reminder_id) of the next reminder, or None"""
+        with self._lock:
+            self._drop_stale_locked()
+            return self._heap[0] if self._heap else None
+
+    def pop_due(self, now=None):
+        """Remove and return the IDs of every reminder due at or before now (epoch seconds)"""
+        now = time.time() if now is None else now
+        due = []
+        with self._lock:
+            while True:
+                self._drop_stale_locked()
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                _, reminder_id = heapq.heappop(self._heap)
+                del self._entries[reminder_id]
+                due.append(reminder_id)
+        return due
+
+    def wait(self, max_wait=MAX_IDLE_SECONDS):
+        """Sleep until the next reminder is due, the queue changes or wake() is called"""
+        head = self.peek()
+        timeout = max_wait if head is None else min(max_wait, max(0.0, head[0] - time.time()))
+        woken = self._changed.wait(timeout)
+        self._changed.clear()
+        return woken
+
+    def wake(self):
+        """Interrupt wait(), e.g. to stop the loop"""
+        self._changed.set()
+
+    def close(self):
+        self.store.unsubscribe(self._on_change)
+        self.wake()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_due_queue(lookback_seconds=0):
+    """Get the process-wide due queue for the current reminder store"""
+    global _queue
+    store = reminder_store.get_reminder_store()
+    with _queue_lock:
+        if _queue is None or _queue.store is not store:
+            if _queue is not None:
+                _queue.close()
+            _queue = DueQueue(store, lookback_seconds=lookback_seconds)
+        return _queue
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Fake SMTP Server
+In-process SMTP sink for tests and benchmarks - nothing is delivered anywhere.
+
+    with FakeSMTPServer() as server:
+        pool = SMTPConnectionPool(smtp_configs=server.smtp_configs())
+        ...
+        print(len(server.messages))
+"""
+
+import base64
+import socketserver
+import threading
+import time
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """One client session speaking just enough SMTP for smtplib and async_smtp"""
+
+    def reply(self, line):
+        if self.server.fake.response_delay:
+            time.sleep(self.server.fake.response_delay)
+        self.wfile.write(f"{line}\r\n".encode('utf-8'))
+        self.wfile.flush()
+
+    def readline(self):
+        line = self.rfile.readline()
+        if not line:
+            raise ConnectionError("client closed connection")
+        return line.decode('utf-8', errors='replace').rstrip('\r\n')
+
+    def check_credentials(self, username, password):
+        fake = self.server.fake
+        if fake.password is not None and password != fake.password:
+            self.reply("535 5.7.8 Authentication credentials invalid")
+            return
+        fake._record('logins')
+        self.authenticated = True
+        self.reply("235 2.7.0 Authentication successful")
+
+    def handle(self):
+        fake = self.server.fake
+        fake._record('connections')
+        self.authenticated = False
+        mail_from, recipients = None, []
+        messages_this_session = 0
+        self.reply("220 fake-smtp ESMTP ready")
+
+        try:
+            while True:
+                line = self.readline()
+                command = line[:4].upper()
+
+                if command in ('EHLO', 'HELO'):
+                    if command == 'EHLO':
+                        self.wfile.write(b"250-fake-smtp\r\n250-PIPELINING\r\n250-8BITMIME\r\n250 AUTH PLAIN LOGIN\r\n")
+                        self.wfile.flush()
+                    else:
+                        self.reply("250 fake-smtp")
+                elif command == 'AUTH':
+                    parts = line.split()
+                    mechanism = parts[1].upper() if len(parts) > 1 else ''
+                    if mechanism == 'PLAIN':
+                        token = parts[2] if len(parts) > 2 else None
+                        if token is None:
+                            self.reply("334 ")
+                            token = self.readline()
+                        _, username, password = base64.b64decode(token).decode('utf-8').split('\0')
+                        self.check_credentials(username, password)
+                    elif mechanism == 'LOGIN':
+                        if len(parts) > 2:
+                            username = base64.b64decode(parts[2]).decode('utf-8')
+                        else:
+                            self.reply("334 VXNlcm5hbWU6")
+                            username = base64.b64decode(self.readline()).decode('utf-8')
+                        self.reply("334 UGFzc3dvcmQ6")
+                        password = base64.b64decode(self.readline()).decode('utf-8')
+                        self.check_credentials(username, password)
+                    else:
+                        self.reply("504 5.5.4 Unrecognized authentication type")
+                elif command == 'MAIL':
+                    if fake.require_auth and not self.authenticated:
+                        self.reply("530 5.7.0 Authentication required")
+                        continue
+                    if fake.max_messages_per_session and messages_this_session >= fake.max_messages_per_session:
+                        self.reply("421 4.7.0 Too many messages, closing connection")
+                        return
+                    mail_from, recipients = line.split(':', 1)[1].strip(), []
+                    self.reply("250 2.1.0 OK")
+                elif command == 'RCPT':
+                    if mail_from is None:
+                        self.reply("503 5.5.1 Need MAIL first")
+                        continue
+                    recipient = line.split(':', 1)[1].strip().strip('<>')
+                    if recipient in fake.reject_recipients:
+                        self.reply("550 5.1.1 No such user")
+                        continue
+                    recipients.append(recipient)
+                    self.reply("250 2.1.5 OK")
+                elif command == 'DATA':
+                    if not recipients:
+                        self.reply("503 5.5.1 Need RCPT first")
+                        continue
+                    self.reply("354 End data with <CR><LF>.<CR><LF>")
+                    body = []
+                    while True:
+                        data_line = self.readline()
+                        if data_line == '.':
+                            break
+                        body.append(data_line[1:] if data_line.startswith('..') else data_line)
+                    fake._store(mail_from.strip('<>'), recipients, '\r\n'.join(body))
+                    messages_this_session += 1
+                    mail_from, recipients = None, []
+                    self.reply("250 2.0.0 OK queued")
+                elif command == 'RSET':
+                    mail_from, recipients = None, []
+                    self.reply("250 2.0.0 OK")
+                elif command == 'NOOP':
+                    self.reply("250 2.0.0 OK")
+                elif command == 'QUIT':
+                    self.reply("221 2.0.0 Bye")
+                    return
+                else:
+                    self.reply("502 5.5.2 Command not recognized")
+        except (ConnectionError, OSError):
+            return
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeSMTPServer:
+    """SMTP sink on localhost that records every message it accepts.
+
+    response_delay adds latency to every reply to mimic a remote server,
+    password rejects logins with any other password, and
+    max_messages_per_session makes the server drop sessions like Gmail does.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, response_delay=0.0, password=None, require_auth=True,
+                 reject_recipients=(), max_messages_per_session=None):
+        self.host = host
+        self.response_delay = response_delay
+        self.password = password
+        self.require_auth = require_auth
+        self.reject_recipients = set(reject_recipients)
+        self.max_messages_per_session = max_messages_per_session
+        self.messages = []
+        self.counters = {'connections': 0, 'logins': 0}
+        self._lock = threading.Lock()
+        self._server = _ThreadingServer((host, port), _SMTPHandler)
+        self._server.fake = self
+        self.port = self._server.server_address[1]
+        self._thread = None
+
+    def _record(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _store(self, sender, recipients, data):
+        with self._lock:
+            self.messages.append({'from': sender, 'to': list(recipients), 'data': data, 'received_at': time.time()})
+
+    def smtp_configs(self):
+        """SMTP config list (for SMTPConnectionPool / async_smtp) pointing at this server"""
+        return [{'host': self.host, 'port': self.port}]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+if __name__ == "__main__":
+    server = FakeSMTPServer(port=1025).start()
+    print(f"📭 Fake SMTP server listening on {server.host}:{server.port} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"   {len(server.messages)} messages received, {server.counters['logins']} logins")
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,81 @@
+import copy
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def file_signature(path):
+    """(mtime_ns, size) of a file, or None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class FileCache:
+    """Memoizes a file loader per path until the file's mtime or size changes.
+
+    Streamlit re-runs the whole script on every widget interaction, so
+    anything read from disk in the script body is re-parsed each time. Caching
+    here (an imported module survives reruns) turns repeat reads into a stat().
+    Callers get a deep copy by default so mutating the result never corrupts
+    the cache.
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, path, default=None, copy_result=True):
+        """Loaded contents of path; copy_result=False returns the shared cached object (read only)"""
+        key = os.path.abspath(path)
+        signature = file_signature(key)
+        if signature is None:
+            return copy.deepcopy(default) if copy_result else default
+
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or entry[0] != signature:
+            entry = (signature, self.loader(key))
+            with self._lock:
+                self._entries[key] = entry
+            logger.debug(f"Loaded {path} into file cache")
+        return copy.deepcopy(entry[1]) if copy_result else entry[1]
+
+    def invalidate(self, path=None):
+        """Forget one path, or everything when path is None"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(path), None)
+
+
+def _read_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+_json_cache = FileCache(_read_json)
+
+
+def load_json(path, default=None):
+    """Parsed contents of a JSON file, re-read only after it changes on disk"""
+    return _json_cache.get(path, default)
+
+
+def save_json(path, data, indent=2):
+    """Write a JSON file and drop its cached copy"""
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=indent)
+    _json_cache.invalidate(path)
+
+
+def invalidate(path=None):
+    """Convenience function to drop cached JSON files"""
+    _json_cache.invalidate(path)
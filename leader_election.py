@@ -0,0 +1,165 @@
+import atexit
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+LEADER_DB = "scheduler_leader.db"
+SENDER_LEASE = "sender"
+
+# A leader that stops renewing loses the lease after this many seconds
+LEASE_SECONDS = float(os.environ.get('SENDER_LEASE_SECONDS', 15))
+
+
+class LeaderLease:
+    """Lease-based leader election between processes sharing a SQLite file.
+
+    One row per lease name holds the current holder and an expiry time. Every
+    process runs a heartbeat thread that calls try_acquire() every third of
+    the lease: the holder extends its expiry, everyone else takes the lease
+    over once it has expired. A holder that exits cleanly releases the lease
+    so a standby takes over on its next heartbeat; one that dies is replaced
+    within about 1.3 lease lengths.
+
+    is_leader() is a local check with no I/O. The holder treats its lease as
+    valid for one heartbeat less than the stored expiry, so a stalled leader
+    stops acting before anyone else can take over.
+    """
+
+    def __init__(self, name=SENDER_LEASE, db_file=LEADER_DB, lease_seconds=LEASE_SECONDS, holder_id=None):
+        self.name = name
+        self.db_file = db_file
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = lease_seconds / 3.0
+        self.holder_id = holder_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._leader_until = 0.0  # time.monotonic() deadline of our own lease
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._init_schema()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_file, timeout=5, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS leases (
+                    name TEXT PRIMARY KEY,
+                    holder TEXT NOT NULL,
+                    acquired_at REAL NOT NULL,
+                    renewed_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+        finally:
+            conn.close()
+
+    def try_acquire(self):
+        """Take or renew the lease in one statement; True if this process holds it afterwards"""
+        started = time.monotonic()
+        now = time.time()
+        try:
+            conn = self._connect()
+            try:
+                cursor = conn.execute(
+                    """
+                    INSERT INTO leases (name, holder, acquired_at, renewed_at, expires_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (name) DO UPDATE SET
+                        acquired_at = CASE WHEN leases.holder = excluded.holder
+                                           THEN leases.acquired_at ELSE excluded.acquired_at END,
+                        holder = excluded.holder,
+                        renewed_at = excluded.renewed_at,
+                        expires_at = excluded.expires_at
+                    WHERE leases.holder = excluded.holder OR leases.expires_at <= ?
+                    """,
+                    (self.name, self.holder_id, now, now, now + self.lease_seconds, now)
+                )
+                acquired = cursor.rowcount == 1
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not renew {self.name} lease: {e}")
+            acquired = False
+
+        with self._lock:
+            was_leader = self._leader_until > time.monotonic()
+            self._leader_until = started + self.lease_seconds - self.heartbeat_interval if acquired else 0.0
+        if acquired and not was_leader:
+            logger.info(f"{self.holder_id} is now the {self.name} leader")
+        elif was_leader and not acquired:
+            logger.warning(f"{self.holder_id} lost the {self.name} lease")
+        return acquired
+
+    def is_leader(self):
+        """True while this process holds a live lease; starts the heartbeat on first use"""
+        if self._thread is None:
+            self.start()
+        with self._lock:
+            return self._leader_until > time.monotonic()
+
+    def start(self):
+        """Try for the lease now and keep heartbeating in the background"""
+        with self._lock:
+            if self._thread is not None or self._stop.is_set():
+                return
+            self._thread = threading.Thread(target=self._heartbeat, name=f"{self.name}-lease", daemon=True)
+        self.try_acquire()
+        self._thread.start()
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            self.try_acquire()
+
+    def holder(self):
+        """Current lease row as a dict (holder, acquired_at, renewed_at, expires_at), or None"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM leases WHERE name = ?", (self.name,)).fetchone()
+        finally:
+            conn.close()
+        return dict(row) if row else None
+
+    def release(self):
+        """Stop heartbeating and hand the lease back so a standby can take over at once"""
+        self._stop.set()
+        with self._lock:
+            self._leader_until = 0.0
+        try:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (self.name, self.holder_id))
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not release {self.name} lease: {e}")
+
+
+_lease = None
+_lease_lock = threading.Lock()
+
+
+def get_sender_lease():
+    """Get this process's lease on the right to send scheduled reminders"""
+    global _lease
+    if _lease is None:
+        with _lease_lock:
+            if _lease is None:
+                _lease = LeaderLease()
+                atexit.register(_lease.release)
+    return _lease
+
+
+def is_sender_leader():
+    """Convenience function: True if this process should run the automatic send loop"""
+    return get_sender_lease().is_leader()
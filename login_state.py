@@ -0,0 +1,225 @@
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+LOGIN_STATE_DB = "login_state.db"
+
+# last_login stamps for clean logins are buffered and written together at most this often
+FLUSH_INTERVAL = float(os.environ.get('LOGIN_STATE_FLUSH_INTERVAL', 5))
+MAX_PENDING = 100
+
+def _state(login_attempts=0, locked_until=None, last_login=None):
+    return {'login_attempts': login_attempts or 0, 'locked_until': locked_until, 'last_login': last_login}
+
+
+class LoginStateStore:
+    """Failed-attempt counters, lockouts and last login times, kept apart from credentials.
+
+    One small SQLite row per account (realm 'admin' or 'user') replaces
+    rewriting the whole credential file on every login. Failures and lockouts
+    are read-modify-written inside one IMMEDIATE transaction so concurrent
+    attempts are never lost; last_login stamps from clean logins are coalesced
+    and flushed in a single transaction.
+
+    Accounts without a row fall back to the login fields still stored in
+    their credential record, so existing files need no migration.
+    """
+
+    def __init__(self, db_file=LOGIN_STATE_DB, flush_interval=FLUSH_INTERVAL):
+        self.db_file = db_file
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending = {}  # (realm, email) -> last_login awaiting flush
+        self._last_flush = time.monotonic()
+        self._init_schema()
+
+    def _connect(self):
+        """Return this thread's connection (sqlite3 connections are per-thread)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        self._connect().execute("""
+            CREATE TABLE IF NOT EXISTS login_state (
+                realm TEXT NOT NULL,
+                email TEXT NOT NULL,
+                login_attempts INTEGER NOT NULL DEFAULT 0,
+                locked_until TEXT,
+                last_login TEXT,
+                PRIMARY KEY (realm, email)
+            )
+        """)
+
+    def _row(self, conn, realm, email):
+        row = conn.execute(
+            "SELECT login_attempts, locked_until, last_login FROM login_state WHERE realm = ? AND email = ?",
+            (realm, email)
+        ).fetchone()
+        return _state(**dict(row)) if row else None
+
+    def _write(self, conn, realm, email, state):
+        conn.execute(
+            """
+            INSERT INTO login_state (realm, email, login_attempts, locked_until, last_login)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (realm, email) DO UPDATE SET
+                login_attempts = excluded.login_attempts,
+                locked_until = excluded.locked_until,
+                last_login = excluded.last_login
+            """,
+            (realm, email, state['login_attempts'], state['locked_until'], state['last_login'])
+        )
+
+    def _with_pending(self, realm, email, state):
+        with self._lock:
+            pending = self._pending.get((realm, email))
+        if pending:
+            state = dict(state, last_login=pending)
+        return state
+
+    def get(self, realm, email, fallback=None):
+        """Login state for an account; fallback is its credential record for accounts without a row"""
+        state = self._row(self._connect(), realm, email)
+        if state is None:
+            fallback = fallback or {}
+            state = _state(fallback.get('login_attempts'), fallback.get('locked_until'), fallback.get('last_login'))
+        return self._with_pending(realm, email, state)
+
+    def get_all(self, realm):
+        """{email: state} for every account in a realm that has stored or buffered state"""
+        rows = self._connect().execute(
+            "SELECT email, login_attempts, locked_until, last_login FROM login_state WHERE realm = ?", (realm,)
+        ).fetchall()
+        states = {row['email']: _state(row['login_attempts'], row['locked_until'], row['last_login']) for row in rows}
+        with self._lock:
+            pending = [(email, stamp) for (r, email), stamp in self._pending.items() if r == realm]
+        for email, stamp in pending:
+            states.setdefault(email, _state())['last_login'] = stamp
+        return states
+
+    def overlay(self, realm, accounts):
+        """Replace the login fields of {email: record} with the stored state, in place"""
+        for email, state in self.get_all(realm).items():
+            if email in accounts:
+                accounts[email].update(state)
+        return accounts
+
+    def record_failure(self, realm, email, max_attempts, lock_for, fallback=None):
+        """Count a failed attempt and lock the account once max_attempts is reached.
+
+        Returns the new state plus 'locked' (True if this attempt locked it).
+        """
+        now = datetime.now()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            state = self._row(conn, realm, email) or self.get(realm, email, fallback)
+            if state['locked_until'] and datetime.fromisoformat(state['locked_until']) <= now:
+                # An expired lock starts a fresh count
+                state.update(login_attempts=0, locked_until=None)
+            state['login_attempts'] += 1
+            locked = state['login_attempts'] >= max_attempts and not state['locked_until']
+            if locked:
+                state['locked_until'] = (now + lock_for).isoformat()
+            self._write(conn, realm, email, state)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return dict(self._with_pending(realm, email, state), locked=locked)
+
+    def record_success(self, realm, email, fallback=None):
+        """Clear failures and stamp last_login; the stamp alone is buffered"""
+        stamp = datetime.now().isoformat()
+        state = self.get(realm, email, fallback)
+        if state['login_attempts'] or state['locked_until']:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._write(conn, realm, email, _state(0, None, stamp))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            with self._lock:
+                self._pending.pop((realm, email), None)
+        else:
+            with self._lock:
+                self._pending[(realm, email)] = stamp
+            self._maybe_flush()
+        return _state(0, None, stamp)
+
+    def reset(self, realm, email):
+        """Clear failed attempts and any automatic lock (admin unlock / reset)"""
+        conn = self._connect()
+        conn.execute(
+            "UPDATE login_state SET login_attempts = 0, locked_until = NULL WHERE realm = ? AND email = ?",
+            (realm, email)
+        )
+
+    def forget(self, realm, email):
+        """Drop the state of a deleted account"""
+        with self._lock:
+            self._pending.pop((realm, email), None)
+        self._connect().execute("DELETE FROM login_state WHERE realm = ? AND email = ?", (realm, email))
+
+    def _maybe_flush(self):
+        with self._lock:
+            due = len(self._pending) >= MAX_PENDING or time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write buffered last_login stamps in one transaction"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                """
+                INSERT INTO login_state (realm, email, last_login) VALUES (?, ?, ?)
+                ON CONFLICT (realm, email) DO UPDATE SET last_login = excluded.last_login
+                """,
+                [(realm, email, stamp) for (realm, email), stamp in pending.items()]
+            )
+            conn.execute("COMMIT")
+        except Exception as e:
+            conn.execute("ROLLBACK")
+            logger.error(f"Could not flush login times: {e}")
+            with self._lock:
+                for key, stamp in pending.items():
+                    self._pending.setdefault(key, stamp)
+            return 0
+        return len(pending)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_login_state_store():
+    """Get the process-wide login state store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = LoginStateStore()
+                atexit.register(_store.flush)
+    return _store
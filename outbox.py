@@ -0,0 +1,144 @@
+import logging
+import os
+import random
+from datetime import datetime, timedelta
+
+import reminder_store
+from send_engine import get_send_engine
+
+logger = logging.getLogger(__name__)
+
+# Messages claimed from the outbox per delivery round
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 500))
+# Failed deliveries are retried with exponential backoff: base, 2x base, 4x base... capped at the maximum
+RETRY_BASE_SECONDS = float(os.environ.get('OUTBOX_RETRY_BASE_SECONDS', 30))
+RETRY_MAX_SECONDS = float(os.environ.get('OUTBOX_RETRY_MAX_SECONDS', 3600))
+# Delivery attempts before a message becomes a dead letter
+MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 5))
+
+
+def render_message(reminder, sender_email):
+    """Outbox message (recipient, subject, body) for a reminder row"""
+    # Safely get header name with fallback for old data
+    header_name = reminder.get('Header Name') or reminder.get('Agreement Name') or 'Reminder'
+    return {
+        'reminder_id': reminder['ID'],
+        'sender': sender_email,
+        'recipient': reminder['Email'],
+        'subject': f"Reminder - {header_name}",
+        'body': f"Dear {reminder['Name']},\n\n{reminder['Message']}\n\nRegards,\nAccounts Team"
+    }
+
+
+def enqueue_reminders(reminders, sender_email):
+    """Claim reminders and queue their rendered messages in one store transaction; returns the outbox ids"""
+    return reminder_store.enqueue_outbox([render_message(reminder, sender_email) for reminder in reminders])
+
+
+def retry_delay(attempts):
+    """Seconds to wait before retrying a message that has failed attempts times.
+
+    Exponential backoff with equal jitter: somewhere between half and all of
+    the capped delay, so messages that failed together don't retry together.
+    """
+    ceiling = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+def has_backlog():
+    """True if messages are waiting in the outbox: retries, and ones a crashed worker left delivering"""
+    counts = reminder_store.outbox_counts()
+    return counts.get(reminder_store.OUTBOX_QUEUED, 0) + counts.get(reminder_store.OUTBOX_DELIVERING, 0) > 0
+
+
+def drain_outbox(send, ids=None, backlog_only=False, batch_size=OUTBOX_BATCH_SIZE):
+    """Deliver claimed outbox messages concurrently through the send engine.
+
+    send(message) delivers one message and returns True on success. Each
+    message's outcome is recorded on its own outbox row, so a crash loses at
+    most the messages in flight. A failed message is queued again after
+    retry_delay() until it has had MAX_ATTEMPTS tries, then dead-lettered.
+
+    A rate-limited batch can take longer than the sending timeout to work
+    through, so each message restarts its timeout as it goes out, and one
+    that another worker reclaimed while it waited is left to that worker.
+
+    With ids, only those messages are delivered, each once, claimed
+    batch_size ids at a time; otherwise rounds continue until nothing
+    claimable is left. Returns {outbox_id: delivered}.
+    """
+    results = {}
+    reclaimed = set()
+
+    def deliver(message):
+        if not reminder_store.touch_outbox(message['id'], message['state_at']):
+            reclaimed.add(message['id'])
+            return False
+        if not send(message):
+            return False
+        reminder_store.complete_outbox(message['id'])
+        return True
+
+    for messages in _claim_rounds(ids, backlog_only, batch_size):
+        for result in get_send_engine().send_all(messages, deliver, lambda message: message['sender']):
+            message = result['item']
+            if message['id'] in reclaimed:
+                logger.warning(f"Outbox message {message['id']} was reclaimed by another worker before it went out")
+                continue
+            results[message['id']] = result['success']
+            if not result['success']:
+                # No-op if the message was already closed
+                fail_message(message, result['error'] or 'SMTP send failed')
+
+    if results:
+        delivered = len([ok for ok in results.values() if ok])
+        logger.info(f"Delivered {delivered}/{len(results)} outbox messages")
+    return results
+
+
+def _claim_rounds(ids, backlog_only, batch_size):
+    """Yield each round's claimed messages for drain_outbox"""
+    if ids is None:
+        while True:
+            messages = reminder_store.claim_outbox(limit=batch_size, backlog_only=backlog_only)
+            if not messages:
+                return
+            yield messages
+    ids = list(ids)
+    # One slice of the given ids per round, so each claim binds at most batch_size ids
+    for start in range(0, len(ids), batch_size):
+        messages = reminder_store.claim_outbox(ids=ids[start:start + batch_size], limit=batch_size,
+                                               backlog_only=backlog_only)
+        if messages:
+            yield messages
+
+
+def fail_message(message, error):
+    """Schedule a claimed message's next attempt, or dead-letter it once it is out of attempts"""
+    if message['attempts'] >= MAX_ATTEMPTS:
+        logger.error(f"Giving up on outbox message {message['id']} to {message['recipient']} "
+                     f"after {message['attempts']} attempts: {error}")
+        return reminder_store.fail_outbox(message['id'], error)
+    retry_at = datetime.now() + timedelta(seconds=retry_delay(message['attempts']))
+    logger.warning(f"Outbox message {message['id']} to {message['recipient']} failed ({error}), "
+                   f"retrying at {retry_at.strftime('%H:%M:%S')}")
+    return reminder_store.fail_outbox(message['id'], error, retry_at=retry_at)
+
+
+def redrive_dead_letters(ids=None):
+    """Queue dead letters again, re-rendered from their reminders' current details.
+
+    ids limits the re-drive to those messages. Reminders that were deleted,
+    deactivated or sent since are skipped. The SQLite backend requeues the
+    whole batch in one transaction; the messages are delivered by the next
+    backlog drain. Returns the outbox ids queued.
+    """
+    messages = []
+    for letter in reminder_store.dead_letters(ids):
+        reminder = reminder_store.get_reminder(letter['reminder_id'])
+        if reminder is not None:
+            messages.append(render_message(reminder, letter['sender']))
+    queued = reminder_store.enqueue_outbox(messages) if messages else []
+    if queued:
+        logger.info(f"Re-drove {len(queued)} dead letters")
+    return queued
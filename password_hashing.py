@@ -0,0 +1,184 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+logger = logging.getLogger(__name__)
+
+# bcrypt cost factor; each step doubles the work, so it is clamped to a sane range
+MIN_ROUNDS = 4
+MAX_ROUNDS = 15
+BCRYPT_ROUNDS = min(MAX_ROUNDS, max(MIN_ROUNDS, int(os.environ.get('BCRYPT_ROUNDS', 12))))
+
+# Worker processes for hashing; 0 hashes inline on the calling thread
+HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+HASH_TIMEOUT = 30
+
+METRICS_WINDOW = 500
+
+_COST_PATTERN = re.compile(r'^\$2[abxy]?\$(\d{2})\$')
+
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _checkpw(password, hashed):
+    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+
+def hash_cost(hashed):
+    """Cost factor encoded in a bcrypt hash, or None if it is not one"""
+    match = _COST_PATTERN.match(hashed or '')
+    return int(match.group(1)) if match else None
+
+
+class PasswordHasher:
+    """Runs bcrypt in a small process pool so logins don't stall the app.
+
+    bcrypt is deliberately CPU-bound; hashing in worker processes keeps a
+    burst of logins from monopolising the Streamlit server's threads and
+    lets them use every core. If the pool cannot start or breaks, work falls
+    back to running inline. Verification latency is recorded for metrics.
+    """
+
+    def __init__(self, rounds=BCRYPT_ROUNDS, workers=HASH_WORKERS, timeout=HASH_TIMEOUT):
+        self.rounds = min(MAX_ROUNDS, max(MIN_ROUNDS, rounds))
+        self.workers = workers
+        self.timeout = timeout
+        self._pool = None
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=METRICS_WINDOW)
+        self._counters = {'verifications': 0, 'failures': 0, 'hashes': 0, 'rehashes': 0, 'inline_fallbacks': 0}
+
+    def _get_pool(self):
+        if self.workers <= 0:
+            return None
+        with self._lock:
+            if self._pool is None:
+                try:
+                    # spawn: forking a threaded server process is unsafe
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Password hashing pool unavailable, hashing inline: {e}")
+                    self.workers = 0
+            return self._pool
+
+    def _run(self, func, *args):
+        pool = self._get_pool()
+        if pool is not None:
+            future = None
+            try:
+                future = pool.submit(func, *args)
+                return future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                # A busy or stuck pool shouldn't fail the login; do this one inline instead
+                future.cancel()
+                logger.warning(f"Password hashing pool took over {self.timeout}s, hashing inline")
+            except BrokenProcessPool as e:
+                logger.warning(f"Password hashing pool broke, restarting it: {e}")
+                with self._lock:
+                    if self._pool is pool:
+                        self._pool = None
+                pool.shutdown(wait=False)
+        self._record('inline_fallbacks')
+        return func(*args)
+
+    def _record(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def hash(self, password):
+        """bcrypt hash of password at the configured cost"""
+        self._record('hashes')
+        return self._run(_hashpw, password, self.rounds)
+
+    def verify(self, password, hashed):
+        """Check password against a bcrypt hash; malformed hashes never match"""
+        start = time.perf_counter()
+        try:
+            return self._run(_checkpw, password, hashed)
+        except ValueError:
+            logger.warning("Rejected login against a malformed password hash")
+            return False
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._counters['verifications'] += 1
+                self._latencies.append(elapsed)
+
+    def needs_rehash(self, hashed):
+        """True when a hash was made at a different cost than configured"""
+        return hash_cost(hashed) != self.rounds
+
+    def rehash(self, password):
+        """New hash for a password that just verified against an outdated one"""
+        self._record('rehashes')
+        return self.hash(password)
+
+    def record_failure(self):
+        self._record('failures')
+
+    def get_metrics(self):
+        """Counters plus verification latency stats (seconds) over the recent window"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            metrics = dict(self._counters)
+        metrics['rounds'] = self.rounds
+        metrics['workers'] = self.workers
+        if latencies:
+            metrics['latency_avg'] = sum(latencies) / len(latencies)
+            metrics['latency_p50'] = latencies[len(latencies) // 2]
+            metrics['latency_p95'] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            metrics['latency_max'] = latencies[-1]
+        return metrics
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+
+def get_password_hasher():
+    """Get the process-wide password hasher"""
+    global _hasher
+    if _hasher is None:
+        with _hasher_lock:
+            if _hasher is None:
+                _hasher = PasswordHasher()
+                atexit.register(_hasher.shutdown)
+    return _hasher
+
+
+def hash_password(password):
+    """Convenience function to hash a password at the configured cost"""
+    return get_password_hasher().hash(password)
+
+
+def verify_password(password, hashed):
+    """Convenience function to verify a password off the calling thread"""
+    return get_password_hasher().verify(password, hashed)
+
+
+def needs_rehash(hashed):
+    """Convenience function to check a hash against the configured cost"""
+    return get_password_hasher().needs_rehash(hashed)
+
+
+def get_hash_metrics():
+    """Convenience function for password hashing metrics"""
+    return get_password_hasher().get_metrics()
@@ -0,0 +1,1579 @@
+import calendar
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import date, datetime, timedelta, timezone, time as dt_time
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import pandas as pd
+
+from file_cache import file_signature
+
+logger = logging.getLogger(__name__)
+
+# Constants
+EXCEL_FILE = "payment_reminders.xlsx"
+DB_FILE = "payment_reminders.db"
+SHEET_NAME = "Reminders"
+DEFAULT_BACKEND = "sqlite"
+
+# IANA timezone for reminders without a Timezone value; unset means the server's local time
+DEFAULT_TIMEZONE = os.environ.get('REMINDER_TIMEZONE') or None
+
+# Delivery states for a reminder: pending -> sending -> sent/failed
+SEND_PENDING = "pending"
+SEND_SENDING = "sending"
+SEND_SENT = "sent"
+SEND_FAILED = "failed"
+
+# A reminder stuck in 'sending' longer than this (crashed worker) may be claimed again
+SENDING_TIMEOUT_SECONDS = 600
+
+# Most outbox ids bound into one "id IN (...)" list; longer lists are split to stay under SQLite's variable limit
+MAX_BOUND_IDS = 500
+
+REMINDER_COLUMNS = ['ID', 'Name', 'Email', 'Header Name', 'Due Date', 'Due Time', 'Message', 'Status', 'Last Sent', 'Created At',
+                    'Send State', 'Send Error', 'Send State At', 'Recurrence', 'Timezone']
+
+# Values for the optional Recurrence column; empty means a one-off reminder
+RECURRENCES = ('daily', 'weekly', 'monthly')
+
+# DataFrame column -> SQLite column
+SQL_COLUMNS = {
+    'ID': 'id',
+    'Name': 'name',
+    'Email': 'email',
+    'Header Name': 'header_name',
+    'Due Date': 'due_date',
+    'Due Time': 'due_time',
+    'Message': 'message',
+    'Status': 'status',
+    'Last Sent': 'last_sent',
+    'Created At': 'created_at',
+    'Send State': 'send_state',
+    'Send Error': 'send_error',
+    'Send State At': 'send_state_at',
+    'Recurrence': 'recurrence',
+    'Timezone': 'timezone'
+}
+
+# Columns added after the first schema version: name -> SQL definition
+ADDED_COLUMNS = {
+    'send_state': "TEXT DEFAULT 'pending'",
+    'send_error': "TEXT",
+    'send_state_at': "TEXT",
+    'recurrence': "TEXT",
+    'timezone': "TEXT",
+    'scheduled_ts': "INTEGER",
+    'next_run_ts': "INTEGER"
+}
+
+# One row per (reminder, scheduled occurrence) that a scheduler claimed, so an
+# occurrence is sent once however often the reminder's own Send State is reset
+SEND_LEDGER_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS send_ledger (
+        reminder_id TEXT NOT NULL,
+        occurrence_ts INTEGER NOT NULL,
+        state TEXT NOT NULL,
+        state_at TEXT NOT NULL,
+        error TEXT,
+        PRIMARY KEY (reminder_id, occurrence_ts)
+    ) WITHOUT ROWID
+"""
+
+# Outbox message states
+OUTBOX_QUEUED = "queued"
+OUTBOX_DELIVERING = "delivering"
+OUTBOX_DELIVERED = "delivered"
+# Out of retries; kept as a dead letter until it is re-driven
+OUTBOX_DEAD = "dead"
+
+# Rendered messages waiting for delivery, written in the same transaction as the claim
+OUTBOX_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        reminder_id TEXT NOT NULL,
+        occurrence_ts INTEGER,
+        sender TEXT,
+        recipient TEXT NOT NULL,
+        subject TEXT,
+        body TEXT,
+        state TEXT NOT NULL,
+        state_at TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        error TEXT,
+        created_at TEXT NOT NULL,
+        next_attempt_at TEXT,
+        UNIQUE (reminder_id, occurrence_ts)
+    )
+"""
+OUTBOX_FIELDS = ('id', 'reminder_id', 'occurrence_ts', 'sender', 'recipient', 'subject', 'body',
+                 'state', 'state_at', 'attempts', 'error', 'created_at', 'next_attempt_at')
+
+# Derived columns: UTC epoch seconds of the due time, and the same instant on the server's clock
+SCHEDULED_TS_COLUMN = 'Scheduled TS'
+SCHEDULED_COLUMN = 'Scheduled At'
+
+
+def _is_missing(value):
+    """True for None/NaN/NaT and empty strings"""
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return value.strip() == ''
+    try:
+        return bool(pd.isna(value))
+    except (TypeError, ValueError):
+        return False
+
+
+def normalize_due_date(value):
+    """Normalize a Due Date cell to 'YYYY-MM-DD'"""
+    if _is_missing(value):
+        return None
+    if isinstance(value, (datetime, pd.Timestamp)):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, str):
+        # Stored and form values are already ISO; skip the much slower pandas parser for them
+        try:
+            return datetime.fromisoformat(value.strip()).strftime('%Y-%m-%d')
+        except ValueError:
+            pass
+    try:
+        return pd.to_datetime(value).strftime('%Y-%m-%d')
+    except Exception:
+        return str(value)
+
+
+def normalize_due_dates(series):
+    """Vectorized normalize_due_date for a whole Due Date column, used by bulk writes"""
+    parsed = pd.to_datetime(series, errors='coerce')
+    # Cells pandas can't parse keep their value and go through the scalar path
+    return parsed.dt.strftime('%Y-%m-%d').where(parsed.notna(), series)
+
+
+def normalize_due_time(value):
+    """Normalize a Due Time cell to 'HH:MM'"""
+    if _is_missing(value):
+        return '09:00'
+    if isinstance(value, (datetime, pd.Timestamp, dt_time)):
+        return value.strftime('%H:%M')
+    value = str(value).strip()
+    # Excel round-trips sometimes turn 09:00 into 09:00:00
+    if len(value) == 8 and value.count(':') == 2:
+        return value[:5]
+    return value
+
+
+def normalize_cell(value):
+    """Convert a DataFrame cell into a value SQLite/JSON can store"""
+    if _is_missing(value):
+        return None
+    if isinstance(value, (datetime, pd.Timestamp)):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        # numpy scalars
+        return value.item()
+    return value
+
+
+def normalize_record(record):
+    """Normalize a reminder dict keyed by DataFrame column names"""
+    normalized = {}
+    for key, value in record.items():
+        if key == 'Due Date':
+            normalized[key] = normalize_due_date(value)
+        elif key == 'Due Time':
+            normalized[key] = normalize_due_time(value)
+        else:
+            normalized[key] = normalize_cell(value)
+    return normalized
+
+
+@lru_cache(maxsize=None)
+def _zone(name):
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning(f"Unknown timezone {name!r}, using server local time")
+        return None
+
+
+def reminder_timezone(name=None):
+    """tzinfo for a reminder's Timezone value, or None for the server's local time"""
+    name = '' if _is_missing(name) else str(name).strip()
+    name = name or DEFAULT_TIMEZONE
+    return _zone(name) if name else None
+
+
+@lru_cache(maxsize=1)
+def _server_zone():
+    """Named local zone for vectorized conversions (tzlocal ships with APScheduler)"""
+    try:
+        from tzlocal import get_localzone
+        return get_localzone()
+    except Exception:
+        return datetime.now().astimezone().tzinfo
+
+
+def _localize(wall_clock, tz_name=None):
+    """Attach the reminder's timezone to a naive wall-clock datetime"""
+    tz = reminder_timezone(tz_name)
+    return wall_clock.replace(tzinfo=tz) if tz else wall_clock.astimezone()
+
+
+def _wall_clock(moment, tz_name=None):
+    """Naive wall-clock time of an aware datetime in the reminder's timezone"""
+    tz = reminder_timezone(tz_name)
+    return (moment.astimezone(tz) if tz else moment.astimezone()).replace(tzinfo=None)
+
+
+def scheduled_at_for(due_date, due_time, tz_name=None):
+    """Due Date + Due Time in the reminder's timezone as an aware UTC datetime, or None"""
+    return _scheduled_at(normalize_due_date(due_date), due_time, tz_name)
+
+
+def _scheduled_at(due_date, due_time, tz_name=None):
+    """scheduled_at_for with a Due Date already normalized to 'YYYY-MM-DD'"""
+    if not due_date:
+        return None
+    try:
+        wall_clock = datetime.strptime(f"{due_date} {normalize_due_time(due_time)}", '%Y-%m-%d %H:%M')
+    except ValueError:
+        return None
+    return _localize(wall_clock, tz_name).astimezone(timezone.utc)
+
+
+def next_occurrence(scheduled_at, recurrence, tz_name=None):
+    """The run after scheduled_at for a recurring reminder, or None for one-off reminders.
+
+    Steps are taken on the reminder's wall clock so a 09:00 reminder stays
+    at 09:00 across DST changes; monthly runs clamp to the end of short months.
+    """
+    recurrence = str(recurrence or '').strip().lower()
+    if scheduled_at is None or recurrence not in RECURRENCES:
+        return None
+    local = _wall_clock(scheduled_at, tz_name)
+    if recurrence == 'daily':
+        local += timedelta(days=1)
+    elif recurrence == 'weekly':
+        local += timedelta(days=7)
+    else:
+        year, month = (local.year + 1, 1) if local.month == 12 else (local.year, local.month + 1)
+        local = local.replace(year=year, month=month, day=min(local.day, calendar.monthrange(year, month)[1]))
+    return _localize(local, tz_name).astimezone(timezone.utc)
+
+
+def to_epoch(value):
+    """UTC epoch seconds for a datetime; naive values are taken as server local time"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return int(value.timestamp())
+
+
+def from_epoch(seconds):
+    """Aware UTC datetime for epoch seconds"""
+    return datetime.fromtimestamp(seconds, timezone.utc)
+
+
+def _stale_sending_cutoff():
+    """Timestamp before which a 'sending' claim is considered abandoned"""
+    return (datetime.now() - timedelta(seconds=SENDING_TIMEOUT_SECONDS)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _can_transition(reminder, allowed_states):
+    """Check a reminder dict against the allowed source send states"""
+    state = reminder.get('Send State') or (SEND_SENT if reminder.get('Last Sent') else SEND_PENDING)
+    if state in allowed_states:
+        return True
+    # Reclaim reminders whose sender died mid-send
+    if SEND_PENDING in allowed_states and state == SEND_SENDING:
+        return (reminder.get('Send State At') or '') < _stale_sending_cutoff()
+    return False
+
+
+def _create_ledger_tables(conn):
+    conn.execute(SEND_LEDGER_SCHEMA)
+    conn.execute(OUTBOX_SCHEMA)
+    # Outboxes created before retries had no backoff column
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(outbox)").fetchall()}
+    if 'next_attempt_at' not in columns:
+        conn.execute("ALTER TABLE outbox ADD COLUMN next_attempt_at TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_state ON outbox(state, id)")
+
+
+def _begin_immediate(conn):
+    """Take the write lock up front so concurrent claimers queue instead of deadlocking"""
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+
+
+def _claim_occurrence(conn, reminder_id, occurrence_ts):
+    """Claim one occurrence in the send ledger; False if it was already sent or is being sent.
+
+    A 'sending' entry left by a dead sender is reclaimable, unless the
+    occurrence is still sitting in the outbox waiting for delivery or a retry.
+    """
+    cursor = conn.execute(
+        """
+        INSERT INTO send_ledger (reminder_id, occurrence_ts, state, state_at) VALUES (?, ?, ?, ?)
+        ON CONFLICT (reminder_id, occurrence_ts) DO UPDATE SET
+            state = excluded.state, state_at = excluded.state_at, error = NULL
+        WHERE (send_ledger.state = ? OR (send_ledger.state = ? AND send_ledger.state_at < ?))
+          AND NOT EXISTS (SELECT 1 FROM outbox
+                          WHERE outbox.reminder_id = excluded.reminder_id
+                            AND outbox.occurrence_ts = excluded.occurrence_ts AND outbox.state != ?)
+        """,
+        (reminder_id, occurrence_ts, SEND_SENDING, datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+         SEND_FAILED, SEND_SENDING, _stale_sending_cutoff(), OUTBOX_DEAD)
+    )
+    return cursor.rowcount == 1
+
+
+def _finish_occurrence(conn, reminder_id, state, state_at=None, error=None):
+    """Record the outcome of a reminder's claimed occurrence in the send ledger"""
+    conn.execute(
+        "UPDATE send_ledger SET state = ?, state_at = ?, error = ? WHERE reminder_id = ? AND state = ?",
+        (state, state_at or datetime.now().strftime('%Y-%m-%d %H:%M:%S'), error, reminder_id, SEND_SENDING)
+    )
+
+
+def _ledger_entries(conn, reminder_id):
+    rows = conn.execute(
+        "SELECT occurrence_ts, state, state_at, error FROM send_ledger WHERE reminder_id = ? ORDER BY occurrence_ts",
+        (reminder_id,)
+    ).fetchall()
+    return [dict(zip(('occurrence_ts', 'state', 'state_at', 'error'), row)) for row in rows]
+
+
+def _queue_message(conn, message, occurrence_ts):
+    """Insert a rendered message into the outbox (or re-drive a dead letter); its id, or None if already queued
+
+    A re-driven message starts over with a fresh attempt count and is due
+    at once, so the backlog drain picks it up.
+    """
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    cursor = conn.execute(
+        """
+        INSERT INTO outbox (reminder_id, occurrence_ts, sender, recipient, subject, body, state, state_at, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (reminder_id, occurrence_ts) DO UPDATE SET
+            sender = excluded.sender, recipient = excluded.recipient, subject = excluded.subject,
+            body = excluded.body, state = excluded.state, state_at = excluded.state_at, error = NULL,
+            attempts = 0, next_attempt_at = excluded.state_at
+        WHERE outbox.state = ?
+        """,
+        (message['reminder_id'], occurrence_ts, message.get('sender'), message['recipient'], message.get('subject'),
+         message.get('body'), OUTBOX_QUEUED, now, now, OUTBOX_DEAD)
+    )
+    if cursor.rowcount != 1:
+        return None
+    return conn.execute(
+        "SELECT id FROM outbox WHERE reminder_id = ? AND occurrence_ts IS ? ORDER BY id DESC LIMIT 1",
+        (message['reminder_id'], occurrence_ts)
+    ).fetchone()[0]
+
+
+def _id_chunks(ids):
+    """Split outbox ids into lists short enough to bind into one query"""
+    ids = list(ids)
+    return [ids[start:start + MAX_BOUND_IDS] for start in range(0, len(ids), MAX_BOUND_IDS)]
+
+
+def _claim_messages(conn, ids=None, limit=None, backlog_only=False):
+    """Move claimable outbox messages to delivering and return them as dicts.
+
+    Queued messages are claimable once their retry time (if any) has come;
+    delivering ones once they have waited past the sending timeout. The
+    backlog is everything except fresh messages the enqueuing sender is
+    about to deliver itself.
+    """
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    cutoff = _stale_sending_cutoff()
+    if backlog_only:
+        where = ("((state = ? AND (next_attempt_at <= ? OR (next_attempt_at IS NULL AND state_at < ?)))"
+                 " OR (state = ? AND state_at < ?))")
+        params = [OUTBOX_QUEUED, now, cutoff, OUTBOX_DELIVERING, cutoff]
+    else:
+        where = "((state = ? AND COALESCE(next_attempt_at, '') <= ?) OR (state = ? AND state_at < ?))"
+        params = [OUTBOX_QUEUED, now, OUTBOX_DELIVERING, cutoff]
+
+    _begin_immediate(conn)
+    messages = []
+    for chunk in ([None] if ids is None else _id_chunks(ids)):
+        remaining = limit - len(messages) if limit else None
+        if remaining is not None and remaining <= 0:
+            break
+        query, query_params = f"SELECT {', '.join(OUTBOX_FIELDS)} FROM outbox WHERE {where}", list(params)
+        if chunk is not None:
+            query += f" AND id IN ({', '.join('?' * len(chunk))})"
+            query_params += chunk
+        query += " ORDER BY id"
+        if remaining:
+            query += " LIMIT ?"
+            query_params.append(remaining)
+        messages += [dict(zip(OUTBOX_FIELDS, row)) for row in conn.execute(query, query_params).fetchall()]
+    conn.executemany(
+        "UPDATE outbox SET state = ?, state_at = ?, attempts = attempts + 1 WHERE id = ?",
+        [(OUTBOX_DELIVERING, now, message['id']) for message in messages]
+    )
+    for message in messages:
+        message.update(state=OUTBOX_DELIVERING, state_at=now, attempts=message['attempts'] + 1)
+    return messages
+
+
+def _touch_message(conn, outbox_id, claimed_at):
+    """Restart a delivering message's sending timeout; False if it was reclaimed since claimed_at"""
+    cursor = conn.execute(
+        "UPDATE outbox SET state_at = ? WHERE id = ? AND state = ? AND state_at = ?",
+        (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), outbox_id, OUTBOX_DELIVERING, claimed_at)
+    )
+    return cursor.rowcount == 1
+
+
+def _finish_message(conn, outbox_id, state, state_at=None, error=None, next_attempt_at=None):
+    """Close a delivering outbox message, or requeue it for next_attempt_at; returns its reminder_id and occurrence_ts, or None"""
+    row = conn.execute("SELECT reminder_id, occurrence_ts FROM outbox WHERE id = ?", (outbox_id,)).fetchone()
+    cursor = conn.execute(
+        "UPDATE outbox SET state = ?, state_at = ?, error = ?, next_attempt_at = ? WHERE id = ? AND state = ?",
+        (state, state_at or datetime.now().strftime('%Y-%m-%d %H:%M:%S'), error, next_attempt_at,
+         outbox_id, OUTBOX_DELIVERING)
+    )
+    if cursor.rowcount != 1:
+        return None
+    return {'reminder_id': row[0], 'occurrence_ts': row[1]}
+
+
+def _first_run_after(next_run, recurrence, now, tz_name=None):
+    """Step a recurring schedule forward until it is after now"""
+    while next_run is not None and next_run <= now:
+        next_run = next_occurrence(next_run, recurrence, tz_name)
+    return next_run
+
+
+def empty_reminders_frame():
+    """Empty DataFrame with the standard reminder columns"""
+    return pd.DataFrame(columns=REMINDER_COLUMNS)
+
+
+def add_scheduled_column(df):
+    """Return a copy of df with Due Date + Due Time converted once into UTC epoch seconds ('Scheduled TS').
+
+    Rows are localized per distinct Timezone value, so the work is a handful
+    of vectorized conversions rather than one parse per row.
+    """
+    df = df.copy()
+    if df.empty or 'Due Date' not in df.columns:
+        df[SCHEDULED_TS_COLUMN] = pd.Series(float('nan'), index=df.index)
+        return df
+
+    due_dates = pd.to_datetime(df['Due Date'], errors='coerce').dt.normalize()
+    if 'Due Time' in df.columns:
+        # 'HH:MM', 'HH:MM:SS' and datetime.time cells all stringify to a leading H:MM
+        parts = df['Due Time'].astype(str).str.extract(r'^\s*(\d{1,2}):(\d{2})')
+        hours = pd.to_numeric(parts[0], errors='coerce').fillna(9)
+        minutes = pd.to_numeric(parts[1], errors='coerce').fillna(0)
+    else:
+        hours, minutes = 9, 0
+    wall_clock = due_dates + pd.to_timedelta(hours * 60 + minutes, unit='m')
+
+    if 'Timezone' in df.columns:
+        zones = df['Timezone'].fillna('').astype(str).str.strip()
+    else:
+        zones = pd.Series('', index=df.index)
+
+    epoch = pd.Timestamp(0, tz='UTC')
+    scheduled = pd.Series(float('nan'), index=df.index)
+    for name in zones.unique():
+        rows = zones == name
+        tz = reminder_timezone(name) or _server_zone()
+        # Ambiguous times take the first (DST) reading and skipped times move
+        # forward an hour, matching zoneinfo's fold=0 used on the write path
+        aware = wall_clock[rows].dt.tz_localize(tz, ambiguous=[True] * int(rows.sum()),
+                                                nonexistent=pd.Timedelta(hours=1))
+        scheduled[rows] = (aware - epoch) // pd.Timedelta(seconds=1)
+    df[SCHEDULED_TS_COLUMN] = scheduled
+    return df
+
+
+def pending_mask(df):
+    """Boolean mask of active reminders that still have to be sent"""
+    if 'Status' in df.columns:
+        active = df['Status'].fillna('Active').replace('', 'Active') == 'Active'
+    else:
+        active = pd.Series(True, index=df.index)
+
+    if 'Last Sent' in df.columns:
+        last_sent = df['Last Sent']
+        unsent = last_sent.isna() | (last_sent.astype(str).str.strip() == '')
+    else:
+        unsent = pd.Series(True, index=df.index)
+    # Rows without a send state (older data) are pending until Last Sent is set
+    derived = unsent.map({True: SEND_PENDING, False: SEND_SENT})
+    if 'Send State' in df.columns:
+        state = df['Send State'].where(df['Send State'].notna() & (df['Send State'] != ''), derived)
+    else:
+        state = derived
+
+    pending = state == SEND_PENDING
+    if 'Send State At' in df.columns:
+        state_at = df['Send State At'].fillna('').astype(str)
+        pending |= (state == SEND_SENDING) & (state_at < _stale_sending_cutoff())
+    return active & pending
+
+
+def select_due_reminders(df, until=None, since=None, pending_only=True):
+    """Vectorized due set: reminders scheduled in [since, until], earliest first.
+
+    Either bound may be None for an open window; naive bounds are server
+    local time. With pending_only, rows that are inactive or already sent are
+    dropped. The result keeps the original columns plus 'Scheduled TS' and
+    'Scheduled At' (the due instant as a naive server-local datetime).
+    """
+    df = add_scheduled_column(df)
+    if df.empty:
+        df[SCHEDULED_COLUMN] = pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]')
+        return df
+    scheduled = df[SCHEDULED_TS_COLUMN]
+    mask = scheduled.notna()
+    if until is not None:
+        mask &= scheduled <= to_epoch(until)
+    if since is not None:
+        mask &= scheduled >= to_epoch(since)
+    if pending_only:
+        mask &= pending_mask(df)
+    due = df[mask].sort_values(SCHEDULED_TS_COLUMN, kind='stable')
+    due[SCHEDULED_COLUMN] = pd.to_datetime([datetime.fromtimestamp(ts) for ts in due[SCHEDULED_TS_COLUMN]])
+    return due
+
+
+class ReminderStore:
+    """Interface shared by all reminder storage backends"""
+
+    name = "base"
+
+    def __init__(self):
+        self._listeners = []
+        self._version = 0
+        self._cache = None
+        self._cache_lock = threading.Lock()
+
+    def subscribe(self, callback):
+        """Call callback(event, reminder_ids) after each write.
+
+        event is 'added', 'updated' or 'deleted' with the affected IDs, or
+        'reset' (reminder_ids None) when the whole set was replaced.
+        """
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self, event, reminder_ids=None):
+        self.invalidate_cache()
+        for callback in list(self._listeners):
+            try:
+                callback(event, reminder_ids)
+            except Exception as e:
+                logger.error(f"Reminder store listener failed on {event}: {e}")
+
+    def load_reminders(self):
+        """Return all reminders as a DataFrame"""
+        raise NotImplementedError
+
+    def data_signature(self):
+        """Cheap token that changes when another process writes the data, or None if unknown"""
+        return None
+
+    def invalidate_cache(self):
+        """Drop the cached DataFrame; every write through the store calls this"""
+        with self._cache_lock:
+            self._version += 1
+            self._cache = None
+
+    def load_reminders_cached(self):
+        """load_reminders(), reused until a write through this store or a change to its file.
+
+        Returns a copy, so callers may modify it freely.
+        """
+        signature = self.data_signature()
+        if signature is None:
+            return self.load_reminders()
+        with self._cache_lock:
+            key = (self._version, signature)
+            cached = self._cache
+        if cached is None or cached[0] != key:
+            cached = (key, self.load_reminders())
+            with self._cache_lock:
+                if self._version == key[0]:
+                    self._cache = cached
+        return cached[1].copy()
+
+    def save_reminders(self, df):
+        """Replace all stored reminders with the given DataFrame"""
+        raise NotImplementedError
+
+    def get_reminder(self, reminder_id):
+        """Return a single reminder as a dict, or None"""
+        raise NotImplementedError
+
+    def add_reminder(self, reminder):
+        """Insert a reminder and return its ID"""
+        raise NotImplementedError
+
+    def update_reminder(self, reminder_id, updates):
+        """Update fields of a single reminder, returns True if it existed"""
+        raise NotImplementedError
+
+    def delete_reminders(self, reminder_ids):
+        """Delete reminders by ID, returns number deleted"""
+        raise NotImplementedError
+
+    def begin_send(self, reminder_id):
+        """Atomically move an active reminder from pending/failed to sending.
+
+        Returns True only for the caller that won the claim, so concurrent
+        scheduler threads never send the same reminder twice. The claim is
+        also recorded in the send ledger under the reminder's scheduled
+        occurrence; an occurrence the ledger has as sent is never claimed
+        again, even if the reminder's Send State is reset by a stale save.
+        """
+        raise NotImplementedError
+
+    def complete_send(self, reminder_id, sent_at=None):
+        """Move a reminder from sending to sent and record Last Sent"""
+        raise NotImplementedError
+
+    def fail_send(self, reminder_id, error=None):
+        """Move a reminder from sending to failed"""
+        raise NotImplementedError
+
+    def send_ledger_entries(self, reminder_id):
+        """Send ledger rows (occurrence_ts, state, state_at, error) for a reminder, oldest first"""
+        raise NotImplementedError
+
+    def _outbox(self):
+        """Connection to the SQLite database holding the send ledger and outbox"""
+        raise NotImplementedError
+
+    def enqueue_outbox(self, messages):
+        """Claim each message's reminder and queue the rendered message for delivery.
+
+        messages are dicts with reminder_id, sender, recipient, subject and
+        body. Reminders already sent, being sent or queued are skipped.
+        Returns the outbox ids queued. The SQLite backend writes the whole
+        batch, claims included, in one transaction.
+        """
+        queued = []
+        for message in messages:
+            reminder_id = message['reminder_id']
+            if not self.begin_send(reminder_id):
+                continue
+            reminder = self.get_reminder(reminder_id)
+            occurrence_ts = to_epoch(scheduled_at_for(reminder.get('Due Date'), reminder.get('Due Time'),
+                                                      reminder.get('Timezone')))
+            with self._outbox() as conn:
+                outbox_id = _queue_message(conn, message, occurrence_ts)
+            if outbox_id is None:
+                self.fail_send(reminder_id, "Already in the outbox")
+            else:
+                queued.append(outbox_id)
+        return queued
+
+    def claim_outbox(self, ids=None, limit=None, backlog_only=False):
+        """Move queued messages, and ones whose delivery was abandoned, to delivering and return them.
+
+        Each message goes to exactly one caller, so delivery workers can drain
+        the outbox concurrently. ids limits the claim to those messages;
+        backlog_only takes only retries that are due and messages that have
+        waited past the sending timeout.
+        """
+        with self._outbox() as conn:
+            return _claim_messages(conn, ids, limit, backlog_only)
+
+    def touch_outbox(self, outbox_id, claimed_at):
+        """Mark a claimed message as going out now, so the sending timeout runs from here.
+
+        claimed_at is the state_at the claim returned. False means the
+        message waited past the timeout and another worker reclaimed it, so
+        this worker must not send it.
+        """
+        with self._outbox() as conn:
+            return _touch_message(conn, outbox_id, claimed_at)
+
+    def complete_outbox(self, outbox_id, sent_at=None):
+        """Record a delivered message: outbox row, ledger entry and reminder all become sent"""
+        sent_at = sent_at or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with self._outbox() as conn:
+            message = _finish_message(conn, outbox_id, OUTBOX_DELIVERED, sent_at)
+            if message is not None:
+                _finish_occurrence(conn, message['reminder_id'], SEND_SENT, sent_at)
+        if message is None:
+            return False
+        self.complete_send(message['reminder_id'], sent_at)
+        return True
+
+    def fail_outbox(self, outbox_id, error=None, retry_at=None):
+        """Record a failed delivery attempt.
+
+        With retry_at the message goes back in the queue until then and the
+        reminder stays claimed; without it the message becomes a dead letter
+        and the ledger entry and reminder are marked failed.
+        """
+        if retry_at is not None:
+            with self._outbox() as conn:
+                return _finish_message(conn, outbox_id, OUTBOX_QUEUED, error=error,
+                                       next_attempt_at=retry_at.strftime('%Y-%m-%d %H:%M:%S')) is not None
+        with self._outbox() as conn:
+            message = _finish_message(conn, outbox_id, OUTBOX_DEAD, error=error)
+            if message is not None:
+                _finish_occurrence(conn, message['reminder_id'], SEND_FAILED, error=error)
+        if message is None:
+            return False
+        self.fail_send(message['reminder_id'], error)
+        return True
+
+    def dead_letters(self, ids=None, limit=None):
+        """Outbox messages that ran out of retries, newest first"""
+        query = f"SELECT {', '.join(OUTBOX_FIELDS)} FROM outbox WHERE state = ?"
+        with self._outbox() as conn:
+            if ids is None:
+                rows = conn.execute(query + " ORDER BY state_at DESC, id DESC" + (" LIMIT ?" if limit else ""),
+                                    [OUTBOX_DEAD] + ([limit] if limit else [])).fetchall()
+            else:
+                rows = []
+                for chunk in _id_chunks(ids):
+                    rows += conn.execute(query + f" AND id IN ({', '.join('?' * len(chunk))})",
+                                         [OUTBOX_DEAD] + chunk).fetchall()
+        letters = [dict(zip(OUTBOX_FIELDS, row)) for row in rows]
+        if ids is not None:
+            letters.sort(key=lambda letter: (letter['state_at'], letter['id']), reverse=True)
+            letters = letters[:limit] if limit else letters
+        return letters
+
+    def outbox_counts(self):
+        """Number of outbox messages in each state"""
+        with self._outbox() as conn:
+            return dict(conn.execute("SELECT state, COUNT(*) FROM outbox GROUP BY state").fetchall())
+
+    def get_due_reminders(self, until, since=None):
+        """Active, pending reminders due in (since, until], oldest first.
+
+        Backends without an index fall back to scanning the DataFrame.
+        """
+        due = select_due_reminders(self.load_reminders(), until=until)
+        if since is not None:
+            due = due[due[SCHEDULED_TS_COLUMN] > to_epoch(since)]
+        due = due.drop(columns=[SCHEDULED_TS_COLUMN, SCHEDULED_COLUMN])
+        return [normalize_record(record) for record in due.to_dict('records')]
+
+    def count_pending(self, after=None):
+        """Number of active reminders still waiting to be sent, optionally due after a time"""
+        due = select_due_reminders(self.load_reminders(), since=after)
+        if after is not None:
+            due = due[due[SCHEDULED_TS_COLUMN] > to_epoch(after)]
+        return len(due)
+
+    def pending_schedule(self, after=None):
+        """(ID, scheduled UTC epoch seconds) of active reminders still waiting to be sent, oldest first"""
+        due = select_due_reminders(self.load_reminders(), since=after)
+        if after is not None:
+            due = due[due[SCHEDULED_TS_COLUMN] > to_epoch(after)]
+        return [(reminder_id, int(ts)) for reminder_id, ts in zip(due['ID'], due[SCHEDULED_TS_COLUMN])]
+
+    def advance_recurring(self, now=None):
+        """Move sent recurring reminders on to their next run and mark them pending again.
+
+        Runs missed while the app was down are skipped rather than sent late.
+        Returns the number of reminders advanced.
+        """
+        now = (now or datetime.now()).astimezone(timezone.utc)
+        df = self.load_reminders()
+        if df.empty or 'Recurrence' not in df.columns:
+            return 0
+        advanced = 0
+        for record in df[df['Recurrence'].notna()].to_dict('records'):
+            record = normalize_record(record)
+            if (record.get('Status') or 'Active') != 'Active' or record.get('Send State') != SEND_SENT:
+                continue
+            tz_name = record.get('Timezone')
+            scheduled_at = scheduled_at_for(record.get('Due Date'), record.get('Due Time'), tz_name)
+            if scheduled_at is None or scheduled_at > now:
+                continue
+            next_run = _first_run_after(next_occurrence(scheduled_at, record['Recurrence'], tz_name),
+                                        record['Recurrence'], now, tz_name)
+            if next_run is None:
+                continue
+            local = _wall_clock(next_run, tz_name)
+            if self.update_reminder(record['ID'], {
+                'Due Date': local.strftime('%Y-%m-%d'), 'Due Time': local.strftime('%H:%M'),
+                'Send State': SEND_PENDING, 'Send Error': None
+            }):
+                advanced += 1
+        return advanced
+
+    def import_excel(self, excel_file=EXCEL_FILE):
+        """Replace stored reminders with the contents of an Excel workbook"""
+        if not os.path.exists(excel_file):
+            return 0
+        df = pd.read_excel(excel_file, sheet_name=SHEET_NAME)
+        self.save_reminders(df)
+        return len(df)
+
+    def export_excel(self, excel_file=EXCEL_FILE):
+        """Write all stored reminders to an Excel workbook"""
+        df = self.load_reminders()
+        with pd.ExcelWriter(excel_file, engine='openpyxl') as writer:
+            df.to_excel(writer, sheet_name=SHEET_NAME, index=False)
+        return len(df)
+
+
+class ExcelReminderStore(ReminderStore):
+    """Legacy backend that keeps everything in payment_reminders.xlsx.
+
+    Every write rewrites the whole workbook, so row-level operations are
+    serialized with a lock. Use it for small installs or interchange only.
+    """
+
+    name = "excel"
+
+    def __init__(self, excel_file=EXCEL_FILE):
+        super().__init__()
+        self.excel_file = excel_file
+        # The workbook can't hold an indexed ledger, so it lives in a SQLite file beside it
+        self.ledger_file = os.path.splitext(excel_file)[0] + '_send_ledger.db'
+        self._ledger_local = threading.local()
+        self._lock = threading.RLock()
+
+    def load_reminders(self):
+        with self._lock:
+            if not os.path.exists(self.excel_file):
+                return empty_reminders_frame()
+            df = pd.read_excel(self.excel_file, sheet_name=SHEET_NAME)
+            if 'ID' not in df.columns:
+                df['ID'] = [str(uuid.uuid4()) for _ in range(len(df))]
+                self._write(df)
+            return df
+
+    def data_signature(self):
+        return file_signature(self.excel_file)
+
+    def _write(self, df):
+        with self._lock:
+            with pd.ExcelWriter(self.excel_file, engine='openpyxl') as writer:
+                df.to_excel(writer, sheet_name=SHEET_NAME, index=False)
+
+    def save_reminders(self, df):
+        self._write(df)
+        self._notify('reset')
+        return True
+
+    def get_reminder(self, reminder_id):
+        df = self.load_reminders()
+        match = df[df['ID'] == reminder_id] if not df.empty else df
+        if match.empty:
+            return None
+        reminder = normalize_record(match.iloc[0].to_dict())
+        if not reminder.get('Send State'):
+            # Workbooks written before send states existed
+            reminder['Send State'] = SEND_SENT if reminder.get('Last Sent') else SEND_PENDING
+        return reminder
+
+    def add_reminder(self, reminder):
+        with self._lock:
+            reminder = dict(reminder)
+            reminder.setdefault('ID', str(uuid.uuid4()))
+            df = self.load_reminders()
+            df = pd.concat([df, pd.DataFrame([reminder])], ignore_index=True)
+            self._write(df)
+        self._notify('added', [reminder['ID']])
+        return reminder['ID']
+
+    def update_reminder(self, reminder_id, updates):
+        with self._lock:
+            df = self.load_reminders()
+            if df.empty or reminder_id not in df['ID'].values:
+                return False
+            updates = dict(updates)
+            # A new due date/time means the reminder has to go out again
+            if ('Due Date' in updates or 'Due Time' in updates) and 'Send State' not in updates:
+                updates['Send State'] = SEND_PENDING
+            for key, value in updates.items():
+                if key not in df.columns:
+                    df[key] = None
+                df[key] = df[key].astype(object)
+                df.loc[df['ID'] == reminder_id, key] = value
+            self._write(df)
+        self._notify('updated', [reminder_id])
+        return True
+
+    def delete_reminders(self, reminder_ids):
+        with self._lock:
+            df = self.load_reminders()
+            if df.empty:
+                return 0
+            reminder_ids = list(reminder_ids)
+            remaining = df[~df['ID'].isin(reminder_ids)]
+            deleted = len(df) - len(remaining)
+            if deleted:
+                self._write(remaining)
+        if deleted:
+            self._notify('deleted', reminder_ids)
+        return deleted
+
+    def _transition(self, reminder_id, allowed_states, updates, require_active=False):
+        with self._lock:
+            reminder = self.get_reminder(reminder_id)
+            if reminder is None:
+                return False
+            if require_active and (reminder.get('Status') or 'Active') != 'Active':
+                return False
+            if not _can_transition(reminder, allowed_states):
+                return False
+            updates = dict(updates)
+            updates['Send State At'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            return self.update_reminder(reminder_id, updates)
+
+    def _ledger(self):
+        """This thread's connection to the sidecar send ledger and outbox"""
+        conn = getattr(self._ledger_local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.ledger_file, timeout=30)
+            with conn:
+                _create_ledger_tables(conn)
+            self._ledger_local.conn = conn
+        return conn
+
+    def _outbox(self):
+        return self._ledger()
+
+    def begin_send(self, reminder_id):
+        with self._lock:
+            reminder = self.get_reminder(reminder_id)
+            if reminder is None or (reminder.get('Status') or 'Active') != 'Active':
+                return False
+            if not _can_transition(reminder, (SEND_PENDING, SEND_FAILED)):
+                return False
+            occurrence_ts = to_epoch(scheduled_at_for(reminder.get('Due Date'), reminder.get('Due Time'),
+                                                      reminder.get('Timezone')))
+            if occurrence_ts is not None:
+                with self._ledger() as conn:
+                    if not _claim_occurrence(conn, reminder_id, occurrence_ts):
+                        return False
+            return self.update_reminder(reminder_id, {
+                'Send State': SEND_SENDING, 'Send Error': None,
+                'Send State At': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            })
+
+    def complete_send(self, reminder_id, sent_at=None):
+        sent_at = sent_at or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            # Ledger first: if the workbook write is lost the occurrence is still never resent
+            with self._ledger() as conn:
+                _finish_occurrence(conn, reminder_id, SEND_SENT, sent_at)
+            return self._transition(reminder_id, (SEND_SENDING,), {'Send State': SEND_SENT, 'Last Sent': sent_at})
+
+    def fail_send(self, reminder_id, error=None):
+        with self._lock:
+            with self._ledger() as conn:
+                _finish_occurrence(conn, reminder_id, SEND_FAILED, error=error)
+            return self._transition(reminder_id, (SEND_SENDING,), {'Send State': SEND_FAILED, 'Send Error': error})
+
+    def send_ledger_entries(self, reminder_id):
+        with self._lock:
+            return _ledger_entries(self._ledger(), reminder_id)
+
+    def export_excel(self, excel_file=EXCEL_FILE):
+        if os.path.abspath(excel_file) == os.path.abspath(self.excel_file):
+            return len(self.load_reminders())
+        return super().export_excel(excel_file)
+
+
+class SQLiteReminderStore(ReminderStore):
+    """Default backend: one row per reminder in an indexed SQLite table.
+
+    Row-level updates touch only the affected reminder instead of rewriting
+    the workbook. Columns outside REMINDER_COLUMNS are kept in a JSON
+    'extra' column so imports from older workbooks round-trip.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, db_file=DB_FILE, excel_file=EXCEL_FILE):
+        super().__init__()
+        self.db_file = db_file
+        self.excel_file = excel_file
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connect(self):
+        """Return this thread's connection (sqlite3 connections are per-thread)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def data_signature(self):
+        # Commits land in the -wal file until a checkpoint copies them into the database
+        return file_signature(self.db_file), file_signature(self.db_file + '-wal')
+
+    def _init_schema(self):
+        conn = self._connect()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS reminders (
+                    id TEXT PRIMARY KEY,
+                    name TEXT,
+                    email TEXT,
+                    header_name TEXT,
+                    due_date TEXT,
+                    due_time TEXT,
+                    message TEXT,
+                    status TEXT DEFAULT 'Active',
+                    last_sent TEXT,
+                    created_at TEXT,
+                    extra TEXT,
+                    position INTEGER
+                )
+            """)
+            self._add_missing_columns(conn)
+            # Due lookups are integer range scans on the precomputed UTC epoch
+            conn.execute("DROP INDEX IF EXISTS idx_reminders_due")
+            conn.execute("DROP INDEX IF EXISTS idx_reminders_scheduled")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_reminders_scheduled_ts ON reminders(scheduled_ts)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_reminders_status ON reminders(status)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_reminders_send_state ON reminders(send_state)")
+            conn.execute("CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value TEXT)")
+            _create_ledger_tables(conn)
+
+        # One-time migration from the legacy workbook
+        imported = conn.execute("SELECT value FROM store_meta WHERE key = 'excel_imported'").fetchone()
+        if imported is None:
+            count = conn.execute("SELECT COUNT(*) FROM reminders").fetchone()[0]
+            if count == 0 and self.excel_file and os.path.exists(self.excel_file):
+                try:
+                    imported_rows = self.import_excel(self.excel_file)
+                    logger.info(f"Imported {imported_rows} reminders from {self.excel_file} into {self.db_file}")
+                except Exception as e:
+                    logger.error(f"Could not import reminders from {self.excel_file}: {e}")
+                    return
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO store_meta (key, value) VALUES ('excel_imported', ?)",
+                    (datetime.now().isoformat(),)
+                )
+
+    def _add_missing_columns(self, conn):
+        """Upgrade databases created by older versions of this module"""
+        existing = {row['name'] for row in conn.execute("PRAGMA table_info(reminders)")}
+        for column, definition in ADDED_COLUMNS.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE reminders ADD COLUMN {column} {definition}")
+                if column == 'send_state':
+                    conn.execute(
+                        "UPDATE reminders SET send_state = CASE WHEN last_sent IS NULL THEN ? ELSE ? END",
+                        (SEND_PENDING, SEND_SENT)
+                    )
+        if 'scheduled_ts' not in existing:
+            rows = conn.execute("SELECT id, due_date, due_time, recurrence, timezone FROM reminders").fetchall()
+            conn.executemany(
+                "UPDATE reminders SET scheduled_ts = ?, next_run_ts = ? WHERE id = ?",
+                [self._schedule_columns(row['due_date'], row['due_time'], row['recurrence'], row['timezone'])
+                 + (row['id'],) for row in rows]
+            )
+
+    @staticmethod
+    def _schedule_columns(due_date, due_time, recurrence, tz_name):
+        """(scheduled_ts, next_run_ts) as stored, converted to UTC once per write.
+
+        due_date is the normalized value being stored, so it is not parsed again.
+        """
+        scheduled_at = _scheduled_at(due_date, due_time, tz_name)
+        return to_epoch(scheduled_at), to_epoch(next_occurrence(scheduled_at, recurrence, tz_name))
+
+    def _to_row(self, record, position=None):
+        """Split a reminder dict into SQLite column values"""
+        record = normalize_record(record)
+        if not record.get('ID'):
+            record['ID'] = str(uuid.uuid4())
+        if 'Due Time' not in record:
+            record['Due Time'] = normalize_due_time(None)
+        if 'Status' not in record:
+            record['Status'] = 'Active'
+        if not record.get('Send State'):
+            record['Send State'] = SEND_SENT if record.get('Last Sent') else SEND_PENDING
+        row = {sql: record.get(col) for col, sql in SQL_COLUMNS.items()}
+        extra = {k: v for k, v in record.items() if k not in SQL_COLUMNS and v is not None}
+        row['extra'] = json.dumps(extra, default=str) if extra else None
+        row['position'] = position
+        row['scheduled_ts'], row['next_run_ts'] = self._schedule_columns(
+            record.get('Due Date'), record.get('Due Time'), record.get('Recurrence'), record.get('Timezone'))
+        return row
+
+    def _from_row(self, row):
+        """Convert a SQLite row back into a reminder dict"""
+        record = {col: row[sql] for col, sql in SQL_COLUMNS.items()}
+        if row['extra']:
+            record.update(json.loads(row['extra']))
+        return record
+
+    def _insert_rows(self, conn, rows):
+        columns = list(SQL_COLUMNS.values()) + ['extra', 'position', 'scheduled_ts', 'next_run_ts']
+        placeholders = ', '.join(f":{c}" for c in columns)
+        conn.executemany(
+            f"INSERT OR REPLACE INTO reminders ({', '.join(columns)}) VALUES ({placeholders})",
+            rows
+        )
+
+    def load_reminders(self):
+        rows = self._connect().execute("SELECT * FROM reminders ORDER BY position, rowid").fetchall()
+        if not rows:
+            return empty_reminders_frame()
+        records = [self._from_row(row) for row in rows]
+        df = pd.DataFrame.from_records(records)
+        # Keep the standard columns first, extras after
+        extras = [c for c in df.columns if c not in REMINDER_COLUMNS]
+        return df[REMINDER_COLUMNS + extras]
+
+    def save_reminders(self, df):
+        if df is not None and not df.empty and 'Due Date' in df.columns:
+            # One vectorized parse for the column instead of one per row
+            df = df.assign(**{'Due Date': normalize_due_dates(df['Due Date'])})
+        records = df.to_dict('records') if df is not None else []
+        rows = [self._to_row(record, position) for position, record in enumerate(records)]
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM reminders")
+            self._insert_rows(conn, rows)
+        self._notify('reset')
+        return True
+
+    def get_reminder(self, reminder_id):
+        row = self._connect().execute("SELECT * FROM reminders WHERE id = ?", (reminder_id,)).fetchone()
+        return self._from_row(row) if row else None
+
+    def add_reminder(self, reminder):
+        conn = self._connect()
+        with conn:
+            position = conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM reminders").fetchone()[0]
+            row = self._to_row(reminder, position)
+            self._insert_rows(conn, [row])
+        self._notify('added', [row['id']])
+        return row['id']
+
+    def update_reminder(self, reminder_id, updates):
+        updates = normalize_record(updates)
+        conn = self._connect()
+        with conn:
+            row = conn.execute(
+                "SELECT extra, due_date, due_time, recurrence, timezone FROM reminders WHERE id = ?", (reminder_id,)
+            ).fetchone()
+            if row is None:
+                return False
+            assignments = {SQL_COLUMNS[k]: v for k, v in updates.items() if k in SQL_COLUMNS and k != 'ID'}
+            # A new due date/time means the reminder has to go out again
+            if ('due_date' in assignments or 'due_time' in assignments) and 'send_state' not in assignments:
+                assignments['send_state'] = SEND_PENDING
+            if {'due_date', 'due_time', 'recurrence', 'timezone'} & set(assignments):
+                assignments['scheduled_ts'], assignments['next_run_ts'] = self._schedule_columns(
+                    assignments.get('due_date', row['due_date']),
+                    assignments.get('due_time', row['due_time']),
+                    assignments.get('recurrence', row['recurrence']),
+                    assignments.get('timezone', row['timezone'])
+                )
+            extra_updates = {k: v for k, v in updates.items() if k not in SQL_COLUMNS}
+            if extra_updates:
+                extra = json.loads(row['extra']) if row['extra'] else {}
+                extra.update(extra_updates)
+                assignments['extra'] = json.dumps(extra, default=str)
+            if assignments:
+                sets = ', '.join(f"{column} = ?" for column in assignments)
+                conn.execute(
+                    f"UPDATE reminders SET {sets} WHERE id = ?",
+                    list(assignments.values()) + [reminder_id]
+                )
+        self._notify('updated', [reminder_id])
+        return True
+
+    def delete_reminders(self, reminder_ids):
+        reminder_ids = list(reminder_ids)
+        if not reminder_ids:
+            return 0
+        conn = self._connect()
+        with conn:
+            cursor = conn.executemany("DELETE FROM reminders WHERE id = ?", [(rid,) for rid in reminder_ids])
+        if cursor.rowcount:
+            self._notify('deleted', reminder_ids)
+        return cursor.rowcount
+
+    def get_due_reminders(self, until, since=None):
+        # Integer range scan on idx_reminders_scheduled_ts
+        query = """
+            SELECT * FROM reminders
+            WHERE scheduled_ts <= ?
+              AND COALESCE(status, 'Active') = 'Active'
+              AND COALESCE(send_state, ?) = ?
+        """
+        params = [to_epoch(until), SEND_PENDING, SEND_PENDING]
+        if since is not None:
+            query += " AND scheduled_ts > ?"
+            params.append(to_epoch(since))
+        query += " ORDER BY scheduled_ts"
+        return [self._from_row(row) for row in self._connect().execute(query, params).fetchall()]
+
+    def count_pending(self, after=None):
+        query = """
+            SELECT COUNT(*) FROM reminders
+            WHERE COALESCE(status, 'Active') = 'Active' AND COALESCE(send_state, ?) = ?
+        """
+        params = [SEND_PENDING, SEND_PENDING]
+        if after is not None:
+            query += " AND scheduled_ts > ?"
+            params.append(to_epoch(after))
+        return self._connect().execute(query, params).fetchone()[0]
+
+    def pending_schedule(self, after=None):
+        # Two columns in scheduled_ts order instead of building the whole DataFrame
+        query = """
+            SELECT id, scheduled_ts FROM reminders
+            WHERE scheduled_ts IS NOT NULL
+              AND COALESCE(status, 'Active') = 'Active' AND COALESCE(send_state, ?) = ?
+        """
+        params = [SEND_PENDING, SEND_PENDING]
+        if after is not None:
+            query += " AND scheduled_ts > ?"
+            params.append(to_epoch(after))
+        query += " ORDER BY scheduled_ts"
+        return [(row['id'], row['scheduled_ts']) for row in self._connect().execute(query, params).fetchall()]
+
+    def advance_recurring(self, now=None):
+        now = (now or datetime.now()).astimezone(timezone.utc)
+        conn = self._connect()
+        rows = conn.execute(
+            """
+            SELECT id, recurrence, timezone, next_run_ts FROM reminders
+            WHERE next_run_ts IS NOT NULL AND scheduled_ts <= ?
+              AND send_state = ? AND COALESCE(status, 'Active') = 'Active'
+            """,
+            (to_epoch(now), SEND_SENT)
+        ).fetchall()
+
+        advanced = []
+        with conn:
+            for row in rows:
+                tz_name = row['timezone']
+                next_run = _first_run_after(from_epoch(row['next_run_ts']), row['recurrence'], now, tz_name)
+                local = _wall_clock(next_run, tz_name)
+                cursor = conn.execute(
+                    """
+                    UPDATE reminders
+                    SET due_date = ?, due_time = ?, scheduled_ts = ?, next_run_ts = ?,
+                        send_state = ?, send_error = NULL
+                    WHERE id = ? AND send_state = ?
+                    """,
+                    (local.strftime('%Y-%m-%d'), local.strftime('%H:%M'), to_epoch(next_run),
+                     to_epoch(next_occurrence(next_run, row['recurrence'], tz_name)), SEND_PENDING, row['id'], SEND_SENT)
+                )
+                if cursor.rowcount:
+                    advanced.append(row['id'])
+        if advanced:
+            self._notify('updated', advanced)
+        return len(advanced)
+
+    def _claim(self, conn, reminder_id):
+        """Claim a reminder and its ledger occurrence on conn; (claimed, occurrence_ts). The caller rolls back on failure"""
+        cursor = conn.execute(
+            """
+            UPDATE reminders SET send_state = ?, send_state_at = ?, send_error = NULL
+            WHERE id = ?
+              AND COALESCE(status, 'Active') = 'Active'
+              AND (COALESCE(send_state, ?) IN (?, ?)
+                   OR (send_state = ? AND COALESCE(send_state_at, '') < ?))
+            """,
+            (SEND_SENDING, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), reminder_id,
+             SEND_PENDING, SEND_PENDING, SEND_FAILED, SEND_SENDING, _stale_sending_cutoff())
+        )
+        if cursor.rowcount != 1:
+            return False, None
+        # Primary-key lookup in the ledger, committed in the same transaction as the claim
+        scheduled_ts = conn.execute("SELECT scheduled_ts FROM reminders WHERE id = ?", (reminder_id,)).fetchone()[0]
+        if scheduled_ts is not None and not _claim_occurrence(conn, reminder_id, scheduled_ts):
+            return False, scheduled_ts
+        return True, scheduled_ts
+
+    def _mark_sent(self, conn, reminder_id, sent_at):
+        cursor = conn.execute(
+            "UPDATE reminders SET send_state = ?, send_state_at = ?, last_sent = ? WHERE id = ? AND send_state = ?",
+            (SEND_SENT, sent_at, sent_at, reminder_id, SEND_SENDING)
+        )
+        _finish_occurrence(conn, reminder_id, SEND_SENT, sent_at)
+        return cursor.rowcount == 1
+
+    def _mark_failed(self, conn, reminder_id, error):
+        cursor = conn.execute(
+            "UPDATE reminders SET send_state = ?, send_state_at = ?, send_error = ? WHERE id = ? AND send_state = ?",
+            (SEND_FAILED, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), error, reminder_id, SEND_SENDING)
+        )
+        _finish_occurrence(conn, reminder_id, SEND_FAILED, error=error)
+        return cursor.rowcount == 1
+
+    def begin_send(self, reminder_id):
+        conn = self._connect()
+        with conn:
+            claimed, _ = self._claim(conn, reminder_id)
+            if not claimed:
+                conn.rollback()
+        self.invalidate_cache()
+        return claimed
+
+    def complete_send(self, reminder_id, sent_at=None):
+        sent_at = sent_at or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        conn = self._connect()
+        with conn:
+            completed = self._mark_sent(conn, reminder_id, sent_at)
+        self.invalidate_cache()
+        return completed
+
+    def fail_send(self, reminder_id, error=None):
+        conn = self._connect()
+        with conn:
+            failed = self._mark_failed(conn, reminder_id, error)
+        self.invalidate_cache()
+        return failed
+
+    def send_ledger_entries(self, reminder_id):
+        return _ledger_entries(self._connect(), reminder_id)
+
+    def _outbox(self):
+        return self._connect()
+
+    def enqueue_outbox(self, messages):
+        conn = self._connect()
+        queued = []
+        with conn:
+            # One write transaction for the batch; a savepoint per message undoes a claim that can't be queued
+            _begin_immediate(conn)
+            for message in messages:
+                conn.execute("SAVEPOINT enqueue_message")
+                claimed, occurrence_ts = self._claim(conn, message['reminder_id'])
+                outbox_id = _queue_message(conn, message, occurrence_ts) if claimed else None
+                if outbox_id is None:
+                    conn.execute("ROLLBACK TO enqueue_message")
+                else:
+                    queued.append(outbox_id)
+                conn.execute("RELEASE enqueue_message")
+        if queued:
+            self.invalidate_cache()
+        return queued
+
+    def complete_outbox(self, outbox_id, sent_at=None):
+        sent_at = sent_at or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        conn = self._connect()
+        with conn:
+            message = _finish_message(conn, outbox_id, OUTBOX_DELIVERED, sent_at)
+            if message is not None:
+                self._mark_sent(conn, message['reminder_id'], sent_at)
+        self.invalidate_cache()
+        return message is not None
+
+    def fail_outbox(self, outbox_id, error=None, retry_at=None):
+        if retry_at is not None:
+            return super().fail_outbox(outbox_id, error, retry_at)
+        conn = self._connect()
+        with conn:
+            message = _finish_message(conn, outbox_id, OUTBOX_DEAD, error=error)
+            if message is not None:
+                self._mark_failed(conn, message['reminder_id'], error)
+        self.invalidate_cache()
+        return message is not None
+
+
+BACKENDS = {
+    'sqlite': SQLiteReminderStore,
+    'excel': ExcelReminderStore
+}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def create_reminder_store(backend=None, **kwargs):
+    """Create a reminder store for the given backend name"""
+    backend = (backend or os.environ.get('REMINDER_STORE_BACKEND') or DEFAULT_BACKEND).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown reminder store backend: {backend}")
+    return BACKENDS[backend](**kwargs)
+
+
+def get_reminder_store():
+    """Get the process-wide reminder store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_reminder_store()
+                logger.info(f"Using {_store.name} reminder store")
+    return _store
+
+
+def set_reminder_store(store):
+    """Replace the process-wide reminder store (used by scripts and tests)"""
+    global _store
+    with _store_lock:
+        _store = store
+    return store
+
+
+def load_reminders():
+    """Convenience function to load all reminders"""
+    return get_reminder_store().load_reminders()
+
+
+def load_reminders_cached():
+    """Convenience function to load all reminders, reusing the last read while nothing changed"""
+    return get_reminder_store().load_reminders_cached()
+
+
+def save_reminders(df):
+    """Convenience function to replace all reminders"""
+    return get_reminder_store().save_reminders(df)
+
+
+def get_reminder(reminder_id):
+    """Convenience function to fetch a single reminder"""
+    return get_reminder_store().get_reminder(reminder_id)
+
+
+def add_reminder(reminder):
+    """Convenience function to add a reminder"""
+    return get_reminder_store().add_reminder(reminder)
+
+
+def update_reminder(reminder_id, updates):
+    """Convenience function to update a single reminder"""
+    return get_reminder_store().update_reminder(reminder_id, updates)
+
+
+def delete_reminders(reminder_ids):
+    """Convenience function to delete reminders"""
+    return get_reminder_store().delete_reminders(reminder_ids)
+
+
+def get_due_reminders(until, since=None):
+    """Convenience function to fetch reminders due in a time window"""
+    return get_reminder_store().get_due_reminders(until, since)
+
+
+def count_pending(after=None):
+    """Convenience function to count reminders waiting to be sent"""
+    return get_reminder_store().count_pending(after)
+
+
+def pending_schedule(after=None):
+    """Convenience function to list (ID, scheduled epoch) of reminders waiting to be sent"""
+    return get_reminder_store().pending_schedule(after)
+
+
+def subscribe(callback):
+    """Convenience function to listen for writes to the current store"""
+    get_reminder_store().subscribe(callback)
+
+
+def advance_recurring(now=None):
+    """Convenience function to roll sent recurring reminders on to their next run"""
+    return get_reminder_store().advance_recurring(now)
+
+
+def begin_send(reminder_id):
+    """Convenience function to claim a reminder for sending"""
+    return get_reminder_store().begin_send(reminder_id)
+
+
+def complete_send(reminder_id, sent_at=None):
+    """Convenience function to mark a claimed reminder as sent"""
+    return get_reminder_store().complete_send(reminder_id, sent_at)
+
+
+def fail_send(reminder_id, error=None):
+    """Convenience function to mark a claimed reminder as failed"""
+    return get_reminder_store().fail_send(reminder_id, error)
+
+
+def send_ledger_entries(reminder_id):
+    """Convenience function to list a reminder's send ledger rows"""
+    return get_reminder_store().send_ledger_entries(reminder_id)
+
+
+def enqueue_outbox(messages):
+    """Convenience function to claim reminders and queue their rendered messages"""
+    return get_reminder_store().enqueue_outbox(messages)
+
+
+def claim_outbox(ids=None, limit=None, backlog_only=False):
+    """Convenience function to claim outbox messages for delivery"""
+    return get_reminder_store().claim_outbox(ids, limit, backlog_only)
+
+
+def touch_outbox(outbox_id, claimed_at):
+    """Convenience function to restart a claimed outbox message's sending timeout"""
+    return get_reminder_store().touch_outbox(outbox_id, claimed_at)
+
+
+def complete_outbox(outbox_id, sent_at=None):
+    """Convenience function to record a delivered outbox message"""
+    return get_reminder_store().complete_outbox(outbox_id, sent_at)
+
+
+def fail_outbox(outbox_id, error=None, retry_at=None):
+    """Convenience function to record a failed outbox delivery, or schedule its retry"""
+    return get_reminder_store().fail_outbox(outbox_id, error, retry_at)
+
+
+def dead_letters(ids=None, limit=None):
+    """Convenience function to list outbox messages that ran out of retries"""
+    return get_reminder_store().dead_letters(ids, limit)
+
+
+def outbox_counts():
+    """Convenience function to count outbox messages by state"""
+    return get_reminder_store().outbox_counts()
+
+
+def import_reminders_from_excel(excel_file=EXCEL_FILE):
+    """Convenience function to import reminders from an Excel workbook"""
+    return get_reminder_store().import_excel(excel_file)
+
+
+def export_reminders_to_excel(excel_file=EXCEL_FILE):
+    """Convenience function to export reminders to an Excel workbook"""
+    return get_reminder_store().export_excel(excel_file)
+
+
+if __name__ == "__main__":
+    import sys
+
+    usage = "Usage: python reminder_store.py [import|export] [excel_file]"
+    if len(sys.argv) < 2 or sys.argv[1] not in ('import', 'export'):
+        print(usage)
+        sys.exit(1)
+
+    target = sys.argv[2] if len(sys.argv) > 2 else EXCEL_FILE
+    if sys.argv[1] == 'import':
+        print(f"✅ Imported {import_reminders_from_excel(target)} reminders from {target}")
+    else:
+        print(f"✅ Exported {export_reminders_to_excel(target)} reminders to {target}")
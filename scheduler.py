@@ -1,6 +1,4 @@
 import pandas as pd
-import smtplib
-import ssl
 from email.mime.text import MIMEText
 from datetime import datetime, timedelta
 import os
@@ -8,8 +6,15 @@ import json
 import schedule
 import time
 import logging
+import threading
+import uuid
 from pathlib import Path
 
+import outbox
+import reminder_store
+from smtp_pool import get_smtp_pool
+from leader_election import is_sender_leader
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -21,9 +26,12 @@ logging.basicConfig(
 )
 
 # Constants
-EXCEL_FILE = "payment_reminders.xlsx"
 CONFIG_FILE = "email_config.json"
 LOG_FILE = "sent_reminders.log"
+# How often failed reminders whose backoff has passed are retried
+RETRY_INTERVAL_MINUTES = 5
+
+_log_lock = threading.Lock()
 
 def load_email_config():
     """Load email configuration from file"""
@@ -39,28 +47,13 @@ def load_email_config():
         return {}
 
 def load_reminders():
-    """Load reminders from Excel file"""
+    """Load reminders from the reminder store"""
     try:
-        if os.path.exists(EXCEL_FILE):
-            df = pd.read_excel(EXCEL_FILE, sheet_name="Reminders")
-            return df
-        else:
-            logging.warning("Reminders Excel file not found")
-            return pd.DataFrame()
+        return reminder_store.load_reminders()
     except Exception as e:
         logging.error(f"Error loading reminders: {str(e)}")
         return pd.DataFrame()
 
-def save_reminders(df):
-    """Save reminders to Excel file"""
-    try:
-        with pd.ExcelWriter(EXCEL_FILE, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name="Reminders", index=False)
-        return True
-    except Exception as e:
-        logging.error(f"Error saving reminders: {str(e)}")
-        return False
-
 def send_email(recipient, subject, body, sender_email, app_password):
     """Send email reminder"""
     try:
@@ -69,10 +62,7 @@ def send_email(recipient, subject, body, sender_email, app_password):
         msg['From'] = sender_email
         msg['To'] = recipient
 
-        context = ssl.create_default_context()
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465, context=context) as server:
-            server.login(sender_email, app_password)
-            server.sendmail(sender_email, recipient, msg.as_string())
+        get_smtp_pool().send_message(sender_email, app_password, recipient, msg)
         
         logging.info(f"Email sent successfully to {recipient}")
         return True
@@ -83,7 +73,7 @@ def send_email(recipient, subject, body, sender_email, app_password):
 def log_sent_reminder(name, email, agreement, date_sent):
     """Log sent reminder to file"""
     try:
-        with open(LOG_FILE, 'a') as f:
+        with _log_lock, open(LOG_FILE, 'a') as f:
             f.write(f"{date_sent},{name},{email},{agreement}\n")
     except Exception as e:
         logging.error(f"Error logging sent reminder: {str(e)}")
@@ -104,52 +94,75 @@ def check_and_send_reminders():
         logging.info("No reminders found")
         return
     
-    today = datetime.today().date()
-    sent_count = 0
+    # Active, unsent reminders due any time today
+    start_of_day = datetime.combine(datetime.today().date(), datetime.min.time())
+    due_rows = reminder_store.select_due_reminders(
+        df, until=start_of_day + timedelta(days=1) - timedelta(seconds=1), since=start_of_day
+    ).to_dict('records')
     
-    for index, row in df.iterrows():
-        try:
-            if pd.notna(row['Due Date']):
-                due_date = pd.to_datetime(row['Due Date']).date()
-                
-                # Check if reminder is due today and is active
-                if due_date == today and row.get('Status', 'Active') == 'Active':
-                    subject = f"Payment Reminder - {row['Agreement Name']}"
-                    body = f"Dear {row['Name']},\n\n{row['Message']}\n\nRegards,\nAccounts Team"
-                    
-                    if send_email(row['Email'], subject, body, config['sender_email'], config['app_password']):
-                        # Update last sent timestamp
-                        df.at[index, 'Last Sent'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        sent_count += 1
-                        
-                        # Log the sent reminder
-                        log_sent_reminder(
-                            row['Name'], 
-                            row['Email'], 
-                            row['Agreement Name'], 
-                            datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        )
-                        
-                        logging.info(f"Reminder sent to {row['Name']} ({row['Email']}) for {row['Agreement Name']}")
-                    else:
-                        logging.error(f"Failed to send reminder to {row['Name']} ({row['Email']})")
-        
-        except Exception as e:
-            logging.error(f"Error processing reminder for row {index}: {str(e)}")
+    # Claim and queue the batch in one transaction; reminders already sent or being sent are skipped
+    outbox_ids = outbox.enqueue_reminders(due_rows, config['sender_email'])
+    
+    # Send concurrently, rate limited per sender account; failures are retried by retry_failed_reminders
+    results = outbox.drain_outbox(lambda message: deliver_message(message, config), ids=outbox_ids) if outbox_ids else {}
+    sent_count = len([ok for ok in results.values() if ok])
     
-    # Save updated reminders if any were sent
     if sent_count > 0:
-        if save_reminders(df):
-            logging.info(f"Successfully sent {sent_count} reminders and updated records")
-        else:
-            logging.error(f"Sent {sent_count} reminders but failed to update records")
+        logging.info(f"Successfully sent {sent_count} reminders and updated records")
     else:
         logging.info("No reminders were due today")
 
+def deliver_message(message, config):
+    """Send one outbox message and log it; the outbox records the outcome on the reminder"""
+    if not send_email(message['recipient'], message['subject'], message['body'],
+                      config['sender_email'], config['app_password']):
+        logging.error(f"Failed to send reminder {message['reminder_id']} to {message['recipient']}")
+        return False
+    
+    # Log the sent reminder; the outbox message stands in if its reminder can't be read
+    try:
+        row = reminder_store.get_reminder(message['reminder_id'])
+    except Exception as e:
+        logging.error(f"Error loading sent reminder {message['reminder_id']}: {str(e)}")
+        row = None
+    if row is None:
+        name, header_name = message['recipient'], message['subject']
+    else:
+        name = row.get('Name')
+        header_name = row.get('Header Name') or row.get('Agreement Name') or message['subject']
+    log_sent_reminder(
+        name,
+        message['recipient'],
+        header_name,
+        datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    )
+    
+    logging.info(f"Reminder sent to {name} ({message['recipient']}) for {header_name}")
+    return True
+
+def retry_failed_reminders():
+    """Retry failed reminders whose backoff has passed, and deliver any a crash left in the outbox"""
+    if not outbox.has_backlog():
+        return
+    
+    config = load_email_config()
+    if not config.get('sender_email') or not config.get('app_password'):
+        logging.error("Email configuration not set")
+        return
+    
+    results = outbox.drain_outbox(lambda message: deliver_message(message, config), backlog_only=True)
+    if results:
+        logging.info(f"Retried {len(results)} reminders, {len([ok for ok in results.values() if ok])} sent")
+
 def check_monthly_recurring():
     """Check for monthly recurring reminders and create new entries"""
     logging.info("Checking for monthly recurring reminders...")
     
+    # Reminders with a Recurrence roll forward in place using their stored next run
+    advanced = reminder_store.advance_recurring()
+    if advanced:
+        logging.info(f"Advanced {advanced} recurring reminders to their next run")
+    
     df = load_reminders()
     if df.empty:
         return
@@ -159,6 +172,8 @@ def check_monthly_recurring():
     
     for _, row in df.iterrows():
         try:
+            if pd.notna(row.get('Recurrence')) and row.get('Recurrence'):
+                continue
             if pd.notna(row['Due Date']) and row.get('Status', 'Active') == 'Active':
                 due_date = pd.to_datetime(row['Due Date']).date()
                 
@@ -178,9 +193,11 @@ def check_monthly_recurring():
                     ]
                     
                     if existing_next_month.empty:
-                        new_reminder = row.copy()
+                        new_reminder = row.to_dict()
+                        new_reminder['ID'] = str(uuid.uuid4())
                         new_reminder['Due Date'] = next_due
                         new_reminder['Last Sent'] = ''
+                        new_reminder['Send State'] = reminder_store.SEND_PENDING
                         new_reminders.append(new_reminder)
                         
                         logging.info(f"Created recurring reminder for {row['Name']} - {row['Agreement Name']} due {next_due}")
@@ -188,28 +205,42 @@ def check_monthly_recurring():
         except Exception as e:
             logging.error(f"Error processing recurring reminder: {str(e)}")
     
-    # Add new reminders to DataFrame
-    if new_reminders:
-        new_df = pd.concat([df, pd.DataFrame(new_reminders)], ignore_index=True)
-        if save_reminders(new_df):
-            logging.info(f"Added {len(new_reminders)} recurring reminders")
-        else:
-            logging.error("Failed to save recurring reminders")
+    # Add new reminders to the store
+    added_count = 0
+    for new_reminder in new_reminders:
+        try:
+            reminder_store.add_reminder(new_reminder)
+            added_count += 1
+        except Exception as e:
+            logging.error(f"Failed to save recurring reminder: {str(e)}")
+
+    if added_count:
+        logging.info(f"Added {added_count} recurring reminders")
+
+def run_if_leader(job):
+    """Run a scheduled job only while this process holds the sender lease"""
+    if not is_sender_leader():
+        logging.info(f"Another process holds the sender lease, skipping {job.__name__}")
+        return
+    job()
 
 def run_scheduler():
     """Run the scheduler"""
     logging.info("Starting Payment Reminder Scheduler...")
     
     # Schedule daily check at 9:00 AM
-    schedule.every().day.at("09:00").do(check_and_send_reminders)
+    schedule.every().day.at("09:00").do(run_if_leader, check_and_send_reminders)
     
     # Schedule monthly recurring check at 9:30 AM on the 1st of each month
-    schedule.every().day.at("09:30").do(check_monthly_recurring)
+    schedule.every().day.at("09:30").do(run_if_leader, check_monthly_recurring)
+    
+    # Retry failed sends with backoff until they go out or are dead-lettered
+    schedule.every(RETRY_INTERVAL_MINUTES).minutes.do(run_if_leader, retry_failed_reminders)
     
     # Also run immediately on startup for testing
     logging.info("Running initial check...")
-    check_and_send_reminders()
-    check_monthly_recurring()
+    run_if_leader(check_and_send_reminders)
+    run_if_leader(check_monthly_recurring)
     
     logging.info("Scheduler is running. Press Ctrl+C to stop.")
     
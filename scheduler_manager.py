@@ -1,17 +1,21 @@
 import logging
 import threading
-import time
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.events import EVENT_JOB_EXECUTED, EVENT_JOB_ERROR, EVENT_JOB_MISSED
 import pandas as pd
-import smtplib
-import ssl
 from email.mime.text import MIMEText
 import json
 import os
 
+import reminder_store
+import outbox
+import send_stats
+from leader_election import is_sender_leader
+from smtp_pool import get_smtp_pool
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -24,6 +28,16 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# 'batch': one recurring tick sends whatever is due (default)
+# 'per_job': one APScheduler DateTrigger job per reminder (opt-in, legacy)
+DISPATCH_MODE = os.environ.get('REMINDER_DISPATCH_MODE', 'batch').lower()
+DISPATCH_INTERVAL_SECONDS = int(os.environ.get('REMINDER_DISPATCH_INTERVAL', '30'))
+DISPATCH_LOOKBACK_SECONDS = 300  # same 5 minute grace the per-job mode gets from misfire_grace_time
+DISPATCHER_JOB_ID = "due_reminder_dispatcher"
+# Per-job mode has no dispatcher tick, so a slower job picks up retries and messages a crash left in the outbox
+OUTBOX_RECOVERY_SECONDS = 60
+OUTBOX_RECOVERY_JOB_ID = "outbox_recovery"
+
 class EmailScheduler:
     _instance = None
     _lock = threading.Lock()
@@ -41,6 +55,9 @@ class EmailScheduler:
         if self._initialized:
             return
             
+        self.dispatch_mode = DISPATCH_MODE if DISPATCH_MODE in ('batch', 'per_job') else 'batch'
+        self._reschedule_lock = threading.Lock()
+        self._rescheduled_signature = None  # store signature the per-job schedule was last built from
         self.scheduler = BackgroundScheduler(
             timezone='UTC',
             job_defaults={
@@ -56,8 +73,12 @@ class EmailScheduler:
         self.scheduler.add_listener(self._job_missed, EVENT_JOB_MISSED)
         
         self.scheduler.start()
+        if self.dispatch_mode == 'batch':
+            self.start_dispatcher()
+        else:
+            self.start_outbox_recovery()
         self._initialized = True
-        logger.info("EmailScheduler initialized and started")
+        logger.info(f"EmailScheduler initialized and started ({self.dispatch_mode} dispatch)")
     
     def _job_executed(self, event):
         """Handle successful job execution"""
@@ -112,23 +133,17 @@ class EmailScheduler:
         return {}
     
     def load_reminders(self):
-        """Load reminders from Excel file"""
-        excel_file = "payment_reminders.xlsx"
+        """Load reminders from the reminder store"""
         try:
-            if os.path.exists(excel_file):
-                return pd.read_excel(excel_file, sheet_name="Reminders")
-            return pd.DataFrame()
+            return reminder_store.load_reminders()
         except Exception as e:
             logger.error(f"Error loading reminders: {e}")
             return pd.DataFrame()
     
     def save_reminders(self, df):
-        """Save reminders to Excel file"""
-        excel_file = "payment_reminders.xlsx"
+        """Replace all reminders in the reminder store"""
         try:
-            with pd.ExcelWriter(excel_file, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name="Reminders", index=False)
-            return True
+            return reminder_store.save_reminders(df)
         except Exception as e:
             logger.error(f"Error saving reminders: {e}")
             return False
@@ -143,59 +158,22 @@ class EmailScheduler:
             msg['From'] = sender_email
             msg['To'] = recipient
 
-            # Try multiple SMTP configurations for better compatibility
-            smtp_configs = [
-                {'host': 'smtp.gmail.com', 'port': 587, 'use_tls': True},  # TLS - better for external emails
-                {'host': 'smtp.gmail.com', 'port': 465, 'use_ssl': True}   # SSL - fallback
-            ]
-
-            for config in smtp_configs:
-                try:
-                    logger.debug(f"Trying SMTP {config['host']}:{config['port']} ({'TLS' if config.get('use_tls') else 'SSL'})")
-
-                    if config.get('use_ssl'):
-                        # SSL connection
-                        context = ssl.create_default_context()
-                        server = smtplib.SMTP_SSL(config['host'], config['port'], context=context)
-                    else:
-                        # TLS connection
-                        server = smtplib.SMTP(config['host'], config['port'])
-                        if config.get('use_tls'):
-                            server.starttls()
-
-                    # Login and send
-                    server.login(sender_email, app_password)
-                    server.sendmail(sender_email, recipient, msg.as_string())
-                    server.quit()
-
-                    logger.info(f"Email sent successfully to {recipient} via {config['host']}:{config['port']}")
-
-                    # Update email usage statistics if using admin management
-                    try:
-                        import sys
-                        sys.path.append('.')
-                        from auth import load_email_accounts, save_email_accounts
-                        accounts = load_email_accounts()
-                        if sender_email in accounts:
-                            accounts[sender_email]["total_sent"] = accounts[sender_email].get("total_sent", 0) + 1
-                            accounts[sender_email]["last_used"] = datetime.now().isoformat()
-                            save_email_accounts(accounts)
-                            logger.info(f"Updated email statistics for {sender_email}")
-                    except Exception as stats_error:
-                        logger.warning(f"Could not update email statistics: {stats_error}")
+            try:
+                # Pooled connection - tries TLS (587) then SSL (465) and reuses the login
+                get_smtp_pool().send_message(sender_email, app_password, recipient, msg)
+            except Exception as e:
+                logger.error(f"All SMTP configurations failed for {recipient}: {e}")
+                return False
 
-                    return True
+            logger.info(f"Email sent successfully to {recipient}")
 
-                except Exception as e:
-                    logger.warning(f"Failed to send via {config['host']}:{config['port']}: {e}")
-                    try:
-                        server.quit()
-                    except:
-                        pass
-                    continue
+            # Update email usage statistics (buffered in memory, flushed to email_accounts.json periodically)
+            try:
+                send_stats.record_send(sender_email)
+            except Exception as stats_error:
+                logger.warning(f"Could not update email statistics: {stats_error}")
 
-            logger.error(f"All SMTP configurations failed for {recipient}")
-            return False
+            return True
 
         except Exception as e:
             logger.error(f"Error sending email to {recipient}: {e}")
@@ -207,76 +185,136 @@ class EmailScheduler:
         
         # Load current data
         config = self.load_email_config()
-        df = self.load_reminders()
         
         if not config.get('sender_email') or not config.get('app_password'):
             logger.error("Email configuration not set")
             return False
         
-        if df.empty:
-            logger.error("No reminders found")
-            return False
-        
         # Find the specific reminder
-        reminder_row = df[df['ID'] == reminder_id]
-        if reminder_row.empty:
+        row = reminder_store.get_reminder(reminder_id)
+        if row is None:
             logger.error(f"Reminder {reminder_id} not found")
             return False
         
-        row = reminder_row.iloc[0]
-        
         # Check if reminder is still active
-        if row.get('Status', 'Active') != 'Active':
+        if (row.get('Status') or 'Active') != 'Active':
             logger.info(f"Reminder {reminder_id} is inactive, skipping")
             return False
         
-        # Send email with proper error handling and field name fallback
-        try:
-            # Safely get header name with fallback for old data
-            header_name = row.get('Header Name', row.get('Agreement Name', 'Reminder'))
-
-            subject = f"Reminder - {header_name}"
-            body = f"Dear {row['Name']},\n\n{row['Message']}\n\nRegards,\nAccounts Team"
-
-            logger.info(f"Attempting to send email to {row['Email']} from {config['sender_email']}")
-
-            success = self.send_email(
-                row['Email'],
-                subject,
-                body,
-                config['sender_email'],
-                config['app_password']
-            )
-
-            if success:
-                # Update last sent timestamp
-                df.loc[df['ID'] == reminder_id, 'Last Sent'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                self.save_reminders(df)
-                logger.info(f"Reminder {reminder_id} sent successfully to {row['Email']}")
-            else:
-                logger.error(f"Failed to send reminder {reminder_id} to {row['Email']}")
-
-            return success
-
-        except Exception as e:
-            logger.error(f"Error processing reminder {reminder_id}: {str(e)}")
+        # Claim and queue in one transaction, then deliver just this message
+        outbox_ids = outbox.enqueue_reminders([row], config['sender_email'])
+        if not outbox_ids:
+            logger.info(f"Reminder {reminder_id} is already sent or being sent, skipping")
             return False
+        
+        delivered = outbox.drain_outbox(lambda message: self._deliver(message, config), ids=outbox_ids)
+        success = delivered.get(outbox_ids[0], False)
+        if success:
+            logger.info(f"Reminder {reminder_id} sent successfully to {row['Email']}")
+        else:
+            logger.error(f"Failed to send reminder {reminder_id} to {row['Email']}")
+        return success
+    
+    def _deliver(self, message, config):
+        """Send one outbox message with the current sender account"""
+        return self.send_email(message['recipient'], message['subject'], message['body'],
+                               config['sender_email'], config['app_password'])
+    
+    def start_dispatcher(self):
+        """Register the recurring tick that sends due reminders in batches"""
+        self.scheduler.add_job(
+            func=self._dispatch_tick,
+            trigger=IntervalTrigger(seconds=DISPATCH_INTERVAL_SECONDS),
+            id=DISPATCHER_JOB_ID,
+            name="Due reminder dispatcher",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+            next_run_time=datetime.now(self.scheduler.timezone)
+        )
+        logger.info(f"Due reminder dispatcher running every {DISPATCH_INTERVAL_SECONDS}s")
+    
+    def start_outbox_recovery(self):
+        """Register the per-job mode tick that retries failed messages and delivers abandoned ones"""
+        self.scheduler.add_job(
+            func=self._recover_outbox,
+            trigger=IntervalTrigger(seconds=OUTBOX_RECOVERY_SECONDS),
+            id=OUTBOX_RECOVERY_JOB_ID,
+            name="Outbox recovery",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+            next_run_time=datetime.now(self.scheduler.timezone)
+        )
+    
+    def _recover_outbox(self):
+        if not is_sender_leader() or not outbox.has_backlog():
+            return 0
+        config = self.load_email_config()
+        if not config.get('sender_email') or not config.get('app_password'):
+            logger.error("Email configuration not set")
+            return 0
+        # Due retries and messages past the sending timeout; fresh ones belong to a running reminder job
+        results = outbox.drain_outbox(lambda message: self._deliver(message, config), backlog_only=True)
+        return len([ok for ok in results.values() if ok])
     
-    def schedule_reminder(self, reminder_id, due_date, due_time):
+    def _dispatch_tick(self):
+        # Only the process holding the sender lease sends; the others stay on standby
+        if not is_sender_leader():
+            logger.debug("Another process holds the sender lease, skipping dispatch")
+            return 0
+        return self.dispatch_due_reminders()
+    
+    def _run_scheduled_reminder(self, reminder_id):
+        if not is_sender_leader():
+            logger.info(f"Another process holds the sender lease, not sending reminder {reminder_id}")
+            return False
+        return self.send_reminder_email(reminder_id)
+    
+    def dispatch_due_reminders(self, now=None):
+        """Send every pending reminder that fell due within the lookback window"""
+        now = now or datetime.now()
+        since = now - timedelta(seconds=DISPATCH_LOOKBACK_SECONDS)
+        # Recurring reminders sent on an earlier tick go back in the queue at their next run
+        advanced = reminder_store.advance_recurring(now)
+        if advanced:
+            logger.info(f"Advanced {advanced} recurring reminders to their next run")
+        due = reminder_store.get_due_reminders(now, since=since)
+        # Messages queued before a crash or restart are delivered on the next tick
+        if not due and not outbox.has_backlog():
+            return 0
+        
+        config = self.load_email_config()
+        if not config.get('sender_email') or not config.get('app_password'):
+            logger.error("Email configuration not set")
+            return 0
+        
+        if due:
+            queued = outbox.enqueue_reminders(due, config['sender_email'])
+            logger.info(f"Queued {len(queued)}/{len(due)} due reminders in the outbox")
+        
+        # Delivered concurrently, rate limited per sender account, each completion recorded per message
+        results = outbox.drain_outbox(lambda message: self._deliver(message, config))
+        sent_count = len([ok for ok in results.values() if ok])
+        
+        logger.info(f"Dispatched {sent_count}/{len(results)} outbox messages")
+        return sent_count
+    
+    def schedule_reminder(self, reminder_id, due_date, due_time, timezone_name=None):
         """Schedule a reminder email"""
+        if self.dispatch_mode == 'batch':
+            # The dispatcher picks the reminder up from the store when it falls due
+            return True
+        
         try:
-            # Parse the due date and time
-            if isinstance(due_date, str):
-                due_date = datetime.strptime(due_date, '%Y-%m-%d').date()
-            
-            if isinstance(due_time, str):
-                due_time = datetime.strptime(due_time, '%H:%M').time()
-            
-            # Combine date and time
-            scheduled_datetime = datetime.combine(due_date, due_time)
+            # Due Date + Due Time in the reminder's timezone, as an aware UTC datetime
+            scheduled_datetime = reminder_store.scheduled_at_for(due_date, due_time, timezone_name)
+            if scheduled_datetime is None:
+                logger.warning(f"Invalid due date/time {due_date} {due_time} for reminder {reminder_id}")
+                return False
             
             # Check if the scheduled time is in the future
-            if scheduled_datetime <= datetime.now():
+            if scheduled_datetime <= datetime.now(timezone.utc):
                 logger.warning(f"Scheduled time {scheduled_datetime} is in the past for reminder {reminder_id}")
                 return False
             
@@ -292,7 +330,7 @@ class EmailScheduler:
             
             # Schedule the job
             job = self.scheduler.add_job(
-                func=self.send_reminder_email,
+                func=self._run_scheduled_reminder,
                 trigger=DateTrigger(run_date=scheduled_datetime),
                 args=[reminder_id],
                 id=job_id,
@@ -309,6 +347,10 @@ class EmailScheduler:
     
     def cancel_reminder(self, reminder_id):
         """Cancel a scheduled reminder"""
+        if self.dispatch_mode == 'batch':
+            # Deleted or deactivated reminders simply stop matching the due query
+            return True
+        
         job_id = f"reminder_{reminder_id}"
         try:
             self.scheduler.remove_job(job_id)
@@ -330,28 +372,84 @@ class EmailScheduler:
             })
         return jobs
     
-    def reschedule_all_active_reminders(self):
-        """Reschedule all active reminders (useful after app restart)"""
-        logger.info("Rescheduling all active reminders...")
-        
-        df = self.load_reminders()
-        if df.empty:
-            logger.info("No reminders to reschedule")
-            return
+    def reschedule_all_active_reminders(self, force=False):
+        """Reschedule all active reminders (useful after app restart)
+
+        In per-job mode the upcoming reminders are diffed against the jobs
+        already registered, and only missing, moved or stale jobs are touched.
+        The diff is skipped entirely while the reminder store is unchanged
+        since the last run, so every new Streamlit session after the first
+        costs a stat() of the store. Returns {'added', 'removed',
+        'rescheduled', 'unchanged'} job counts (None when skipped).
+        """
+        if self.dispatch_mode == 'batch':
+            # No per-reminder jobs to rebuild, just make sure the tick is registered
+            if self.scheduler.get_job(DISPATCHER_JOB_ID) is None:
+                self.start_dispatcher()
+            logger.info(f"Batch dispatch active, {reminder_store.count_pending(after=datetime.now())} reminders pending")
+            return None
         
-        scheduled_count = 0
-        for _, row in df.iterrows():
-            if row.get('Status', 'Active') == 'Active':
-                due_date = pd.to_datetime(row['Due Date']).date()
-                due_time = row.get('Due Time', '09:00')
-                
-                # Only reschedule future reminders
-                scheduled_datetime = datetime.combine(due_date, datetime.strptime(due_time, '%H:%M').time())
-                if scheduled_datetime > datetime.now():
-                    if self.schedule_reminder(row['ID'], due_date, due_time):
-                        scheduled_count += 1
+        with self._reschedule_lock:
+            signature = reminder_store.get_reminder_store().data_signature()
+            if not force and signature is not None and signature == self._rescheduled_signature:
+                logger.debug("Reminders unchanged since the last reschedule, skipping")
+                return None
+            
+            logger.info("Rescheduling all active reminders...")
+            
+            # Only future reminders that haven't gone out yet, as (ID, UTC epoch) straight from the store
+            wanted = {
+                f"reminder_{reminder_id}": datetime.fromtimestamp(scheduled_ts, timezone.utc)
+                for reminder_id, scheduled_ts in reminder_store.pending_schedule(after=datetime.now())
+            }
+            existing = {job.id: job for job in self.scheduler.get_jobs() if job.id.startswith('reminder_')}
+            
+            # Paused, the scheduler thread is woken once on resume instead of after every job change
+            self.scheduler.pause()
+            try:
+                counts = self._apply_job_diff(wanted, existing)
+            finally:
+                self.scheduler.resume()
+            
+            self._rescheduled_signature = signature
+            logger.info(f"Rescheduled active reminders: {counts['added']} added, {counts['removed']} removed, "
+                        f"{counts['rescheduled']} moved, {counts['unchanged']} unchanged")
+            return counts
+    
+    def _apply_job_diff(self, wanted, existing):
+        """Add, move or remove reminder jobs so they match wanted {job_id: run_date}"""
+        counts = {'added': 0, 'removed': 0, 'rescheduled': 0, 'unchanged': 0}
+        for job_id, job in existing.items():
+            run_date = wanted.get(job_id)
+            if run_date is None:
+                self.scheduler.remove_job(job_id)
+                counts['removed'] += 1
+            elif getattr(job.trigger, 'run_date', None) != run_date:
+                self.scheduler.reschedule_job(job_id, trigger=DateTrigger(run_date=run_date))
+                counts['rescheduled'] += 1
+            else:
+                counts['unchanged'] += 1
         
-        logger.info(f"Rescheduled {scheduled_count} active reminders")
+        for job_id, run_date in wanted.items():
+            if job_id in existing:
+                continue
+            reminder_id = job_id[len("reminder_"):]
+            self.scheduler.add_job(
+                func=self._run_scheduled_reminder,
+                trigger=DateTrigger(run_date=run_date),
+                args=[reminder_id],
+                id=job_id,
+                name=f"Email reminder for {reminder_id}",
+                replace_existing=True
+            )
+            counts['added'] += 1
+        return counts
+    
+    def get_scheduled_count(self):
+        """Number of reminders waiting to be sent"""
+        if self.dispatch_mode == 'batch':
+            return reminder_store.count_pending(after=datetime.now())
+        return len([job for job in self.scheduler.get_jobs() if job.id.startswith('reminder_')])
     
     def shutdown(self):
         """Shutdown the scheduler"""
@@ -366,9 +464,9 @@ def get_scheduler():
     """Get the global scheduler instance"""
     return email_scheduler
 
-def schedule_reminder(reminder_id, due_date, due_time):
+def schedule_reminder(reminder_id, due_date, due_time, timezone_name=None):
     """Convenience function to schedule a reminder"""
-    return email_scheduler.schedule_reminder(reminder_id, due_date, due_time)
+    return email_scheduler.schedule_reminder(reminder_id, due_date, due_time, timezone_name)
 
 def cancel_reminder(reminder_id):
     """Convenience function to cancel a reminder"""
@@ -378,6 +476,10 @@ def get_scheduled_jobs():
     """Convenience function to get scheduled jobs"""
     return email_scheduler.get_scheduled_jobs()
 
+def get_scheduled_count():
+    """Convenience function to count reminders waiting to be sent"""
+    return email_scheduler.get_scheduled_count()
+
 def reschedule_all_reminders():
     """Convenience function to reschedule all reminders"""
     return email_scheduler.reschedule_all_active_reminders()
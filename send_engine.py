@@ -0,0 +1,136 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_RATE_PER_MINUTE = 60  # per sender account, override with "rate_limit_per_minute" in email_accounts.json
+DEFAULT_BURST = 10
+RATE_WAIT_TIMEOUT = 300  # give up on a message if its account is throttled this long
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, holding at most `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, timeout=None):
+        """Take one token, sleeping until one is available. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+def load_account_rate_limits():
+    """Per-account messages-per-minute limits from email_accounts.json"""
+    try:
+        import sys
+        sys.path.append('.')
+        from auth import load_email_accounts
+
+        limits = {}
+        for email, data in load_email_accounts().items():
+            if data.get("rate_limit_per_minute"):
+                limits[email] = float(data["rate_limit_per_minute"])
+        return limits
+    except Exception as e:
+        logger.warning(f"Could not load account rate limits: {e}")
+        return {}
+
+
+class SendEngine:
+    """Sends a batch of messages across a bounded worker pool.
+
+    Each sender account gets its own token bucket so a batch never exceeds
+    the provider quota for that account, while messages for different
+    accounts (and slow SMTP round trips) proceed in parallel.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, default_rate_per_minute=DEFAULT_RATE_PER_MINUTE,
+                 burst=DEFAULT_BURST, rate_limits=None):
+        self.max_workers = max_workers
+        self.default_rate_per_minute = default_rate_per_minute
+        self.burst = burst
+        self.rate_limits = rate_limits
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def limiter_for(self, sender_email):
+        """Get (or create) the token bucket for a sender account"""
+        with self._lock:
+            bucket = self._buckets.get(sender_email)
+            if bucket is None:
+                if self.rate_limits is None:
+                    self.rate_limits = load_account_rate_limits()
+                per_minute = self.rate_limits.get(sender_email, self.default_rate_per_minute)
+                bucket = TokenBucket(per_minute / 60.0, min(self.burst, max(1, per_minute)))
+                self._buckets[sender_email] = bucket
+            return bucket
+
+    def _run_one(self, item, send_one, sender_email):
+        if not self.limiter_for(sender_email).acquire(timeout=RATE_WAIT_TIMEOUT):
+            return {'item': item, 'success': False, 'error': f"Rate limit wait exceeded for {sender_email}"}
+        try:
+            return {'item': item, 'success': bool(send_one(item)), 'error': None}
+        except Exception as e:
+            return {'item': item, 'success': False, 'error': str(e)}
+
+    def send_all(self, items, send_one, sender_email_for):
+        """Run send_one(item) for every item, rate limited per sender account.
+
+        Returns one {'item', 'success', 'error'} dict per item, in input order.
+        """
+        items = list(items)
+        if not items:
+            return []
+
+        workers = min(self.max_workers, len(items))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="send-engine") as executor:
+            futures = [executor.submit(self._run_one, item, send_one, sender_email_for(item)) for item in items]
+            results = [future.result() for future in futures]
+
+        failed = len([r for r in results if not r['success']])
+        logger.info(f"Send engine finished {len(results)} messages ({failed} failed) with {workers} workers")
+        return results
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_send_engine():
+    """Get the process-wide send engine"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = SendEngine()
+    return _engine
+
+
+def set_send_engine(engine):
+    """Replace the process-wide send engine (used by scripts and tests)"""
+    global _engine
+    with _engine_lock:
+        _engine = engine
+    return engine
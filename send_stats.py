@@ -0,0 +1,141 @@
+import atexit
+import logging
+import os
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Seconds between writes of the accumulated counters to email_accounts.json
+FLUSH_INTERVAL = float(os.environ.get('SEND_STATS_FLUSH_INTERVAL', 30))
+# Days of per-day counters kept on each account
+DAILY_HISTORY_DAYS = 90
+
+
+class SendStatsAccumulator:
+    """Per-sender send counters kept in memory and flushed to email_accounts.json.
+
+    record_send() only bumps a dict under a lock, so the send path no longer
+    reads and rewrites the accounts file for every message. A background
+    thread merges the deltas into the file every FLUSH_INTERVAL seconds (and
+    at exit) as total_sent, last_used and a daily_sent {date: count} map.
+    """
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL, load_accounts=None, save_accounts=None):
+        self.flush_interval = flush_interval
+        self._load_accounts = load_accounts
+        self._save_accounts = save_accounts
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _accounts_io(self):
+        if self._load_accounts is None:
+            from auth import load_email_accounts, save_email_accounts
+            self._load_accounts, self._save_accounts = load_email_accounts, save_email_accounts
+        return self._load_accounts, self._save_accounts
+
+    def record_send(self, sender_email, sent_at=None):
+        """Count one message sent from sender_email"""
+        sent_at = sent_at or datetime.now()
+        day = sent_at.strftime('%Y-%m-%d')
+        with self._lock:
+            stats = self._pending.setdefault(sender_email, {'total': 0, 'last_used': None, 'daily': {}})
+            stats['total'] += 1
+            stats['daily'][day] = stats['daily'].get(day, 0) + 1
+            if stats['last_used'] is None or sent_at > stats['last_used']:
+                stats['last_used'] = sent_at
+        self._ensure_flusher()
+
+    def pending(self):
+        """Copy of the counts not yet written, {sender: total}"""
+        with self._lock:
+            return {sender: stats['total'] for sender, stats in self._pending.items()}
+
+    def flush(self):
+        """Merge pending counters into email_accounts.json; returns messages written"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+
+            try:
+                load_accounts, save_accounts = self._accounts_io()
+                accounts = load_accounts()
+                for sender, stats in pending.items():
+                    if sender not in accounts:
+                        continue
+                    account = accounts[sender]
+                    account['total_sent'] = account.get('total_sent', 0) + stats['total']
+                    last_used = stats['last_used'].isoformat()
+                    if not account.get('last_used') or last_used > account['last_used']:
+                        account['last_used'] = last_used
+                    daily = account.get('daily_sent') or {}
+                    for day, count in stats['daily'].items():
+                        daily[day] = daily.get(day, 0) + count
+                    account['daily_sent'] = dict(sorted(daily.items())[-DAILY_HISTORY_DAYS:])
+                if not save_accounts(accounts):
+                    raise IOError("could not save email accounts")
+            except Exception as e:
+                logger.warning(f"Could not flush email send statistics, will retry: {e}")
+                self._restore(pending)
+                return 0
+
+            written = sum(stats['total'] for stats in pending.values())
+            logger.debug(f"Flushed send statistics for {written} messages")
+            return written
+
+    def _restore(self, pending):
+        with self._lock:
+            for sender, stats in pending.items():
+                current = self._pending.setdefault(sender, {'total': 0, 'last_used': None, 'daily': {}})
+                current['total'] += stats['total']
+                for day, count in stats['daily'].items():
+                    current['daily'][day] = current['daily'].get(day, 0) + count
+                if current['last_used'] is None or stats['last_used'] > current['last_used']:
+                    current['last_used'] = stats['last_used']
+
+    def _ensure_flusher(self):
+        if self._thread is not None or self.flush_interval <= 0:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="send-stats-flusher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """Stop the background flusher and write what is left"""
+        self._stop.set()
+        self.flush()
+
+
+_stats = None
+_stats_lock = threading.Lock()
+
+
+def get_send_stats():
+    """Get the process-wide send statistics accumulator"""
+    global _stats
+    if _stats is None:
+        with _stats_lock:
+            if _stats is None:
+                _stats = SendStatsAccumulator()
+                atexit.register(_stats.close)
+    return _stats
+
+
+def record_send(sender_email, sent_at=None):
+    """Convenience function to count one sent message"""
+    get_send_stats().record_send(sender_email, sent_at)
+
+
+def flush_send_stats():
+    """Convenience function to write pending send statistics now"""
+    return get_send_stats().flush()
@@ -0,0 +1,271 @@
+import atexit
+import hashlib
+import logging
+import smtplib
+import ssl
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Connection settings tried in order for each account
+SMTP_CONFIGS = [
+    {'host': 'smtp.gmail.com', 'port': 587, 'use_tls': True},  # TLS - better for external emails
+    {'host': 'smtp.gmail.com', 'port': 465, 'use_ssl': True}   # SSL - fallback
+]
+
+MAX_CONNECTIONS_PER_ACCOUNT = 3
+MAX_MESSAGES_PER_CONNECTION = 100  # recycle before providers start throttling the session
+IDLE_TIMEOUT = 120  # seconds an idle connection is kept open
+HEALTH_CHECK_AFTER = 15  # seconds idle before a NOOP is sent on checkout
+CONNECT_TIMEOUT = 30
+ACQUIRE_TIMEOUT = 60
+
+# Errors that mean the connection itself is unusable, not the message
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+class PooledConnection:
+    """An authenticated SMTP session plus usage bookkeeping"""
+
+    def __init__(self, server, config):
+        self.server = server
+        self.config = config
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.messages_sent = 0
+
+    def idle_for(self):
+        return time.monotonic() - self.last_used
+
+    def is_healthy(self):
+        """Check the session with NOOP"""
+        try:
+            code, _ = self.server.noop()
+            return code == 250
+        except Exception:
+            return False
+
+    def close(self):
+        try:
+            self.server.quit()
+        except Exception:
+            try:
+                self.server.close()
+            except Exception:
+                pass
+
+
+class SMTPConnectionPool:
+    """Authenticated SMTP connections shared by every send path, keyed by account.
+
+    Connections are reused across messages instead of doing a TCP + TLS
+    handshake and login() per email. Sessions idle for more than
+    health_check_after seconds are probed with NOOP on checkout, sessions
+    idle for more than idle_timeout are closed, and each session is recycled
+    after max_messages_per_connection messages.
+    """
+
+    def __init__(self, smtp_configs=None, max_connections_per_account=MAX_CONNECTIONS_PER_ACCOUNT,
+                 max_messages_per_connection=MAX_MESSAGES_PER_CONNECTION, idle_timeout=IDLE_TIMEOUT,
+                 health_check_after=HEALTH_CHECK_AFTER, timeout=CONNECT_TIMEOUT):
+        self.smtp_configs = smtp_configs or SMTP_CONFIGS
+        self.max_connections_per_account = max_connections_per_account
+        self.max_messages_per_connection = max_messages_per_connection
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.timeout = timeout
+        self._condition = threading.Condition()
+        self._idle = {}  # key -> [PooledConnection]
+        self._open_counts = {}  # key -> connections checked out or idle
+        self._preferred_config = {}  # key -> index of the config that last worked
+        self._stats_lock = threading.Lock()
+        self.stats = {'connections_opened': 0, 'connections_reused': 0, 'reconnects': 0, 'messages_sent': 0}
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    @staticmethod
+    def _key(sender_email, app_password):
+        # Different passwords for the same address must not share a session
+        digest = hashlib.sha256((app_password or '').encode('utf-8')).hexdigest()[:16]
+        return (sender_email, digest)
+
+    def _open(self, key, sender_email, app_password):
+        """Open and authenticate a new session, trying each config in order"""
+        start = self._preferred_config.get(key, 0)
+        order = self.smtp_configs[start:] + self.smtp_configs[:start]
+        last_error = None
+
+        for config in order:
+            server = None
+            try:
+                if config.get('use_ssl'):
+                    context = ssl.create_default_context()
+                    server = smtplib.SMTP_SSL(config['host'], config['port'], context=context, timeout=self.timeout)
+                else:
+                    server = smtplib.SMTP(config['host'], config['port'], timeout=self.timeout)
+                    if config.get('use_tls'):
+                        server.starttls()
+                if app_password is not None:
+                    server.login(sender_email, app_password)
+
+                self._preferred_config[key] = self.smtp_configs.index(config)
+                self._count('connections_opened')
+                logger.debug(f"Opened SMTP connection for {sender_email} via {config['host']}:{config['port']}")
+                return PooledConnection(server, config)
+
+            except Exception as e:
+                last_error = e
+                logger.warning(f"Failed to connect via {config['host']}:{config['port']}: {e}")
+                if server is not None:
+                    try:
+                        server.close()
+                    except Exception:
+                        pass
+
+        raise last_error or smtplib.SMTPException("No SMTP configurations available")
+
+    def _evict_idle_locked(self):
+        """Close idle connections past idle_timeout (caller holds the lock)"""
+        for key, connections in self._idle.items():
+            keep = []
+            for conn in connections:
+                if conn.idle_for() > self.idle_timeout:
+                    conn.close()
+                    self._open_counts[key] -= 1
+                else:
+                    keep.append(conn)
+            connections[:] = keep
+
+    def acquire(self, sender_email, app_password):
+        """Check out a healthy connection for the account, opening one if allowed"""
+        key = self._key(sender_email, app_password)
+        deadline = time.monotonic() + ACQUIRE_TIMEOUT
+
+        with self._condition:
+            self._evict_idle_locked()
+            while True:
+                idle = self._idle.setdefault(key, [])
+                if idle:
+                    conn = idle.pop()
+                    break
+                if self._open_counts.get(key, 0) < self.max_connections_per_account:
+                    self._open_counts[key] = self._open_counts.get(key, 0) + 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"Timed out waiting for an SMTP connection for {sender_email}")
+                self._condition.wait(remaining)
+
+        if conn is not None:
+            if conn.idle_for() <= self.health_check_after or conn.is_healthy():
+                self._count('connections_reused')
+                return conn
+            logger.info(f"Discarding stale SMTP connection for {sender_email}")
+            conn.close()
+
+        try:
+            return self._open(key, sender_email, app_password)
+        except Exception:
+            self._discard_slot(key)
+            raise
+
+    def _discard_slot(self, key):
+        with self._condition:
+            self._open_counts[key] = max(0, self._open_counts.get(key, 0) - 1)
+            self._condition.notify()
+
+    def release(self, sender_email, app_password, conn, reusable=True):
+        """Return a connection to the pool, or close it if it's spent or broken"""
+        key = self._key(sender_email, app_password)
+        conn.last_used = time.monotonic()
+
+        if not reusable or conn.messages_sent >= self.max_messages_per_connection:
+            conn.close()
+            self._discard_slot(key)
+            return
+
+        with self._condition:
+            self._idle.setdefault(key, []).append(conn)
+            self._condition.notify()
+
+    def send_message(self, sender_email, app_password, recipient, msg):
+        """Send an email.message.Message, reconnecting once if the session dropped"""
+        for attempt in range(2):
+            conn = self.acquire(sender_email, app_password)
+            try:
+                conn.server.sendmail(sender_email, recipient, msg.as_string())
+            except CONNECTION_ERRORS as e:
+                self.release(sender_email, app_password, conn, reusable=False)
+                if attempt == 0:
+                    self._count('reconnects')
+                    logger.warning(f"SMTP connection for {sender_email} dropped ({e}), reconnecting")
+                    continue
+                raise
+            except smtplib.SMTPResponseException as e:
+                # 4xx/5xx replies leave the session usable unless the server says it's closing
+                self.release(sender_email, app_password, conn, reusable=e.smtp_code != 421)
+                raise
+            except smtplib.SMTPRecipientsRefused:
+                self.release(sender_email, app_password, conn)
+                raise
+            except Exception:
+                self.release(sender_email, app_password, conn, reusable=False)
+                raise
+
+            conn.messages_sent += 1
+            self._count('messages_sent')
+            self.release(sender_email, app_password, conn)
+            return True
+
+    def evict_idle(self):
+        """Close connections that have been idle longer than idle_timeout"""
+        with self._condition:
+            self._evict_idle_locked()
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._condition:
+            for key, connections in self._idle.items():
+                for conn in connections:
+                    conn.close()
+                    self._open_counts[key] -= 1
+                connections.clear()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_smtp_pool():
+    """Get the process-wide SMTP connection pool"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = SMTPConnectionPool()
+    return _pool
+
+
+def set_smtp_pool(pool):
+    """Replace the process-wide SMTP pool (used by scripts and tests)"""
+    global _pool
+    with _pool_lock:
+        old_pool, _pool = _pool, pool
+    if old_pool is not None and old_pool is not pool:
+        old_pool.close_all()
+    return pool
+
+
+def send_message(sender_email, app_password, recipient, msg):
+    """Convenience function to send a message through the shared pool"""
+    return get_smtp_pool().send_message(sender_email, app_password, recipient, msg)
+
+
+@atexit.register
+def _close_pool():
+    if _pool is not None:
+        _pool.close_all()
@@ -1,192 +1,275 @@
 
 import streamlit as st
-import pandas as pd
 import json
-import smtplib
-import ssl
 import base64
 from datetime import datetime, timedelta
 from email.mime.text import MIMEText
-import time
 import threading
+import logging
+
+import outbox
+import reminder_store
+from due_queue import get_due_queue, MAX_IDLE_SECONDS
+from smtp_pool import get_smtp_pool
+from leader_election import get_sender_lease, is_sender_leader
+
+logger = logging.getLogger(__name__)
+
+# Reminders within this many seconds of their scheduled time count as due
+DUE_WINDOW_SECONDS = 120
+# Pause after an unexpected error in the loop before trying again
+ERROR_BACKOFF_SECONDS = 30
+# Longest the loop sleeps while failed messages are waiting to be retried
+RETRY_POLL_SECONDS = 30
 
 class StreamlitCloudScheduler:
-    """Scheduler that works with Streamlit Cloud limitations"""
+    """Scheduler that works with Streamlit Cloud limitations
+
+    One instance serves the whole server process (see get_cloud_scheduler),
+    so every browser session shares a single loop thread. Sending is
+    serialized by a process-wide lock, and each reminder is claimed and
+    queued in the outbox before it is sent, so the loop and a "Check Due
+    Emails Now" click never send the same reminder twice; failed sends are
+    retried from the outbox by the loop. Across processes, the loop only
+    sends while this process holds the sender lease; otherwise it waits on
+    standby and takes over when the current leader goes away.
+    """
     
     def __init__(self):
-        if 'scheduler_thread' not in st.session_state:
-            st.session_state.scheduler_thread = None
-        if 'scheduler_running' not in st.session_state:
-            st.session_state.scheduler_running = False
+        self._thread = None
+        self._running = threading.Event()
+        self._stop_requested = threading.Event()
+        self._state_lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._status = {'started_at': None, 'last_run_at': None, 'last_sent': 0, 'total_sent': 0, 'last_error': None,
+                        'standby': False}
+    
+    @property
+    def running(self):
+        """True while the loop thread is alive and has not been asked to stop"""
+        return self._running.is_set() and self._thread is not None and self._thread.is_alive()
     
+    def get_status(self):
+        """Snapshot of the shared loop's state for a session's status view"""
+        with self._state_lock:
+            return dict(self._status, running=self.running)
+    
+    def _record_run(self, sent_count, error=None):
+        with self._state_lock:
+            self._status['last_run_at'] = datetime.now()
+            self._status['last_sent'] = sent_count
+            self._status['total_sent'] += sent_count
+            self._status['last_error'] = error
+    
+    def load_sender_credentials(self):
+        """Return (sender_email, password) of the default account, or None"""
+        with open('email_accounts.json', 'r') as f:
+            accounts = json.load(f)
+
+        for email, data in accounts.items():
+            if data.get('is_default', False):
+                return data['email'], base64.b64decode(data['password']).decode('utf-8')
+        return None
+
+    def _send_through_outbox(self, rows, sender_email, password):
+        """Claim and queue reminders in the outbox, then deliver just those messages; returns the rows that went out"""
+        outbox_ids = outbox.enqueue_reminders(rows, sender_email)
+        if not outbox_ids:
+            return []
+        sent_ids = set()
+
+        def send(message):
+            if not self.send_email(message['recipient'], message['subject'], message['body'], sender_email, password):
+                return False
+            sent_ids.add(message['reminder_id'])
+            return True
+
+        outbox.drain_outbox(send, ids=outbox_ids)
+        return [row for row in rows if row['ID'] in sent_ids]
+
+    def send_outbox_backlog(self):
+        """Retry failed messages whose backoff has passed and deliver ones a crashed sender abandoned"""
+        if not outbox.has_backlog():
+            return 0
+        credentials = self.load_sender_credentials()
+        if not credentials:
+            return 0
+        sender_email, password = credentials
+
+        with self._send_lock:
+            results = outbox.drain_outbox(
+                lambda message: self.send_email(message['recipient'], message['subject'], message['body'],
+                                                sender_email, password),
+                backlog_only=True
+            )
+        return len([ok for ok in results.values() if ok])
+
+    def send_due_from_queue(self, queue):
+        """Send every reminder the due queue reports as due, claiming each one first"""
+        # Credentials before popping: a popped reminder leaves the heap even though it's still pending
+        credentials = self.load_sender_credentials()
+        if not credentials:
+            return 0
+        sender_email, password = credentials
+
+        due_ids = queue.pop_due()
+        if not due_ids:
+            return 0
+
+        try:
+            rows = [row for row in (reminder_store.get_reminder(reminder_id) for reminder_id in due_ids) if row is not None]
+            with self._send_lock:
+                return len(self._send_through_outbox(rows, sender_email, password))
+        except Exception:
+            # Put back whatever is still pending so the next pass picks it up
+            for reminder_id in due_ids:
+                queue.refresh(reminder_id)
+            raise
+
     def check_and_send_due_emails(self):
         """Check for due emails and send them"""
         try:
             # Load reminders
-            df = pd.read_excel('payment_reminders.xlsx', sheet_name='Reminders')
+            df = reminder_store.load_reminders()
             
             # Load email config
-            with open('email_accounts.json', 'r') as f:
-                accounts = json.load(f)
-            
-            default_account = None
-            for email, data in accounts.items():
-                if data.get('is_default', False):
-                    default_account = data
-                    break
-            
-            if not default_account:
+            credentials = self.load_sender_credentials()
+            if not credentials:
                 return
-            
-            sender_email = default_account['email']
-            password = base64.b64decode(default_account['password']).decode('utf-8')
+            sender_email, password = credentials
             
             now = datetime.now()
-            sent_count = 0
             
-            for index, row in df.iterrows():
-                if row.get('Status', 'Active') == 'Active':
-                    try:
-                        due_date = pd.to_datetime(row['Due Date']).date()
-                        due_time_str = row.get('Due Time', '09:00')
-                        due_time = datetime.strptime(due_time_str, '%H:%M').time()
-                        
-                        scheduled_datetime = datetime.combine(due_date, due_time)
-                        
-                        # Check if it's time to send (within 2 minute window)
-                        time_diff = abs((now - scheduled_datetime).total_seconds())
-
-                        if time_diff <= 120 and (pd.isna(row.get('Last Sent', '')) or row.get('Last Sent', '') == ''):
-                            # Send email
-                            if self.send_email(row['Email'],
-                                             f"Reminder - {row['Header Name']}",
-                                             f"Dear {row['Name']},\n\n{row['Message']}\n\nRegards,\nAccounts Team",
-                                             sender_email, password):
-
-                                # Update last sent
-                                df.at[index, 'Last Sent'] = now.strftime('%Y-%m-%d %H:%M:%S')
-                                sent_count += 1
-
-                                # Log the sending
-                                st.success(f"📧 Email sent to {row['Name']} ({row['Email']})")
-                    except:
-                        continue
+            # Unsent reminders scheduled within a 2 minute window of now
+            due = reminder_store.select_due_reminders(df, until=now + timedelta(seconds=DUE_WINDOW_SECONDS),
+                                                      since=now - timedelta(seconds=DUE_WINDOW_SECONDS))
             
-            if sent_count > 0:
-                # Save updated dataframe
-                with pd.ExcelWriter('payment_reminders.xlsx', engine='openpyxl') as writer:
-                    df.to_excel(writer, sheet_name='Reminders', index=False)
+            # Same lock and claim as the loop, so a manual check never double-sends
+            with self._send_lock:
+                sent_rows = self._send_through_outbox(due.to_dict('records'), sender_email, password)
+
+            # Log the sending
+            for row in sent_rows:
+                st.success(f"📧 Email sent to {row['Name']} ({row['Email']})")
             
-            return sent_count
+            return len(sent_rows)
             
         except Exception as e:
             st.error(f"Scheduler error: {e}")
             return 0
     
     def send_email(self, recipient, subject, body, sender_email, password):
-        """Send email with enhanced SMTP"""
-        try:
-            msg = MIMEText(body)
-            msg['Subject'] = subject
-            msg['From'] = sender_email
-            msg['To'] = recipient
-            
-            # Try TLS first (better for external emails)
-            try:
-                server = smtplib.SMTP('smtp.gmail.com', 587)
-                server.starttls()
-                server.login(sender_email, password)
-                server.sendmail(sender_email, recipient, msg.as_string())
-                server.quit()
-                return True
-            except:
-                # Fallback to SSL
-                context = ssl.create_default_context()
-                server = smtplib.SMTP_SSL('smtp.gmail.com', 465, context=context)
-                server.login(sender_email, password)
-                server.sendmail(sender_email, recipient, msg.as_string())
-                server.quit()
-                return True
-                
-        except Exception as e:
-            return False
+        """Send email with enhanced SMTP; raises on failure so the outbox records the SMTP error"""
+        msg = MIMEText(body)
+        msg['Subject'] = subject
+        msg['From'] = sender_email
+        msg['To'] = recipient
+        
+        # Pooled connection - tries TLS (587) then SSL (465) and reuses the login
+        get_smtp_pool().send_message(sender_email, password, recipient, msg)
+        return True
     
     def start_scheduler(self):
-        """Start the scheduler in Streamlit Cloud"""
-        if not st.session_state.scheduler_running:
-            st.session_state.scheduler_running = True
+        """Start the shared loop thread; returns False if it is already running"""
+        with self._state_lock:
+            if self._thread is not None and self._thread.is_alive():
+                self._running.set()
+                self._stop_requested.clear()
+                return False
+            self._running.set()
+            self._stop_requested.clear()
+            self._status['started_at'] = datetime.now()
             
+            # Built once; add/edit/delete keep it current, so the loop never rescans the workbook
+            queue = get_due_queue(lookback_seconds=DUE_WINDOW_SECONDS)
+
             def scheduler_loop():
-                while st.session_state.scheduler_running:
+                while self._running.is_set():
                     try:
-                        self.check_and_send_due_emails()
-                        time.sleep(30)  # Check every 30 seconds
-                    except:
-                        break
+                        standby = not is_sender_leader()
+                        with self._state_lock:
+                            self._status['standby'] = standby
+                        if standby:
+                            # Leave the queue alone so due reminders are still there if we take over
+                            self._stop_requested.wait(get_sender_lease().heartbeat_interval)
+                            continue
+                        self._record_run(self.send_due_from_queue(queue) + self.send_outbox_backlog())
+                        # Sleep until the next reminder is due or the reminders change,
+                        # waking sooner while failed messages are waiting to be retried
+                        queue.wait(max_wait=RETRY_POLL_SECONDS if outbox.has_backlog() else MAX_IDLE_SECONDS)
+                    except Exception as e:
+                        logger.error(f"Cloud scheduler loop error: {e}")
+                        self._record_run(0, str(e))
+                        queue.wait(max_wait=ERROR_BACKOFF_SECONDS)
             
-            if st.session_state.scheduler_thread is None or not st.session_state.scheduler_thread.is_alive():
-                st.session_state.scheduler_thread = threading.Thread(target=scheduler_loop, daemon=True)
-                st.session_state.scheduler_thread.start()
+            self._thread = threading.Thread(target=scheduler_loop, name="cloud-scheduler", daemon=True)
+            self._thread.start()
+            logger.info("Cloud scheduler loop started")
+            return True
     
     def stop_scheduler(self):
-        """Stop the scheduler"""
-        st.session_state.scheduler_running = False
+        """Stop the shared loop for every session"""
+        self._running.clear()
+        self._stop_requested.set()
+        get_due_queue().wake()
 
     def get_due_reminders(self):
         """Get reminders that are due now"""
         try:
-            df = pd.read_excel('payment_reminders.xlsx', sheet_name='Reminders')
+            # Rendered by every session's status view; reuse the last read while nothing changed
+            df = reminder_store.load_reminders_cached()
             now = datetime.now()
-            due_reminders = []
+            due = reminder_store.select_due_reminders(df, until=now + timedelta(seconds=DUE_WINDOW_SECONDS),
+                                                      since=now - timedelta(seconds=DUE_WINDOW_SECONDS))
 
-            for _, row in df.iterrows():
-                if row.get('Status', 'Active') == 'Active':
-                    try:
-                        due_date = pd.to_datetime(row['Due Date']).date()
-                        due_time_str = row.get('Due Time', '09:00')
-                        due_time = datetime.strptime(due_time_str, '%H:%M').time()
-
-                        scheduled_datetime = datetime.combine(due_date, due_time)
-
-                        # Check if it's due (within 2 minute window)
-                        time_diff = (now - scheduled_datetime).total_seconds()
-
-                        if -120 <= time_diff <= 120 and (pd.isna(row.get('Last Sent', '')) or row.get('Last Sent', '') == ''):
-                            due_reminders.append({
-                                'name': row['Name'],
-                                'email': row['Email'],
-                                'subject': row['Header Name'],
-                                'scheduled_time': scheduled_datetime,
-                                'time_diff': time_diff
-                            })
-                    except:
-                        continue
+            due_reminders = []
+            for row in due.to_dict('records'):
+                scheduled_datetime = row['Scheduled At'].to_pydatetime()
+                due_reminders.append({
+                    'name': row['Name'],
+                    'email': row['Email'],
+                    'subject': row['Header Name'],
+                    'scheduled_time': scheduled_datetime,
+                    'time_diff': (now - scheduled_datetime).total_seconds()
+                })
 
             return due_reminders
         except:
             return []
 
-# Global scheduler instance
-if 'cloud_scheduler' not in st.session_state:
-    st.session_state.cloud_scheduler = StreamlitCloudScheduler()
+@st.cache_resource
+def _process_cloud_scheduler():
+    # cache_resource: created once per server process and shared by every session and rerun
+    return StreamlitCloudScheduler()
 
 def get_cloud_scheduler():
-    """Get the cloud scheduler instance"""
-    return st.session_state.cloud_scheduler
+    """Get the process-wide cloud scheduler instance"""
+    return _process_cloud_scheduler()
 
 def show_cloud_scheduler_status():
     """Show cloud scheduler status and controls"""
     st.subheader("🤖 Cloud Scheduler Status")
 
     cloud_scheduler = get_cloud_scheduler()
+    status = cloud_scheduler.get_status()
 
     col1, col2, col3 = st.columns(3)
 
     with col1:
-        if st.session_state.get('scheduler_running', False):
+        if status['running'] and status['standby']:
+            lease = get_sender_lease().holder()
+            st.info("🔵 Status: Standby")
+            if lease:
+                st.caption(f"Sending is handled by {lease['holder']}")
+        elif status['running']:
             st.success("🟢 Status: Running")
         else:
             st.warning("🟡 Status: Stopped")
+        if status['last_run_at']:
+            st.caption(f"Last check {status['last_run_at'].strftime('%H:%M:%S')}, "
+                       f"{status['total_sent']} sent since {status['started_at'].strftime('%Y-%m-%d %H:%M')}")
+        if status['last_error']:
+            st.caption(f"⚠️ Last error: {status['last_error']}")
 
     with col2:
         if st.button("🔄 Check Due Emails Now"):
@@ -198,7 +281,7 @@ def show_cloud_scheduler_status():
                     st.info("ℹ️ No emails due at this time")
 
     with col3:
-        if st.session_state.get('scheduler_running', False):
+        if status['running']:
             if st.button("⏹️ Stop Scheduler"):
                 cloud_scheduler.stop_scheduler()
                 st.rerun()
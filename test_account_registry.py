@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test Account Registry
+Tests the cached, indexed account files and default sender lookup in auth.py
+"""
+
+import json
+import os
+import sys
+import tempfile
+from unittest import mock
+
+# Add current directory to path to import auth module
+sys.path.append('.')
+
+import auth
+
+
+def write_accounts(path, accounts):
+    with open(path, 'w') as f:
+        json.dump(accounts, f, indent=4)
+
+
+def test_email_registry_is_cached_and_indexed():
+    """Account files are parsed once per change and looked up by email"""
+    print("🧪 Testing email account registry...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'email_accounts.json')
+        write_accounts(path, {
+            'Backup@Example.com': {'password': auth.encrypt_password('pw1'), 'status': 'active'},
+            'main@example.com': {'password': auth.encrypt_password('pw2'), 'status': 'active', 'is_default': True},
+        })
+
+        with mock.patch.object(auth, 'EMAIL_ACCOUNTS_FILE', path), \
+                mock.patch('auth.json.load', wraps=json.load) as parsed:
+            for _ in range(5):
+                assert auth.get_default_email_account()['email'] == 'main@example.com'
+                auth.load_email_accounts()
+            assert parsed.call_count == 1
+
+            assert auth.get_email_account('backup@example.com')['password'] == auth.encrypt_password('pw1')
+            assert auth.get_email_account('nobody@example.com') is None
+
+            # Callers get copies, not the cached records
+            auth.load_email_accounts()['main@example.com']['status'] = 'inactive'
+            auth.get_default_email_account()['email'] = 'changed@example.com'
+            assert auth.get_default_email_account()['email'] == 'main@example.com'
+
+            # Saving invalidates the registry and the default sender
+            accounts = auth.load_email_accounts()
+            accounts['main@example.com']['status'] = 'inactive'
+            assert auth.save_email_accounts(accounts)
+            default = auth.get_default_email_account()
+            assert default['email'] == 'Backup@Example.com'
+            assert default['password'] == 'pw1'
+            assert parsed.call_count == 2
+
+    print("✅ Email registry cached, indexed and invalidated on save")
+
+
+def test_external_edits_are_picked_up():
+    """Edits made outside auth.py are seen through the file's mtime/size"""
+    print("🧪 Testing external edits...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'user_accounts.json')
+        write_accounts(path, {'a@example.com': {'status': 'active'}})
+
+        with mock.patch.object(auth, 'USER_ACCOUNTS_FILE', path):
+            assert list(auth.load_user_accounts()) == ['a@example.com']
+            write_accounts(path, {'a@example.com': {'status': 'active'}, 'b@example.com': {'status': 'inactive'}})
+            assert auth.get_user_account('B@example.com') == {'status': 'inactive'}
+            os.remove(path)
+            assert auth.load_user_accounts() == {}
+
+    print("✅ External edits picked up")
+
+
+if __name__ == "__main__":
+    print("🧪 Account Registry Test Suite")
+    print("=" * 50)
+
+    test_email_registry_is_cached_and_indexed()
+    test_external_edits_are_picked_up()
+
+    print("\n🎉 All account registry tests passed!")
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Test Activity Log
+Tests the append-only JSON Lines activity log, its rotation and paged reads
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+# Add current directory to path to import modules
+sys.path.append('.')
+
+from activity_log import ActivityLog, ActivityIndex
+
+
+def entry(n, action='login_success', admin='admin@reminder.com', timestamp=None):
+    return {'timestamp': (timestamp or datetime.now()).isoformat(), 'admin_email': admin,
+            'action': action, 'details': {'n': n}}
+
+
+def test_tail_pages_newest_first():
+    """tail() pages newest first with optional filters"""
+    print("🧪 Testing tail and paging...")
+    with tempfile.TemporaryDirectory() as tmp:
+        log = ActivityLog(os.path.join(tmp, 'activity.jsonl'), legacy_file=None)
+        for n in range(30):
+            log.append(entry(n, action='login_failed' if n % 3 == 0 else 'login_success',
+                             admin=f"admin{n % 2}@reminder.com"))
+
+        assert [e['details']['n'] for e in log.tail(5)] == [29, 28, 27, 26, 25]
+        assert [e['details']['n'] for e in log.tail(5, offset=5)] == [24, 23, 22, 21, 20]
+        assert [e['details']['n'] for e in log.tail(3, action='login_failed')] == [27, 24, 21]
+        assert [e['details']['n'] for e in log.tail(2, offset=1, action='login_failed',
+                                                    admin_email='admin0@reminder.com')] == [18, 12]
+        assert len(log.tail(100)) == 30
+    print("✅ Tail paging OK")
+
+
+def test_size_rotation_keeps_backups():
+    """The active file rolls over by size and readers span the rotated files"""
+    print("🧪 Testing size rotation...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'activity.jsonl')
+        log = ActivityLog(path, max_bytes=2000, backup_count=2, legacy_file=None)
+        for n in range(100):
+            log.append(entry(n))
+
+        assert os.path.getsize(path) < 2000 + 200
+        assert os.path.exists(path + '.1') and os.path.exists(path + '.2')
+        assert not os.path.exists(path + '.3')
+
+        # Oldest entries were dropped with the oldest backup, the rest read in order
+        numbers = [e['details']['n'] for e in log.tail(1000)]
+        assert numbers[0] == 99
+        assert numbers == sorted(numbers, reverse=True)
+        assert numbers == list(range(99, 99 - len(numbers), -1))
+        assert len(numbers) < 100
+    print("✅ Size rotation OK")
+
+
+def test_age_rotation():
+    """An active file whose first entry is too old rolls over on the next append"""
+    print("🧪 Testing age rotation...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'activity.jsonl')
+        log = ActivityLog(path, max_age_days=1, legacy_file=None)
+        log.append(entry(0, timestamp=datetime.now() - timedelta(days=2)))
+        log.append(entry(1))
+        assert [e['details']['n'] for e in log.tail(10)] == [1, 0]
+        with open(path + '.1') as f:
+            assert json.loads(f.readline())['details']['n'] == 0
+    print("✅ Age rotation OK")
+
+
+def test_legacy_migration_and_clear():
+    """Entries from the old JSON array are carried over once"""
+    print("🧪 Testing legacy migration...")
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = os.path.join(tmp, 'admin_activity.json')
+        path = os.path.join(tmp, 'admin_activity.jsonl')
+        with open(legacy, 'w') as f:
+            json.dump([entry(0), entry(1)], f, indent=2)
+
+        log = ActivityLog(path, legacy_file=legacy)
+        log.append(entry(2))
+        assert [e['details']['n'] for e in log.tail(10)] == [2, 1, 0]
+
+        log.clear()
+        assert ActivityLog(path, legacy_file=legacy).tail(10) == []
+    print("✅ Legacy migration OK")
+
+
+def test_concurrent_appends_are_not_lost():
+    """Appends from many threads all land in the file"""
+    print("🧪 Testing concurrent appends...")
+    with tempfile.TemporaryDirectory() as tmp:
+        log = ActivityLog(os.path.join(tmp, 'activity.jsonl'), max_bytes=20000, backup_count=50, legacy_file=None)
+
+        def worker(offset):
+            for n in range(50):
+                log.append(entry(offset + n))
+
+        threads = [threading.Thread(target=worker, args=(i * 1000,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        numbers = [e['details']['n'] for e in log.tail(1000)]
+        assert sorted(numbers) == sorted(i * 1000 + n for i in range(8) for n in range(50))
+    print("✅ No entries lost")
+
+
+def test_index_queries():
+    """Indexed queries filter, page, count and group without reading the log"""
+    print("🧪 Testing indexed queries...")
+    with tempfile.TemporaryDirectory() as tmp:
+        log = ActivityLog(os.path.join(tmp, 'activity.jsonl'), legacy_file=None)
+        index = ActivityIndex(log)
+        now = datetime.now()
+        for n in range(20):
+            log.append(entry(n, action='login_failed' if n % 4 == 0 else 'login_success',
+                             admin=f"admin{n % 2}@reminder.com", timestamp=now - timedelta(hours=20 - n)))
+
+        assert index.count() == 20
+        assert [e['details']['n'] for e in index.query(3)] == [19, 18, 17]
+        assert [e['details']['n'] for e in index.query(3, offset=3)] == [16, 15, 14]
+        assert [e['details']['n'] for e in index.query(10, action='login_failed')] == [16, 12, 8, 4, 0]
+        assert index.count(action='login_failed', admin_email='admin0@reminder.com') == 5
+        assert index.count(since=now - timedelta(hours=5)) == 5
+        assert index.count(until=now - timedelta(hours=15)) == 6
+        assert index.counts_by('action') == {'login_success': 15, 'login_failed': 5}
+        assert index.counts_by('admin_email', since=now - timedelta(hours=2, minutes=30)) == {
+            'admin0@reminder.com': 1, 'admin1@reminder.com': 1}
+
+        # New appends are picked up incrementally, a half-written line waits for the next sync
+        log.append(entry(20, action='logout'))
+        with open(log.path, 'a') as f:
+            f.write('{"timestamp": "')
+        assert index.counts_by('action')['logout'] == 1
+        assert index.count() == 21
+    print("✅ Indexed queries OK")
+
+
+def test_index_follows_rotation_and_clear():
+    """The index keeps up across rotations and resets when the log is cleared"""
+    print("🧪 Testing index across rotations...")
+    with tempfile.TemporaryDirectory() as tmp:
+        log = ActivityLog(os.path.join(tmp, 'activity.jsonl'), max_bytes=1500, backup_count=3, legacy_file=None)
+        index = ActivityIndex(log)
+        for n in range(10):
+            log.append(entry(n))
+        assert index.count() == 10
+
+        for n in range(10, 60):
+            log.append(entry(n))
+            if n % 30 == 0:
+                index.sync()
+
+        # Exactly the entries still on disk, in order
+        on_disk = [e['details']['n'] for e in log.tail(1000)]
+        assert [e['details']['n'] for e in index.query(1000)] == on_disk
+        assert on_disk[0] == 59 and len(on_disk) < 60
+
+        # A fresh index over existing files builds itself
+        assert ActivityIndex(log, db_file=os.path.join(tmp, 'other.db')).count() == len(on_disk)
+
+        log.clear()
+        assert index.count() == 0
+        log.append(entry(100))
+        assert [e['details']['n'] for e in index.query(10)] == [100]
+    print("✅ Index follows rotation and clear")
+
+
+def test_index_reset_on_clear():
+    """Entries appended after a clear, with no sync in between, are all the index returns"""
+    print("🧪 Testing index after clear...")
+    with tempfile.TemporaryDirectory() as tmp:
+        log = ActivityLog(os.path.join(tmp, 'activity.jsonl'), legacy_file=None)
+        index = ActivityIndex(log)
+        log.append(entry(0, action='logout'))
+        assert index.count() == 1
+
+        # The new entries outgrow the old synced offset, so only a reset catches the clear
+        log.clear()
+        for n in range(1, 4):
+            log.append(entry(n))
+        assert [e['details']['n'] for e in index.query(10)] == [3, 2, 1]
+        assert [e['details']['n'] for e in index.query(10, offset=2)] == [1]
+        assert index.count(action='logout') == 0
+    print("✅ Index reset on clear")
+
+
+if __name__ == "__main__":
+    print("🧪 Activity Log Test Suite")
+    print("=" * 50)
+
+    test_tail_pages_newest_first()
+    test_size_rotation_keeps_backups()
+    test_age_rotation()
+    test_legacy_migration_and_clear()
+    test_concurrent_appends_are_not_lost()
+    test_index_queries()
+    test_index_follows_rotation_and_clear()
+    test_index_reset_on_clear()
+
+    print("\n🎉 All activity log tests passed!")
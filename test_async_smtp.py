@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Test Async SMTP Sending
+Sends through async_smtp.send_many against the in-process fake SMTP server
+"""
+
+import asyncio
+import sys
+from email.mime.text import MIMEText
+
+# Add current directory to path to import modules
+sys.path.append('.')
+
+from async_smtp import send_many, send_many_sync
+from fake_smtp import FakeSMTPServer
+from smtp_pool import SMTPConnectionPool
+
+
+def make_message(recipient, body="Payment reminder"):
+    msg = MIMEText(body)
+    msg['From'] = 'sender@example.com'
+    msg['To'] = recipient
+    msg['Subject'] = 'Reminder'
+    return msg
+
+
+def test_send_many_reuses_few_connections():
+    """Many messages go out over at most max_connections authenticated sessions"""
+    print("🧪 Testing send_many over a few connections...")
+
+    with FakeSMTPServer(password='app-password') as server:
+        messages = [make_message(f"user{i}@example.com") for i in range(50)]
+        results = asyncio.run(send_many(messages, 'sender@example.com', 'app-password',
+                                        max_connections=3, smtp_configs=server.smtp_configs()))
+
+        assert all(r['success'] for r in results), results
+        assert [r['item'] for r in results] == messages
+        assert len(server.messages) == 50
+        assert server.counters['connections'] <= 3
+        assert server.counters['logins'] == server.counters['connections']
+        assert sorted(m['to'][0] for m in server.messages) == sorted(f"user{i}@example.com" for i in range(50))
+
+    print("✅ 50 messages sent over", server.counters['connections'], "connections")
+
+
+def test_send_many_reports_failures_per_message():
+    """A refused recipient fails only its own message"""
+    print("🧪 Testing per-message failures...")
+
+    with FakeSMTPServer(reject_recipients=['bad@example.com']) as server:
+        messages = [make_message('good@example.com'), make_message('bad@example.com'), make_message('ok@example.com')]
+        results = send_many_sync(messages, 'sender@example.com', 'pw', max_connections=1,
+                                 smtp_configs=server.smtp_configs())
+
+        assert [r['success'] for r in results] == [True, False, True]
+        assert results[1]['error']
+        assert len(server.messages) == 2
+
+    print("✅ Refused recipient reported without affecting the others")
+
+
+def test_send_many_bad_login():
+    """Authentication failures are reported for every message"""
+    print("🧪 Testing bad credentials...")
+
+    with FakeSMTPServer(password='app-password') as server:
+        results = send_many_sync([make_message('a@example.com')], 'sender@example.com', 'wrong',
+                                 smtp_configs=server.smtp_configs())
+
+        assert not results[0]['success']
+        assert '535' in results[0]['error']
+        assert server.messages == []
+
+    print("✅ Bad login reported")
+
+
+def test_send_many_reconnects_when_server_drops_session():
+    """Sessions closed by the server (421) are reopened transparently"""
+    print("🧪 Testing reconnect after 421...")
+
+    with FakeSMTPServer(max_messages_per_session=4) as server:
+        messages = [make_message(f"user{i}@example.com") for i in range(10)]
+        results = send_many_sync(messages, 'sender@example.com', 'pw', max_connections=1,
+                                 smtp_configs=server.smtp_configs())
+
+        assert all(r['success'] for r in results), results
+        assert len(server.messages) == 10
+        assert server.counters['connections'] >= 3
+
+    print("✅ Reconnected", server.counters['connections'] - 1, "times")
+
+
+def test_dot_stuffing_round_trip():
+    """Lines starting with '.' survive the DATA phase"""
+    print("🧪 Testing dot stuffing...")
+
+    with FakeSMTPServer() as server:
+        msg = MIMEText("line one\n.hidden line\n.\nlast line", 'plain', 'us-ascii')
+        msg['To'] = 'a@example.com'
+        results = send_many_sync([msg], 'sender@example.com', 'pw', smtp_configs=server.smtp_configs())
+
+        assert results[0]['success']
+        data = server.messages[0]['data']
+        assert '\r\n.hidden line\r\n.\r\nlast line' in data
+
+    print("✅ Dot stuffing round trip OK")
+
+
+def test_fake_server_works_with_smtp_pool():
+    """The fake server also backs the blocking smtplib pool"""
+    print("🧪 Testing fake server with SMTPConnectionPool...")
+
+    with FakeSMTPServer(password='app-password') as server:
+        pool = SMTPConnectionPool(smtp_configs=server.smtp_configs())
+        for i in range(5):
+            assert pool.send_message('sender@example.com', 'app-password', f"user{i}@example.com",
+                                     make_message(f"user{i}@example.com"))
+        pool.close_all()
+
+        assert len(server.messages) == 5
+        assert server.counters['logins'] == 1
+
+    print("✅ Pool reused a single session for 5 messages")
+
+
+if __name__ == "__main__":
+    print("🧪 Async SMTP Test Suite")
+    print("=" * 50)
+
+    test_send_many_reuses_few_connections()
+    test_send_many_reports_failures_per_message()
+    test_send_many_bad_login()
+    test_send_many_reconnects_when_server_drops_session()
+    test_dot_stuffing_round_trip()
+    test_fake_server_works_with_smtp_pool()
+
+    print("\n🎉 All async SMTP tests passed!")
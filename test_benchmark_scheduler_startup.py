@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Test Scheduler Startup Benchmark
+Smoke-tests the per-job startup benchmark at a small size
+"""
+
+import sys
+
+# Add current directory to path to import modules
+sys.path.append('.')
+
+import benchmark_scheduler_startup
+
+
+def test_startup_benchmark_runs():
+    """Every phase is timed and the diff phases do only the expected work"""
+    print("🧪 Testing scheduler startup benchmark...")
+    result = benchmark_scheduler_startup.run_case(200)
+    assert set(result['timings']) == set(benchmark_scheduler_startup.PHASES)
+    assert result['counts']['cold']['added'] == 200
+    assert result['counts']['session'] is None
+    assert result['counts']['forced'] == {'added': 0, 'removed': 0, 'rescheduled': 0, 'unchanged': 200}
+    assert result['counts']['changed']['rescheduled'] == 2
+    assert result['jobs'] == 200
+    print(f"✅ Cold start {result['timings']['cold'] * 1000:.1f} ms, new session {result['timings']['session'] * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    print("🧪 Scheduler Startup Benchmark Test Suite")
+    print("=" * 50)
+
+    test_startup_benchmark_runs()
+
+    print("\n🎉 All scheduler startup benchmark tests passed!")
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Test Send Throughput Benchmark
+Smoke-tests the synthetic reminder generator and every benchmarked send path against the fake SMTP server
+"""
+
+import sys
+
+# Add current directory to path to import modules
+sys.path.append('.')
+
+import benchmark_send_throughput
+from create_sample_data import generate_sample_reminders
+from fake_smtp import FakeSMTPServer
+from reminder_store import REMINDER_COLUMNS
+
+
+def test_generate_sample_reminders():
+    """Synthetic reminders are unique and use the current columns"""
+    print("🧪 Testing synthetic reminders...")
+    reminders = generate_sample_reminders(12, due_date='2026-01-05', due_time='09:15')
+    assert len(reminders) == 12
+    assert len({r['ID'] for r in reminders}) == 12
+    assert len({r['Email'] for r in reminders}) == 12
+    assert all(set(r) <= set(REMINDER_COLUMNS) for r in reminders)
+    assert {(r['Due Date'], r['Due Time']) for r in reminders} == {('2026-01-05', '09:15')}
+    print("✅ Synthetic reminders look right")
+
+
+def test_every_send_path_delivers():
+    """Each send path delivers every seeded reminder to the fake server"""
+    print("🧪 Testing benchmark send paths...")
+    with FakeSMTPServer() as server:
+        for path in benchmark_send_throughput.SEND_PATHS:
+            result = benchmark_send_throughput.run_case(path, 10, server)
+            assert result['sent'] == 10, result
+            assert result['received'] == 10, result
+            assert result['p50_ms'] is not None and result['p99_ms'] >= result['p50_ms']
+            print(f"  ✅ {path}: {result['msgs_per_s']:.0f} msgs/s")
+    print("✅ All send paths benchmarked")
+
+
+if __name__ == "__main__":
+    print("🧪 Send Benchmark Test Suite")
+    print("=" * 50)
+
+    test_generate_sample_reminders()
+    test_every_send_path_delivers()
+
+    print("\n🎉 All send benchmark tests passed!")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test Storage Benchmark
+Smoke-tests every storage backend in the benchmark and the baseline regression check
+"""
+
+import sys
+import tempfile
+
+import pandas as pd
+
+# Add current directory to path to import modules
+sys.path.append('.')
+
+import benchmark_storage
+from create_sample_data import generate_sample_reminders
+
+
+def test_every_backend_runs():
+    """Each available backend reports a timing for every operation"""
+    print("🧪 Testing storage benchmark backends...")
+    results = benchmark_storage.run_benchmark(sizes=[40], repeat=1)
+    expected = {'excel', 'sqlite'} | ({'parquet'} if benchmark_storage.parquet_available() else set())
+    assert set(results) == expected
+    for backend, sizes in results.items():
+        assert set(sizes['40']) == set(benchmark_storage.OPERATIONS)
+        assert all(seconds >= 0 for seconds in sizes['40'].values())
+        print(f"  ✅ {backend}: load {sizes['40']['load'] * 1000:.1f} ms")
+    print("✅ All backends benchmarked")
+
+
+def test_parquet_store_round_trip():
+    """The candidate Parquet store behaves like the Excel store"""
+    if not benchmark_storage.parquet_available():
+        print("⚠️  Parquet engine not installed, skipping")
+        return
+    print("🧪 Testing Parquet store...")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = benchmark_storage.create_store('parquet', tmp)
+        reminders = generate_sample_reminders(5)
+        store.save_reminders(pd.DataFrame(reminders))
+        assert store.update_reminder(reminders[2]['ID'], {'Status': 'Inactive'})
+        assert store.get_reminder(reminders[2]['ID'])['Status'] == 'Inactive'
+        assert len(store.load_reminders()) == 5
+    print("✅ Parquet store round trip works")
+
+
+def test_compare_to_baseline():
+    """Only slowdowns beyond both the tolerance and the absolute floor count"""
+    print("🧪 Testing regression check...")
+    baseline = {'sqlite': {'1000': {'load': 0.010, 'save': 0.100, 'update': 0.0002}}}
+    current = {'sqlite': {'1000': {'load': 0.012, 'save': 0.200, 'update': 0.0010}},
+               'excel': {'1000': {'load': 5.0}}}
+    regressions = benchmark_storage.compare_to_baseline(current, baseline, tolerance=0.5)
+    assert [(r['backend'], r['operation']) for r in regressions] == [('sqlite', 'save')]
+    print("✅ Regression check flags only real slowdowns")
+
+
+if __name__ == "__main__":
+    print("🧪 Storage Benchmark Test Suite")
+    print("=" * 50)
+
+    test_every_backend_runs()
+    test_parquet_store_round_trip()
+    test_compare_to_baseline()
+
+    print("\n🎉 All storage benchmark tests passed!")
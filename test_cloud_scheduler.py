@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Test Cloud Scheduler
+Tests the process-wide Streamlit Cloud scheduler: one shared instance, one loop thread, no double sends, retries
+"""
+
+import os
+import smtplib
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from unittest import mock
+
+# Add current directory to path to import modules
+sys.path.append('.')
+
+import reminder_store
+import smtp_pool
+import streamlit_cloud_scheduler
+from due_queue import DueQueue
+from fake_smtp import FakeSMTPServer
+from reminder_store import SQLiteReminderStore, SEND_SENDING, SEND_SENT
+from smtp_pool import SMTPConnectionPool
+from streamlit_cloud_scheduler import StreamlitCloudScheduler
+
+CREDENTIALS = ("sender@example.com", "secret")
+
+
+def reminder(reminder_id, when):
+    return {
+        'ID': reminder_id, 'Name': f"Client {reminder_id}", 'Email': f"{reminder_id}@example.com",
+        'Header Name': 'Invoice', 'Due Date': when.strftime('%Y-%m-%d'), 'Due Time': when.strftime('%H:%M'),
+        'Message': 'Payment is due', 'Status': 'Active'
+    }
+
+
+def test_one_instance_per_process():
+    """Every caller (and thread) gets the same scheduler"""
+    print("🧪 Testing shared instance...")
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(streamlit_cloud_scheduler.get_cloud_scheduler()))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(scheduler is streamlit_cloud_scheduler.get_cloud_scheduler() for scheduler in seen)
+    print("✅ One scheduler per process")
+
+
+def test_single_loop_thread():
+    """Starting from many sessions runs one loop, and stop is seen by all of them"""
+    print("🧪 Testing single loop...")
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = DueQueue(SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None))
+        scheduler = StreamlitCloudScheduler()
+        with mock.patch.object(streamlit_cloud_scheduler, 'get_due_queue', return_value=queue), \
+             mock.patch.object(streamlit_cloud_scheduler, 'is_sender_leader', return_value=True), \
+             mock.patch.object(streamlit_cloud_scheduler.outbox, 'has_backlog', return_value=False), \
+             mock.patch.object(scheduler, 'send_due_from_queue', return_value=0):
+            results = []
+            threads = [threading.Thread(target=lambda: results.append(scheduler.start_scheduler())) for _ in range(6)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert results.count(True) == 1
+            assert scheduler.running and scheduler.get_status()['running']
+            loops = [t for t in threading.enumerate() if t.name == "cloud-scheduler"]
+            assert len(loops) == 1
+
+            scheduler.stop_scheduler()
+            loops[0].join(timeout=5)
+            assert not loops[0].is_alive()
+            assert not scheduler.get_status()['running']
+        queue.close()
+    print("✅ One loop thread, stopped for everyone")
+
+
+def test_standby_loop_does_not_send():
+    """While another process holds the sender lease the loop waits instead of sending"""
+    print("🧪 Testing standby loop...")
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = DueQueue(SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None))
+        scheduler = StreamlitCloudScheduler()
+        lease = mock.Mock(heartbeat_interval=0.05)
+        with mock.patch.object(streamlit_cloud_scheduler, 'get_due_queue', return_value=queue), \
+             mock.patch.object(streamlit_cloud_scheduler, 'is_sender_leader', return_value=False), \
+             mock.patch.object(streamlit_cloud_scheduler, 'get_sender_lease', return_value=lease), \
+             mock.patch.object(scheduler, 'send_due_from_queue') as send:
+            assert scheduler.start_scheduler()
+            loop = scheduler._thread
+            deadline = time.monotonic() + 5
+            while not scheduler.get_status()['standby'] and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert scheduler.get_status()['standby']
+            send.assert_not_called()
+
+            scheduler.stop_scheduler()
+            loop.join(timeout=5)
+            assert not loop.is_alive()
+        queue.close()
+    print("✅ Standby loop sends nothing")
+
+
+def test_concurrent_checks_send_once():
+    """Overlapping manual checks from several sessions send each reminder once"""
+    print("🧪 Testing concurrent checks...")
+    with tempfile.TemporaryDirectory() as tmp, FakeSMTPServer() as server:
+        store = SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None)
+        now = datetime.now()
+        for i in range(5):
+            store.add_reminder(reminder(f"r{i}", now))
+        previous_store, previous_pool = reminder_store._store, smtp_pool._pool
+        reminder_store.set_reminder_store(store)
+        smtp_pool.set_smtp_pool(SMTPConnectionPool(smtp_configs=server.smtp_configs()))
+        try:
+            scheduler = StreamlitCloudScheduler()
+            with mock.patch.object(scheduler, 'load_sender_credentials', return_value=CREDENTIALS):
+                counts = []
+                threads = [threading.Thread(target=lambda: counts.append(scheduler.check_and_send_due_emails()))
+                           for _ in range(4)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+
+            assert sum(counts) == 5
+            assert len(server.messages) == 5
+            assert all(store.get_reminder(f"r{i}")['Send State'] == SEND_SENT for i in range(5))
+        finally:
+            reminder_store.set_reminder_store(previous_store)
+            smtp_pool.set_smtp_pool(previous_pool)
+    print("✅ Each reminder sent exactly once")
+
+
+def test_failed_send_is_retried():
+    """A send that fails during a check is retried from the outbox once its backoff has passed"""
+    print("🧪 Testing retry of a failed send...")
+    with tempfile.TemporaryDirectory() as tmp, FakeSMTPServer() as server:
+        store = SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None)
+        store.add_reminder(reminder("r1", datetime.now()))
+        previous_store, previous_pool = reminder_store._store, smtp_pool._pool
+        reminder_store.set_reminder_store(store)
+        smtp_pool.set_smtp_pool(SMTPConnectionPool(smtp_configs=server.smtp_configs()))
+        try:
+            scheduler = StreamlitCloudScheduler()
+            with mock.patch.object(scheduler, 'load_sender_credentials', return_value=CREDENTIALS):
+                with mock.patch.object(smtp_pool._pool, 'send_message',
+                                       side_effect=smtplib.SMTPRecipientsRefused({'r1@example.com': (451, b'Try again later')})):
+                    assert scheduler.check_and_send_due_emails() == 0
+                assert store.get_reminder("r1")['Send State'] == SEND_SENDING
+                # The SMTP error is kept on the outbox row rather than a generic failure
+                with store._outbox() as conn:
+                    [error] = conn.execute("SELECT error FROM outbox").fetchone()
+                assert 'Try again later' in error
+                # A second check does not resend it while the retry is pending
+                assert scheduler.check_and_send_due_emails() == 0
+                assert scheduler.send_outbox_backlog() == 0
+
+                # Let the backoff pass
+                with store._outbox() as conn:
+                    conn.execute("UPDATE outbox SET next_attempt_at = '2000-01-01 00:00:00'")
+                assert scheduler.send_outbox_backlog() == 1
+
+            assert len(server.messages) == 1
+            assert store.get_reminder("r1")['Send State'] == SEND_SENT
+        finally:
+            reminder_store.set_reminder_store(previous_store)
+            smtp_pool.set_smtp_pool(previous_pool)
+    print("✅ Failed send delivered on retry")
+
+
+def test_due_reminders_kept_without_credentials():
+    """A due reminder stays queued when the sender credentials can't be read or the send step fails"""
+    print("🧪 Testing due queue without credentials...")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None)
+        store.add_reminder(reminder("r1", datetime.now()))
+        previous_store = reminder_store._store
+        reminder_store.set_reminder_store(store)
+        try:
+            queue = DueQueue(store, lookback_seconds=300)
+            scheduler = StreamlitCloudScheduler()
+            assert len(queue) == 1
+
+            with mock.patch.object(scheduler, 'load_sender_credentials', side_effect=FileNotFoundError('email_accounts.json')):
+                try:
+                    scheduler.send_due_from_queue(queue)
+                    assert False, "Expected the missing accounts file to surface"
+                except FileNotFoundError:
+                    pass
+            assert len(queue) == 1
+
+            with mock.patch.object(scheduler, 'load_sender_credentials', return_value=None):
+                assert scheduler.send_due_from_queue(queue) == 0
+            assert len(queue) == 1
+
+            # A failure after popping puts the reminder back
+            with mock.patch.object(scheduler, 'load_sender_credentials', return_value=CREDENTIALS), \
+                 mock.patch.object(scheduler, '_send_through_outbox', side_effect=RuntimeError("database is locked")):
+                try:
+                    scheduler.send_due_from_queue(queue)
+                    assert False, "Expected the send failure to surface"
+                except RuntimeError:
+                    pass
+            assert len(queue) == 1
+            assert queue.pop_due() == ["r1"]
+            queue.close()
+        finally:
+            reminder_store.set_reminder_store(previous_store)
+    print("✅ Due reminder kept for the next pass")
+
+
+if __name__ == "__main__":
+    print("🧪 Cloud Scheduler Test Suite")
+    print("=" * 50)
+
+    test_one_instance_per_process()
+    test_single_loop_thread()
+    test_standby_loop_does_not_send()
+    test_concurrent_checks_send_once()
+    test_failed_send_is_retried()
+    test_due_reminders_kept_without_credentials()
+
+    print("\n🎉 All cloud scheduler tests passed!")
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Test Due Queue
+Tests the in-process min-heap of upcoming reminders used by the Streamlit Cloud scheduler
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Add current directory to path to import modules
+sys.path.append('.')
+
+from due_queue import DueQueue
+from reminder_store import SQLiteReminderStore, ExcelReminderStore
+
+
+def reminder(reminder_id, when, status='Active'):
+    return {
+        'ID': reminder_id, 'Name': f"Client {reminder_id}", 'Email': f"{reminder_id}@example.com",
+        'Header Name': 'Invoice', 'Due Date': when.strftime('%Y-%m-%d'), 'Due Time': when.strftime('%H:%M'),
+        'Message': 'Payment is due', 'Status': status
+    }
+
+
+def check_incremental_updates(store):
+    # Fixed time of day so base + 3 hours never rolls over into the next day
+    base = datetime.now().replace(hour=9, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    store.add_reminder(reminder('b', base + timedelta(hours=2)))
+    store.add_reminder(reminder('a', base + timedelta(hours=1)))
+    store.add_reminder(reminder('inactive', base, status='Inactive'))
+    store.add_reminder(reminder('past', base - timedelta(days=3)))
+
+    queue = DueQueue(store)
+    assert len(queue) == 2
+    assert queue.peek()[1] == 'a'
+
+    # Writes through the store reach the heap without a rebuild
+    queue.rebuild = None
+    store.add_reminder(reminder('c', base + timedelta(minutes=30)))
+    assert queue.peek()[1] == 'c'
+
+    store.update_reminder('c', {'Due Time': (base + timedelta(hours=3)).strftime('%H:%M')})
+    assert queue.peek()[1] == 'a'
+    assert len(queue) == 3
+
+    store.update_reminder('a', {'Status': 'Inactive'})
+    store.delete_reminders(['b'])
+    assert len(queue) == 1
+    assert queue.peek()[1] == 'c'
+
+    # Only reminders at or before now are popped, in scheduled order
+    del queue.rebuild
+    store.add_reminder(reminder('d', base + timedelta(hours=4)))
+    assert queue.pop_due(now=time.time()) == []
+    assert queue.pop_due(now=time.time() + 2 * 86400) == ['c', 'd']
+    assert len(queue) == 0 and queue.peek() is None
+    queue.close()
+
+
+def test_incremental_updates_sqlite():
+    """Heap order and incremental add/update/delete on SQLite"""
+    print("🧪 Testing due queue on SQLite")
+    with tempfile.TemporaryDirectory() as tmp:
+        check_incremental_updates(SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None))
+    print("✅ SQLite due queue OK")
+
+
+def test_incremental_updates_excel():
+    """Heap order and incremental add/update/delete on Excel"""
+    print("🧪 Testing due queue on Excel")
+    with tempfile.TemporaryDirectory() as tmp:
+        check_incremental_updates(ExcelReminderStore(os.path.join(tmp, 'reminders.xlsx')))
+    print("✅ Excel due queue OK")
+
+
+def test_claimed_reminders_leave_queue():
+    """Sent reminders are dropped and a reset rebuilds the heap"""
+    print("🧪 Testing send claims and resets")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None)
+        when = datetime.now() + timedelta(days=1)
+        store.add_reminder(reminder('a', when))
+        store.add_reminder(reminder('b', when + timedelta(hours=1)))
+        queue = DueQueue(store)
+
+        assert store.begin_send('a')
+        store.complete_send('a')
+        store.update_reminder('a', {'Message': 'edited'})
+        assert len(queue) == 1
+
+        store.save_reminders(store.load_reminders().iloc[0:0])
+        assert len(queue) == 0
+        queue.close()
+    print("✅ Claims and resets OK")
+
+
+def test_wait_sleeps_until_next_due():
+    """wait() returns at the next due time, or as soon as the reminders change"""
+    print("🧪 Testing wait")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None)
+        queue = DueQueue(store)
+        queue.wait(max_wait=0)
+
+        # Empty queue: an add wakes the sleeper well before max_wait
+        start = time.time()
+        timer = threading.Timer(0.2, store.add_reminder, [reminder('a', datetime.now() + timedelta(days=1))])
+        timer.start()
+        assert queue.wait(max_wait=10)
+        assert time.time() - start < 5
+        timer.join()
+
+        # Nothing changed and the head is a day away: max_wait bounds the sleep
+        start = time.time()
+        assert not queue.wait(max_wait=0.2)
+        assert time.time() - start < 2
+
+        # A due head returns immediately
+        queue._entries['a'] = 0
+        queue._heap = [(0, 'a')]
+        start = time.time()
+        queue.wait(max_wait=10)
+        assert time.time() - start < 1
+        queue.close()
+    print("✅ Wait OK")
+
+
+if __name__ == "__main__":
+    print("🧪 Due Queue Test Suite")
+    print("=" * 50)
+
+    test_incremental_updates_sqlite()
+    test_incremental_updates_excel()
+    test_claimed_reminders_leave_queue()
+    test_wait_sleeps_until_next_due()
+
+    print("\n🎉 All due queue tests passed!")
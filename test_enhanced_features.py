@@ -5,6 +5,7 @@ from auth import (
     authenticate_admin, load_admin_credentials, add_new_admin, 
     lock_unlock_user, delete_admin, log_admin_activity
 )
+from activity_log import ACTIVITY_LOG_FILE, tail_activity
 from scheduler_manager import get_scheduler, schedule_reminder
 
 def test_enhanced_authentication():
@@ -94,14 +95,13 @@ def test_activity_logging():
     log_admin_activity("test@system.com", "test_action", {"test": "data"})
     
     # Check if log file exists and has entries
-    if os.path.exists("admin_activity.json"):
-        with open("admin_activity.json", 'r') as f:
-            logs = json.load(f)
+    if os.path.exists(ACTIVITY_LOG_FILE):
+        logs = tail_activity(limit=1000)
         
-        print(f"✅ Activity log file exists with {len(logs)} entries")
+        print(f"✅ Activity log file exists with {len(logs)} recent entries")
         
         # Show recent log entries
-        recent_logs = logs[-3:] if len(logs) >= 3 else logs
+        recent_logs = list(reversed(logs[:3]))
         for log in recent_logs:
             timestamp = log.get('timestamp', 'unknown')
             action = log.get('action', 'unknown')
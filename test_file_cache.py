@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test File Cache
+Tests the mtime/size keyed JSON cache used for config files
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+# Add current directory to path to import modules
+sys.path.append('.')
+
+from file_cache import FileCache, load_json, save_json
+
+
+def test_reloads_only_when_file_changes():
+    """Repeat reads are served from memory until the file changes"""
+    print("🧪 Testing file cache reloads...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'config.json')
+        with open(path, 'w') as f:
+            json.dump({'email': 'a@example.com'}, f)
+
+        reads = []
+        cache = FileCache(lambda p: reads.append(p) or json.load(open(p)))
+        assert cache.get(path) == {'email': 'a@example.com'}
+        cache.get(path)['email'] = 'mutated'
+        assert cache.get(path) == {'email': 'a@example.com'}
+        assert len(reads) == 1
+
+        with open(path, 'w') as f:
+            json.dump({'email': 'b@example.com', 'extra': True}, f)
+        assert cache.get(path)['email'] == 'b@example.com'
+        assert len(reads) == 2
+
+        cache.invalidate(path)
+        cache.get(path)
+        assert len(reads) == 3
+
+        os.remove(path)
+        assert cache.get(path, default={}) == {}
+    print("✅ File cache reloads on change only")
+
+
+def test_save_json_round_trip():
+    """save_json writes the file and the next load sees the new contents"""
+    print("🧪 Testing save_json...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'config.json')
+        assert load_json(path, default={}) == {}
+        save_json(path, {'smtp': 'one'})
+        assert load_json(path) == {'smtp': 'one'}
+        save_json(path, {'smtp': 'two'})
+        assert load_json(path) == {'smtp': 'two'}
+    print("✅ save_json round trip OK")
+
+
+if __name__ == "__main__":
+    print("🧪 File Cache Test Suite")
+    print("=" * 50)
+
+    test_reloads_only_when_file_changes()
+    test_save_json_round_trip()
+
+    print("\n🎉 All file cache tests passed!")
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Test Leader Election
+Tests the sender lease: one leader at a time, renewal, and takeover when the leader exits or dies
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+
+# Add current directory to path to import modules
+sys.path.append('.')
+
+import leader_election
+import reminder_store
+from leader_election import LeaderLease
+from reminder_store import SQLiteReminderStore
+
+HOLD_LEASE_SCRIPT = """
+import sys, time
+sys.path.insert(0, {path!r})
+from leader_election import LeaderLease
+lease = LeaderLease(db_file={db!r}, lease_seconds={lease_seconds}, holder_id='child')
+lease.start()
+print('leader' if lease.is_leader() else 'standby', flush=True)
+time.sleep(60)
+"""
+
+
+def test_single_leader():
+    """Only one of several contenders holds the lease, and it keeps it by renewing"""
+    print("🧪 Testing single leader...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'leader.db')
+        leases = [LeaderLease(db_file=db, lease_seconds=5, holder_id=f"p{i}") for i in range(6)]
+        results = {}
+        threads = [threading.Thread(target=lambda l=lease: results.__setitem__(l.holder_id, l.try_acquire()))
+                   for lease in leases]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        winners = [holder for holder, acquired in results.items() if acquired]
+        assert len(winners) == 1, results
+        leader = next(lease for lease in leases if lease.holder_id == winners[0])
+        assert leader.try_acquire()
+        assert leader.holder()['holder'] == leader.holder_id
+        assert sum(lease.try_acquire() for lease in leases) == 1
+    print("✅ Exactly one leader")
+
+
+def test_takeover_after_release():
+    """A clean exit hands the lease to the next contender straight away"""
+    print("🧪 Testing release...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'leader.db')
+        first = LeaderLease(db_file=db, lease_seconds=30, holder_id="first")
+        second = LeaderLease(db_file=db, lease_seconds=30, holder_id="second")
+        assert first.try_acquire() and not second.try_acquire()
+        first.release()
+        assert not first.is_leader()
+        assert second.try_acquire()
+        assert second.holder()['holder'] == "second"
+    print("✅ Released lease taken over")
+
+
+def test_takeover_after_expiry():
+    """A leader that stops renewing stops acting as leader before anyone else takes over"""
+    print("🧪 Testing expiry...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'leader.db')
+        stalled = LeaderLease(db_file=db, lease_seconds=0.6, holder_id="stalled")
+        standby = LeaderLease(db_file=db, lease_seconds=0.6, holder_id="standby")
+        stalled._thread = threading.current_thread()  # keep is_leader() from starting a heartbeat
+        assert stalled.try_acquire() and stalled.is_leader()
+        assert not standby.try_acquire()
+
+        time.sleep(0.45)
+        assert not stalled.is_leader()
+        assert not standby.try_acquire()
+
+        time.sleep(0.25)
+        assert standby.try_acquire()
+        assert not stalled.try_acquire()
+    print("✅ Expired lease taken over, never two leaders")
+
+
+def test_takeover_when_leader_process_dies():
+    """Killing the leader process hands sending to a standby within about one lease"""
+    print("🧪 Testing leader process crash...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'leader.db')
+        script = HOLD_LEASE_SCRIPT.format(path=os.path.dirname(os.path.abspath(leader_election.__file__)),
+                                          db=db, lease_seconds=1.5)
+        child = subprocess.Popen([sys.executable, '-c', script], stdout=subprocess.PIPE, text=True)
+        try:
+            assert child.stdout.readline().strip() == 'leader'
+            standby = LeaderLease(db_file=db, lease_seconds=1.5, holder_id="standby")
+            standby.start()
+            assert not standby.is_leader()
+            child.kill()
+            child.wait()
+
+            killed_at = time.monotonic()
+            deadline = killed_at + 5
+            while not standby.is_leader() and time.monotonic() < deadline:
+                time.sleep(0.05)
+            assert standby.is_leader()
+            print(f"  ⏱️  Took over {time.monotonic() - killed_at:.2f}s after the leader died")
+            standby.release()
+        finally:
+            if child.poll() is None:
+                child.kill()
+            child.stdout.close()
+    print("✅ Standby took over")
+
+
+def test_scheduler_skips_when_not_leader():
+    """EmailScheduler's dispatch tick does nothing while another process holds the lease"""
+    print("🧪 Testing standby scheduler...")
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        previous_store, previous_lease = reminder_store._store, leader_election._lease
+        # Build the scheduler against a scratch store and lease, never the repo's own databases
+        os.chdir(tmp)
+        reminder_store.set_reminder_store(SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None))
+        leader_election._lease = LeaderLease(db_file=os.path.join(tmp, 'leader.db'), holder_id='test')
+        try:
+            # A fresh import gives a fresh EmailScheduler singleton, with no dispatcher tick of its own
+            with mock.patch.dict(os.environ, {'REMINDER_DISPATCH_MODE': 'per_job'}), mock.patch.dict(sys.modules):
+                sys.modules.pop('scheduler_manager', None)
+                import scheduler_manager
+
+                scheduler = scheduler_manager.get_scheduler()
+                try:
+                    with mock.patch.object(scheduler_manager, 'is_sender_leader', return_value=False), \
+                         mock.patch.object(scheduler, 'dispatch_due_reminders') as dispatch:
+                        assert scheduler._dispatch_tick() == 0
+                        assert scheduler._run_scheduled_reminder("r1") is False
+                        dispatch.assert_not_called()
+                    with mock.patch.object(scheduler_manager, 'is_sender_leader', return_value=True), \
+                         mock.patch.object(scheduler, 'dispatch_due_reminders', return_value=3):
+                        assert scheduler._dispatch_tick() == 3
+                finally:
+                    scheduler.shutdown()
+        finally:
+            os.chdir(cwd)
+            reminder_store.set_reminder_store(previous_store)
+            leader_election._lease = previous_lease
+    print("✅ Standby scheduler sends nothing")
+
+
+if __name__ == "__main__":
+    print("🧪 Leader Election Test Suite")
+    print("=" * 50)
+
+    test_single_leader()
+    test_takeover_after_release()
+    test_takeover_after_expiry()
+    test_takeover_when_leader_process_dies()
+    test_scheduler_skips_when_not_leader()
+
+    print("\n🎉 All leader election tests passed!")
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Test Login State Store
+Tests login counters, lockouts and coalesced last_login writes kept outside the credential files
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from unittest import mock
+
+import bcrypt
+
+# Add current directory to path to import modules
+sys.path.append('.')
+
+import auth
+import login_state
+import password_hashing
+from login_state import LoginStateStore
+from password_hashing import PasswordHasher
+
+
+def test_failures_lock_and_expire():
+    """Failures count up atomically, lock at the limit and restart after the lock expires"""
+    print("🧪 Testing failure counting...")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LoginStateStore(os.path.join(tmp, 'login_state.db'))
+        for attempt in range(1, 5):
+            state = store.record_failure('user', 'a@example.com', max_attempts=5, lock_for=timedelta(minutes=30))
+            assert state['login_attempts'] == attempt and not state['locked']
+        state = store.record_failure('user', 'a@example.com', max_attempts=5, lock_for=timedelta(minutes=30))
+        assert state['locked'] and state['locked_until']
+
+        # Same email in another realm is independent
+        assert store.get('admin', 'a@example.com')['login_attempts'] == 0
+
+        # Once the lock has expired the next failure starts a new count
+        expired = (datetime.now() - timedelta(minutes=1)).isoformat()
+        store._connect().execute("UPDATE login_state SET locked_until = ?", (expired,))
+        state = store.record_failure('user', 'a@example.com', max_attempts=5, lock_for=timedelta(minutes=30))
+        assert state['login_attempts'] == 1 and not state['locked'] and state['locked_until'] is None
+
+        store.reset('user', 'a@example.com')
+        assert store.get('user', 'a@example.com')['login_attempts'] == 0
+    print("✅ Failure counting OK")
+
+
+def test_concurrent_failures_are_not_lost():
+    """Attempts from many threads and store instances all count"""
+    print("🧪 Testing concurrent failures...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, 'login_state.db')
+        stores = [LoginStateStore(db_file) for _ in range(4)]
+
+        def worker(store):
+            for _ in range(10):
+                store.record_failure('user', 'a@example.com', max_attempts=1000, lock_for=timedelta(minutes=1))
+
+        threads = [threading.Thread(target=worker, args=(store,)) for store in stores]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert stores[0].get('user', 'a@example.com')['login_attempts'] == 40
+    print("✅ Concurrent failures counted")
+
+
+def test_last_login_is_coalesced():
+    """Clean logins buffer their timestamp and flush together"""
+    print("🧪 Testing coalesced last_login...")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LoginStateStore(os.path.join(tmp, 'login_state.db'), flush_interval=3600)
+        for n in range(10):
+            store.record_success('user', f"user{n}@example.com")
+
+        rows = store._connect().execute("SELECT COUNT(*) FROM login_state").fetchone()[0]
+        assert rows == 0
+        assert store.get('user', 'user3@example.com')['last_login']
+        assert len(store.overlay('user', {'user3@example.com': {'status': 'active'}})['user3@example.com']) == 4
+
+        assert store.flush() == 10
+        rows = store._connect().execute("SELECT COUNT(*) FROM login_state").fetchone()[0]
+        assert rows == 10
+
+        # A login after failures clears them straight away
+        store.record_failure('user', 'user3@example.com', max_attempts=5, lock_for=timedelta(minutes=1))
+        store.record_success('user', 'user3@example.com')
+        assert LoginStateStore(store.db_file).get('user', 'user3@example.com')['login_attempts'] == 0
+    print("✅ last_login coalesced")
+
+
+def test_logins_leave_credential_file_alone():
+    """authenticate_user keeps login bookkeeping out of user_accounts.json"""
+    print("🧪 Testing authenticate_user with the login state store...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'user_accounts.json')
+        hashed = bcrypt.hashpw(b"User@1234", bcrypt.gensalt(4)).decode()
+        with open(path, 'w') as f:
+            json.dump({'user@example.com': {'email': 'user@example.com', 'password': hashed, 'status': 'active',
+                                            'login_attempts': 2, 'last_login': None, 'locked_until': None}}, f)
+        store = LoginStateStore(os.path.join(tmp, 'login_state.db'))
+
+        with mock.patch.object(auth, 'USER_ACCOUNTS_FILE', path), \
+                mock.patch.object(auth, 'log_admin_activity'), \
+                mock.patch.object(login_state, '_store', store), \
+                mock.patch.object(password_hashing, '_hasher', PasswordHasher(rounds=4, workers=0)):
+            before = os.stat(path).st_mtime_ns
+
+            # Legacy attempts from the JSON record still count towards the lock
+            for _ in range(2):
+                assert not auth.authenticate_user('user@example.com', 'wrong')['success']
+            result = auth.authenticate_user('user@example.com', 'wrong')
+            assert 'locked' in result['message']
+            assert 'locked' in auth.authenticate_user('user@example.com', 'User@1234')['message']
+            assert auth.load_user_accounts()['user@example.com']['login_attempts'] == 5
+
+            store.reset('user', 'user@example.com')
+            result = auth.authenticate_user('user@example.com', 'User@1234')
+            assert result['success'] and result['user']['last_login']
+            assert auth.load_user_accounts()['user@example.com']['login_attempts'] == 0
+            assert os.stat(path).st_mtime_ns == before
+    print("✅ Credential file untouched by logins")
+
+
+if __name__ == "__main__":
+    print("🧪 Login State Test Suite")
+    print("=" * 50)
+
+    test_failures_lock_and_expire()
+    test_concurrent_failures_are_not_lost()
+    test_last_login_is_coalesced()
+    test_logins_leave_credential_file_alone()
+
+    print("\n🎉 All login state tests passed!")
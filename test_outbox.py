@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Test Outbox
+Tests batch enqueue, concurrent draining, per-message completion, crash recovery, retries and dead letters of the send outbox
+"""
+
+import os
+import sys
+import tempfile
+import threading
+from unittest import mock
+
+# Add current directory to path to import modules
+sys.path.append('.')
+
+import outbox
+import reminder_store
+import send_engine
+from reminder_store import (
+    SQLiteReminderStore, ExcelReminderStore, SEND_SENDING, SEND_SENT, SEND_FAILED,
+    OUTBOX_QUEUED, OUTBOX_DELIVERING, OUTBOX_DELIVERED, OUTBOX_DEAD
+)
+
+SENDER = "sender@example.com"
+
+
+def reminder(reminder_id):
+    return {
+        'ID': reminder_id, 'Name': f"Client {reminder_id}", 'Email': f"{reminder_id}@example.com",
+        'Header Name': 'Invoice', 'Due Date': '2025-03-01', 'Due Time': '09:00',
+        'Message': 'Payment is due', 'Status': 'Active'
+    }
+
+
+def use_store(store):
+    """Swap the process-wide store for the duration of a test"""
+    previous = reminder_store._store
+    reminder_store.set_reminder_store(store)
+    return previous
+
+
+def check_enqueue_and_complete(store):
+    for reminder_id in ('r1', 'r2', 'r3'):
+        store.add_reminder(reminder(reminder_id))
+    rows = [store.get_reminder(reminder_id) for reminder_id in ('r1', 'r2', 'r3')]
+
+    ids = store.enqueue_outbox([outbox.render_message(row, SENDER) for row in rows])
+    assert len(ids) == 3
+    assert store.get_reminder('r1')['Send State'] == SEND_SENDING
+    assert store.outbox_counts() == {OUTBOX_QUEUED: 3}
+    # Already claimed and queued: nothing new
+    assert store.enqueue_outbox([outbox.render_message(rows[0], SENDER)]) == []
+
+    messages = store.claim_outbox()
+    assert [m['id'] for m in messages] == ids
+    assert messages[0]['recipient'] == 'r1@example.com' and messages[0]['subject'] == 'Reminder - Invoice'
+    assert store.claim_outbox() == []
+
+    assert store.complete_outbox(ids[0], '2025-03-01 09:00:05')
+    assert not store.complete_outbox(ids[0])
+    assert store.fail_outbox(ids[1], 'SMTP timeout')
+    sent, failed = store.get_reminder('r1'), store.get_reminder('r2')
+    assert sent['Send State'] == SEND_SENT and sent['Last Sent'] == '2025-03-01 09:00:05'
+    assert failed['Send State'] == SEND_FAILED and failed['Send Error'] == 'SMTP timeout'
+    assert store.send_ledger_entries('r1')[0]['state'] == SEND_SENT
+    assert store.send_ledger_entries('r2')[0]['state'] == SEND_FAILED
+    assert store.outbox_counts() == {OUTBOX_DELIVERED: 1, OUTBOX_DEAD: 1, OUTBOX_DELIVERING: 1}
+    assert [letter['id'] for letter in store.dead_letters()] == [ids[1]]
+
+    # A dead letter is re-driven in place with fresh attempts; a delivered message never is
+    assert store.enqueue_outbox([outbox.render_message(rows[1], SENDER)]) == [ids[1]]
+    assert store.enqueue_outbox([outbox.render_message(rows[0], SENDER)]) == []
+    assert store.dead_letters() == []
+    assert store.claim_outbox(ids=[ids[1]])[0]['attempts'] == 1
+
+
+def check_retry_then_dead_letter(store):
+    store.add_reminder(reminder('r1'))
+    [outbox_id] = store.enqueue_outbox([outbox.render_message(store.get_reminder('r1'), SENDER)])
+    failing = mock.Mock(return_value=False)
+
+    with mock.patch.object(outbox, 'MAX_ATTEMPTS', 3), mock.patch.object(outbox, 'RETRY_BASE_SECONDS', 600):
+        assert outbox.drain_outbox(failing, ids=[outbox_id]) == {outbox_id: False}
+        # Back in the queue with a retry time; the reminder stays claimed meanwhile
+        assert store.outbox_counts() == {OUTBOX_QUEUED: 1}
+        assert store.get_reminder('r1')['Send State'] == SEND_SENDING
+        assert not store.begin_send('r1')
+        assert store.enqueue_outbox([outbox.render_message(store.get_reminder('r1'), SENDER)]) == []
+        # Not claimable before its backoff has passed
+        assert outbox.drain_outbox(failing) == {}
+        assert outbox.drain_outbox(failing, backlog_only=True) == {}
+        assert outbox.has_backlog()
+
+        # Let the backoff pass: attempts two and three fail too, then the message is dead-lettered
+        for _ in range(2):
+            with store._outbox() as conn:
+                conn.execute("UPDATE outbox SET next_attempt_at = '2000-01-01 00:00:00' WHERE id = ?", (outbox_id,))
+            assert outbox.drain_outbox(failing, backlog_only=True) == {outbox_id: False}
+
+    assert failing.call_count == 3
+    assert store.outbox_counts() == {OUTBOX_DEAD: 1}
+    [letter] = store.dead_letters()
+    assert letter['id'] == outbox_id and letter['attempts'] == 3 and letter['error'] == 'SMTP send failed'
+    assert store.get_reminder('r1')['Send State'] == SEND_FAILED
+    assert store.send_ledger_entries('r1')[0]['state'] == SEND_FAILED
+    assert not outbox.has_backlog()
+
+
+def test_sqlite_enqueue_and_complete():
+    """Claims, queued messages and per-message outcomes on SQLite"""
+    print("🧪 Testing SQLite outbox")
+    with tempfile.TemporaryDirectory() as tmp:
+        check_enqueue_and_complete(SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None))
+    print("✅ Outbox rows follow the reminder")
+
+
+def test_excel_enqueue_and_complete():
+    """The Excel backend keeps its outbox beside the workbook"""
+    print("🧪 Testing Excel outbox")
+    with tempfile.TemporaryDirectory() as tmp:
+        check_enqueue_and_complete(ExcelReminderStore(os.path.join(tmp, 'reminders.xlsx')))
+    print("✅ Excel backend matches SQLite")
+
+
+def test_sqlite_retry_then_dead_letter():
+    """A failed message is retried after its backoff and dead-lettered once out of attempts"""
+    print("🧪 Testing SQLite retries...")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None)
+        previous = use_store(store)
+        try:
+            check_retry_then_dead_letter(store)
+        finally:
+            reminder_store.set_reminder_store(previous)
+    print("✅ Retried with backoff, then dead-lettered")
+
+
+def test_excel_retry_then_dead_letter():
+    """Retries and dead letters work the same on the Excel backend"""
+    print("🧪 Testing Excel retries...")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ExcelReminderStore(os.path.join(tmp, 'reminders.xlsx'))
+        previous = use_store(store)
+        try:
+            check_retry_then_dead_letter(store)
+        finally:
+            reminder_store.set_reminder_store(previous)
+    print("✅ Excel backend matches SQLite")
+
+
+def test_retry_delay_backoff():
+    """Retry delays double per attempt up to the cap, jittered within the upper half"""
+    print("🧪 Testing backoff...")
+    with mock.patch.object(outbox, 'RETRY_BASE_SECONDS', 30), mock.patch.object(outbox, 'RETRY_MAX_SECONDS', 600):
+        for attempts, ceiling in [(1, 30), (2, 60), (3, 120), (5, 480), (6, 600), (20, 600)]:
+            delays = [outbox.retry_delay(attempts) for _ in range(50)]
+            assert all(ceiling / 2 <= delay <= ceiling for delay in delays), (attempts, delays)
+            assert len(set(delays)) > 1
+    print("✅ Exponential backoff with jitter")
+
+
+def test_redrive_dead_letters():
+    """Dead letters can be re-driven selectively or in bulk and are delivered by the backlog drain"""
+    print("🧪 Testing re-drive...")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None)
+        previous = use_store(store)
+        try:
+            for i in range(4):
+                store.add_reminder(reminder(f"r{i}"))
+            ids = outbox.enqueue_reminders(store.get_due_reminders(reminder_store.from_epoch(2 ** 31)), SENDER)
+            with mock.patch.object(outbox, 'MAX_ATTEMPTS', 1):
+                assert outbox.drain_outbox(lambda message: False) == {outbox_id: False for outbox_id in ids}
+            assert len(store.dead_letters()) == 4
+            # The reminder changed after it failed: the re-driven message picks that up
+            store.update_reminder('r0', {'Email': 'fixed@example.com'})
+            # Deleted reminders have nothing to re-drive
+            store.delete_reminders(['r3'])
+
+            assert outbox.redrive_dead_letters([ids[0]]) == [ids[0]]
+            assert sorted(outbox.redrive_dead_letters()) == ids[1:3]
+            assert [letter['id'] for letter in store.dead_letters()] == [ids[3]]
+
+            delivered = []
+
+            def send(message):
+                delivered.append(message['recipient'])
+                return True
+
+            results = outbox.drain_outbox(send, backlog_only=True)
+            assert results == {outbox_id: True for outbox_id in ids[:3]}
+            assert sorted(delivered) == ['fixed@example.com', 'r1@example.com', 'r2@example.com']
+            assert all(store.get_reminder(f"r{i}")['Send State'] == SEND_SENT for i in range(3))
+        finally:
+            reminder_store.set_reminder_store(previous)
+    print("✅ Dead letters re-driven and delivered")
+
+
+def test_batch_enqueue_skips_claimed():
+    """A batch queues every claimable reminder and skips the ones another sender holds"""
+    print("🧪 Testing batch enqueue...")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None)
+        for i in range(50):
+            store.add_reminder(reminder(f"r{i}"))
+        assert store.begin_send('r7')
+        rows = store.get_due_reminders(reminder_store.from_epoch(2 ** 31))
+        assert len(rows) == 49
+        ids = store.enqueue_outbox([outbox.render_message(row, SENDER) for row in rows]
+                                   + [outbox.render_message(reminder('r7'), SENDER)])
+        assert len(ids) == 49
+        assert store.get_reminder('r7')['Send State'] == SEND_SENDING
+        assert store.send_ledger_entries('r7')[0]['state'] == SEND_SENDING
+    print("✅ Batch queued in one transaction")
+
+
+def test_concurrent_drain_delivers_once():
+    """Several workers draining the same outbox deliver each message exactly once"""
+    print("🧪 Testing concurrent drain...")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None)
+        previous = use_store(store)
+        previous_engine = send_engine.get_send_engine()
+        send_engine.set_send_engine(send_engine.SendEngine(rate_limits={}, default_rate_per_minute=6000, burst=100))
+        try:
+            for i in range(40):
+                store.add_reminder(reminder(f"r{i}"))
+            outbox.enqueue_reminders(store.get_due_reminders(reminder_store.from_epoch(2 ** 31)), SENDER)
+
+            delivered = []
+            lock = threading.Lock()
+
+            def send(message):
+                with lock:
+                    delivered.append(message['recipient'])
+                return message['recipient'] != 'r3@example.com'
+
+            threads = [threading.Thread(target=outbox.drain_outbox, args=(send,), kwargs={'batch_size': 5})
+                       for _ in range(4)]
+            with mock.patch.object(outbox, 'MAX_ATTEMPTS', 1):
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+
+            assert sorted(delivered) == sorted(f"r{i}@example.com" for i in range(40))
+            assert store.outbox_counts() == {OUTBOX_DELIVERED: 39, OUTBOX_DEAD: 1}
+            assert store.get_reminder('r3')['Send State'] == SEND_FAILED
+            assert not outbox.has_backlog()
+        finally:
+            reminder_store.set_reminder_store(previous)
+            send_engine.set_send_engine(previous_engine)
+    print("✅ Every message delivered once")
+
+
+def test_crash_recovery():
+    """A message a crashed worker left delivering is picked up again after the sending timeout"""
+    print("🧪 Testing crash recovery...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'reminders.db')
+        store = SQLiteReminderStore(db, excel_file=None)
+        store.add_reminder(reminder('r1'))
+        [outbox_id] = store.enqueue_outbox([outbox.render_message(store.get_reminder('r1'), SENDER)])
+        assert store.claim_outbox()  # the worker dies here, before recording the outcome
+
+        restarted = SQLiteReminderStore(db, excel_file=None)
+        previous = use_store(restarted)
+        try:
+            assert outbox.has_backlog()
+            assert outbox.drain_outbox(lambda message: True, backlog_only=True) == {}
+            # Nor can the reminder be claimed and queued a second time
+            assert restarted.enqueue_outbox([outbox.render_message(restarted.get_reminder('r1'), SENDER)]) == []
+
+            with mock.patch.object(reminder_store, 'SENDING_TIMEOUT_SECONDS', -1):
+                assert not restarted.begin_send('r1')
+                assert outbox.drain_outbox(lambda message: True, backlog_only=True) == {outbox_id: True}
+            assert restarted.get_reminder('r1')['Send State'] == SEND_SENT
+            assert restarted.outbox_counts() == {OUTBOX_DELIVERED: 1}
+        finally:
+            reminder_store.set_reminder_store(previous)
+    print("✅ Abandoned message delivered once on recovery")
+
+
+def test_drain_ids_in_batches():
+    """A targeted drain larger than one claim delivers every message, binding at most batch_size ids per round"""
+    print("🧪 Testing targeted drain across batches...")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None)
+        previous = use_store(store)
+        previous_engine = send_engine.get_send_engine()
+        send_engine.set_send_engine(send_engine.SendEngine(rate_limits={}, default_rate_per_minute=6000, burst=100))
+        try:
+            for i in range(7):
+                store.add_reminder(reminder(f"r{i}"))
+            ids = outbox.enqueue_reminders(store.get_due_reminders(reminder_store.from_epoch(2 ** 31)), SENDER)
+            with mock.patch.object(reminder_store, 'claim_outbox', wraps=reminder_store.claim_outbox) as claim:
+                assert outbox.drain_outbox(lambda message: True, ids=ids, batch_size=3) == {i: True for i in ids}
+            assert [len(call.kwargs['ids']) for call in claim.call_args_list] == [3, 3, 1]
+            assert store.outbox_counts() == {OUTBOX_DELIVERED: 7}
+
+            # Store calls split long id lists instead of binding them all into one query
+            for i in range(5):
+                store.add_reminder(reminder(f"s{i}"))
+            ids = outbox.enqueue_reminders([store.get_reminder(f"s{i}") for i in range(5)], SENDER)
+            with mock.patch.object(reminder_store, 'MAX_BOUND_IDS', 2):
+                assert [m['id'] for m in store.claim_outbox(ids=ids + [10 ** 6], limit=4)] == ids[:4]
+                assert [m['id'] for m in store.claim_outbox(ids=ids)] == ids[4:]
+                for outbox_id in ids:
+                    store.fail_outbox(outbox_id, 'SMTP timeout')
+                assert sorted(letter['id'] for letter in store.dead_letters(ids=ids)) == ids
+                assert len(store.dead_letters(ids=ids, limit=3)) == 3
+        finally:
+            reminder_store.set_reminder_store(previous)
+            send_engine.set_send_engine(previous_engine)
+    print("✅ Every targeted message delivered")
+
+
+def test_reclaimed_message_not_sent_twice():
+    """A worker throttled past the sending timeout skips the messages another worker reclaimed"""
+    print("🧪 Testing slow batch reclaim...")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None)
+        previous = use_store(store)
+        previous_engine = send_engine.get_send_engine()
+        send_engine.set_send_engine(send_engine.SendEngine(rate_limits={}, default_rate_per_minute=6000, burst=100))
+        try:
+            for i in range(3):
+                store.add_reminder(reminder(f"r{i}"))
+            ids = outbox.enqueue_reminders(store.get_due_reminders(reminder_store.from_epoch(2 ** 31)), SENDER)
+            slow = store.claim_outbox()
+            # The worker waits on its rate limit until its claim has gone stale
+            with store._outbox() as conn:
+                conn.execute("UPDATE outbox SET state_at = '2000-01-01 00:00:00'")
+            for message in slow:
+                message['state_at'] = '2000-01-01 00:00:00'
+
+            assert outbox.drain_outbox(lambda message: True, backlog_only=True) == {i: True for i in ids}
+
+            # Back on the slow worker: every message already went out through the other one
+            send = mock.Mock(return_value=True)
+            with mock.patch.object(reminder_store, 'claim_outbox', side_effect=[slow, []]):
+                assert outbox.drain_outbox(send) == {}
+            send.assert_not_called()
+            assert store.outbox_counts() == {OUTBOX_DELIVERED: 3}
+        finally:
+            reminder_store.set_reminder_store(previous)
+            send_engine.set_send_engine(previous_engine)
+    print("✅ Reclaimed messages sent once")
+
+
+if __name__ == "__main__":
+    print("🧪 Outbox Test Suite")
+    print("=" * 50)
+
+    test_sqlite_enqueue_and_complete()
+    test_excel_enqueue_and_complete()
+    test_sqlite_retry_then_dead_letter()
+    test_excel_retry_then_dead_letter()
+    test_retry_delay_backoff()
+    test_redrive_dead_letters()
+    test_batch_enqueue_skips_claimed()
+    test_concurrent_drain_delivers_once()
+    test_crash_recovery()
+    test_drain_ids_in_batches()
+    test_reclaimed_message_not_sent_twice()
+
+    print("\n🎉 All outbox tests passed!")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test Password Hashing
+Tests the bcrypt worker pool, cost configuration and rehash-on-login
+"""
+
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+
+import bcrypt
+
+# Add current directory to path to import modules
+sys.path.append('.')
+
+import auth
+import login_state
+import password_hashing
+from password_hashing import PasswordHasher, hash_cost
+
+
+def test_inline_hash_and_verify():
+    """Hashes use the configured cost and verify; malformed hashes never match"""
+    print("🧪 Testing inline hashing...")
+    hasher = PasswordHasher(rounds=5, workers=0)
+    hashed = hasher.hash("Secret@123")
+
+    assert hash_cost(hashed) == 5
+    assert hasher.verify("Secret@123", hashed)
+    assert not hasher.verify("wrong", hashed)
+    assert not hasher.verify("Secret@123", "not-a-bcrypt-hash")
+    assert not hasher.needs_rehash(hashed)
+    assert hasher.needs_rehash(bcrypt.hashpw(b"x", bcrypt.gensalt(4)).decode())
+
+    metrics = hasher.get_metrics()
+    assert metrics['verifications'] == 3
+    assert metrics['latency_max'] >= metrics['latency_p50'] > 0
+    print("✅ Inline hashing OK")
+
+
+def test_cost_is_clamped():
+    """Out-of-range cost factors are clamped"""
+    print("🧪 Testing cost bounds...")
+    assert PasswordHasher(rounds=1, workers=0).rounds == password_hashing.MIN_ROUNDS
+    assert PasswordHasher(rounds=31, workers=0).rounds == password_hashing.MAX_ROUNDS
+    print("✅ Cost bounds OK")
+
+
+def test_process_pool_round_trip():
+    """Hashing and verification work through worker processes"""
+    print("🧪 Testing process pool...")
+    hasher = PasswordHasher(rounds=4, workers=2)
+    try:
+        hashed = hasher.hash("Pool@123")
+        assert all(hasher.verify("Pool@123", hashed) for _ in range(4))
+        assert not hasher.verify("nope", hashed)
+        assert hasher.get_metrics()['inline_fallbacks'] == 0
+    finally:
+        hasher.shutdown()
+    print("✅ Process pool OK")
+
+
+def test_pool_failures_fall_back_inline():
+    """A timed-out or broken pool hashes and verifies inline instead of raising"""
+    print("🧪 Testing pool fallbacks...")
+    hasher = PasswordHasher(rounds=4, workers=2)
+    hashed = bcrypt.hashpw(b"Pool@123", bcrypt.gensalt(4)).decode()
+
+    slow_pool = mock.Mock()
+    slow_pool.submit.return_value.result.side_effect = FutureTimeoutError()
+    with mock.patch.object(hasher, '_get_pool', return_value=slow_pool):
+        assert hasher.verify("Pool@123", hashed)
+        assert hash_cost(hasher.hash("Pool@123")) == 4
+    slow_pool.submit.return_value.cancel.assert_called()
+
+    broken_pool = mock.Mock()
+    broken_pool.submit.side_effect = BrokenProcessPool("worker died")
+    hasher._pool = broken_pool
+    with mock.patch.object(hasher, '_get_pool', return_value=broken_pool):
+        assert not hasher.verify("wrong", hashed)
+    assert hasher._pool is None
+    broken_pool.shutdown.assert_called_once_with(wait=False)
+
+    assert hasher.get_metrics()['inline_fallbacks'] == 3
+    print("✅ Pool failures fall back inline")
+
+
+def test_rehash_on_login():
+    """A user whose hash has an outdated cost is upgraded on a successful login"""
+    print("🧪 Testing rehash on login...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'user_accounts.json')
+        old_hash = bcrypt.hashpw(b"User@1234", bcrypt.gensalt(4)).decode()
+        with open(path, 'w') as f:
+            json.dump({'user@example.com': {'email': 'user@example.com', 'password': old_hash, 'status': 'active'}}, f)
+
+        hasher = PasswordHasher(rounds=5, workers=0)
+        with mock.patch.object(auth, 'USER_ACCOUNTS_FILE', path), \
+                mock.patch.object(auth, 'log_admin_activity'), \
+                mock.patch.object(login_state, '_store', login_state.LoginStateStore(os.path.join(tmp, 'state.db'))), \
+                mock.patch.object(password_hashing, '_hasher', hasher):
+            assert not auth.authenticate_user('user@example.com', 'wrong')['success']
+            assert auth.load_user_accounts()['user@example.com']['password'] == old_hash
+
+            assert auth.authenticate_user('user@example.com', 'User@1234')['success']
+            new_hash = auth.load_user_accounts()['user@example.com']['password']
+            assert hash_cost(new_hash) == 5
+            assert auth.authenticate_user('user@example.com', 'User@1234')['success']
+
+        metrics = hasher.get_metrics()
+        assert metrics['rehashes'] == 1 and metrics['failures'] == 1
+    print("✅ Rehash on login OK")
+
+
+if __name__ == "__main__":
+    print("🧪 Password Hashing Test Suite")
+    print("=" * 50)
+
+    test_inline_hash_and_verify()
+    test_cost_is_clamped()
+    test_process_pool_round_trip()
+    test_pool_failures_fall_back_inline()
+    test_rehash_on_login()
+
+    print("\n🎉 All password hashing tests passed!")
@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+"""
+Test Reminder Store
+Tests the SQLite reminder backend, row-level updates and Excel interchange
+"""
+
+import os
+import sys
+import tempfile
+import threading
+from datetime import date, datetime, timezone
+
+import pandas as pd
+
+# Add current directory to path to import reminder_store module
+sys.path.append('.')
+
+from reminder_store import (
+    SQLiteReminderStore, ExcelReminderStore, create_reminder_store,
+    SEND_PENDING, SEND_SENDING, SEND_SENT, SEND_FAILED, next_occurrence, scheduled_at_for, select_due_reminders, to_epoch,
+    normalize_due_date, normalize_due_dates
+)
+
+
+def sample_reminders():
+    """Build a small reminders DataFrame shaped like payment_reminders.xlsx"""
+    return pd.DataFrame([
+        {
+            'ID': 'r1', 'Name': 'John Smith', 'Email': 'john@example.com', 'Header Name': 'Rent',
+            'Due Date': date(2025, 1, 15), 'Due Time': '09:00', 'Message': 'Rent is due',
+            'Status': 'Active', 'Last Sent': None, 'Created At': None
+        },
+        {
+            'ID': 'r2', 'Name': 'Sarah Johnson', 'Email': 'sarah@example.com', 'Header Name': 'Lease',
+            'Due Date': '2025-02-01', 'Due Time': '10:30:00', 'Message': 'Lease is due',
+            'Status': 'Inactive', 'Last Sent': None, 'Created At': None, 'Agreement Name': 'Office'
+        }
+    ])
+
+
+def test_sqlite_round_trip():
+    """Saved reminders load back with normalized dates, times and extra columns"""
+    print("🧪 Testing SQLite round trip")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None)
+        store.save_reminders(sample_reminders())
+
+        df = store.load_reminders()
+        assert list(df['ID']) == ['r1', 'r2']
+        assert list(df['Due Date']) == ['2025-01-15', '2025-02-01']
+        assert list(df['Due Time']) == ['09:00', '10:30']
+        assert df.loc[df['ID'] == 'r2', 'Agreement Name'].iloc[0] == 'Office'
+        print("  ✅ Round trip preserved all fields")
+
+
+def test_sqlite_row_level_operations():
+    """Single reminders can be added, updated and deleted without a full rewrite"""
+    print("🧪 Testing SQLite row-level operations")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None)
+        store.save_reminders(sample_reminders())
+
+        assert store.update_reminder('r1', {'Last Sent': '2025-01-15 09:00:05'})
+        assert store.get_reminder('r1')['Last Sent'] == '2025-01-15 09:00:05'
+        assert store.get_reminder('r2')['Last Sent'] is None
+        assert not store.update_reminder('missing', {'Status': 'Inactive'})
+
+        new_id = store.add_reminder({'Name': 'Mike', 'Email': 'mike@example.com', 'Due Date': '2025-03-01'})
+        assert store.get_reminder(new_id)['Due Time'] == '09:00'
+        assert list(store.load_reminders()['ID'])[-1] == new_id
+
+        assert store.delete_reminders(['r2', 'missing']) == 1
+        assert store.get_reminder('r2') is None
+        print("  ✅ Add, update and delete touched only the targeted rows")
+
+
+def test_excel_import_and_export():
+    """The SQLite store imports the legacy workbook once and can export back to Excel"""
+    print("🧪 Testing Excel interchange")
+    with tempfile.TemporaryDirectory() as tmp:
+        excel_file = os.path.join(tmp, 'payment_reminders.xlsx')
+        ExcelReminderStore(excel_file).save_reminders(sample_reminders())
+
+        db_file = os.path.join(tmp, 'reminders.db')
+        store = SQLiteReminderStore(db_file, excel_file=excel_file)
+        assert len(store.load_reminders()) == 2
+
+        # Re-opening the database must not import the workbook again
+        store.delete_reminders(['r1'])
+        assert len(SQLiteReminderStore(db_file, excel_file=excel_file).load_reminders()) == 1
+
+        export_file = os.path.join(tmp, 'export.xlsx')
+        assert store.export_excel(export_file) == 1
+        exported = pd.read_excel(export_file, sheet_name='Reminders')
+        assert list(exported['ID']) == ['r2']
+        print("  ✅ Workbook imported once and exported on demand")
+
+
+def test_backend_selection():
+    """Backends are chosen by name"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = create_reminder_store('excel', excel_file=os.path.join(tmp, 'x.xlsx'))
+        assert isinstance(store, ExcelReminderStore)
+        assert store.load_reminders().empty
+        assert store.update_reminder('r1', {'Status': 'Inactive'}) is False
+
+
+def check_send_transitions(store):
+    """pending -> sending -> sent/failed, with failed reminders claimable again"""
+    store.save_reminders(sample_reminders())
+    assert store.get_reminder('r1')['Send State'] == SEND_PENDING
+
+    # Inactive reminders can't be claimed and nothing completes without a claim
+    assert not store.begin_send('r2')
+    assert not store.complete_send('r1')
+
+    assert store.begin_send('r1')
+    assert store.get_reminder('r1')['Send State'] == SEND_SENDING
+    assert not store.begin_send('r1')
+
+    assert store.fail_send('r1', 'SMTP timeout')
+    failed = store.get_reminder('r1')
+    assert failed['Send State'] == SEND_FAILED and failed['Send Error'] == 'SMTP timeout'
+
+    assert store.begin_send('r1')
+    assert store.complete_send('r1', '2025-01-15 09:00:01')
+    sent = store.get_reminder('r1')
+    assert sent['Send State'] == SEND_SENT and sent['Last Sent'] == '2025-01-15 09:00:01'
+    assert not store.begin_send('r1')
+
+    # Moving the due date makes the reminder pending again
+    store.update_reminder('r1', {'Due Date': '2025-02-15'})
+    assert store.get_reminder('r1')['Send State'] == SEND_PENDING
+
+
+def test_sqlite_send_transitions():
+    """Send state transitions on the SQLite backend"""
+    print("🧪 Testing SQLite send state transitions")
+    with tempfile.TemporaryDirectory() as tmp:
+        check_send_transitions(SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None))
+        print("  ✅ Transitions applied atomically")
+
+
+def test_excel_send_transitions():
+    """Send state transitions on the Excel backend"""
+    print("🧪 Testing Excel send state transitions")
+    with tempfile.TemporaryDirectory() as tmp:
+        check_send_transitions(ExcelReminderStore(os.path.join(tmp, 'reminders.xlsx')))
+        print("  ✅ Transitions applied under the workbook lock")
+
+
+def check_send_ledger(store, reopen):
+    """Each scheduled occurrence is sent once, even after its Send State is reset"""
+    store.save_reminders(sample_reminders())
+    occurrence = to_epoch(scheduled_at_for('2025-01-15', '09:00'))
+    assert store.begin_send('r1')
+    assert store.fail_send('r1', 'SMTP timeout')
+    assert store.begin_send('r1')
+    assert store.complete_send('r1', '2025-01-15 09:00:01')
+    assert store.send_ledger_entries('r1') == [
+        {'occurrence_ts': occurrence, 'state': SEND_SENT, 'state_at': '2025-01-15 09:00:01', 'error': None}
+    ]
+
+    # A save from a stale copy puts the reminder back to pending; the ledger still says sent
+    stale = sample_reminders()
+    stale['Send State'] = SEND_PENDING
+    store.save_reminders(stale)
+    assert store.get_reminder('r1')['Send State'] == SEND_PENDING
+    assert not store.begin_send('r1')
+    assert not reopen().begin_send('r1')
+
+    # The next occurrence gets its own entry
+    store.update_reminder('r1', {'Due Date': '2025-02-15'})
+    assert store.begin_send('r1')
+    assert [entry['state'] for entry in store.send_ledger_entries('r1')] == [SEND_SENT, SEND_SENDING]
+
+
+def test_sqlite_send_ledger():
+    """The SQLite ledger is committed with the claim in the reminders database"""
+    print("🧪 Testing SQLite send ledger")
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'reminders.db')
+        check_send_ledger(SQLiteReminderStore(db, excel_file=None),
+                          lambda: SQLiteReminderStore(db, excel_file=None))
+        print("  ✅ Occurrences sent once")
+
+
+def test_excel_send_ledger():
+    """The Excel backend keeps its ledger in a SQLite file beside the workbook"""
+    print("🧪 Testing Excel send ledger")
+    with tempfile.TemporaryDirectory() as tmp:
+        workbook = os.path.join(tmp, 'reminders.xlsx')
+        store = ExcelReminderStore(workbook)
+        check_send_ledger(store, lambda: ExcelReminderStore(workbook))
+        assert os.path.exists(store.ledger_file)
+        print("  ✅ Occurrences sent once")
+
+
+def test_concurrent_claims_send_once():
+    """Only one of many threads racing on the same reminder wins the claim"""
+    print("🧪 Testing concurrent claims")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None)
+        store.save_reminders(sample_reminders())
+
+        results = []
+        barrier = threading.Barrier(8)
+
+        def worker():
+            barrier.wait()
+            results.append(store.begin_send('r1'))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results.count(True) == 1
+        print("  ✅ Exactly one thread claimed the reminder")
+
+
+def test_legacy_database_upgrade():
+    """Databases created before send states existed get the new columns"""
+    import sqlite3
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, 'reminders.db')
+        conn = sqlite3.connect(db_file)
+        conn.execute("""
+            CREATE TABLE reminders (id TEXT PRIMARY KEY, name TEXT, email TEXT, header_name TEXT,
+                due_date TEXT, due_time TEXT, message TEXT, status TEXT, last_sent TEXT,
+                created_at TEXT, extra TEXT, position INTEGER)
+        """)
+        conn.execute("INSERT INTO reminders (id, status, last_sent) VALUES ('old', 'Active', '2025-01-01 09:00:00')")
+        conn.execute("INSERT INTO reminders (id, status, due_date, due_time) VALUES ('new', 'Active', '2025-03-01', '09:00')")
+        conn.commit()
+        conn.close()
+
+        store = SQLiteReminderStore(db_file, excel_file=None)
+        assert store.get_reminder('old')['Send State'] == SEND_SENT
+        assert store.get_reminder('new')['Send State'] == SEND_PENDING
+        # Existing rows are backfilled with their precomputed schedule
+        scheduled = store._connect().execute("SELECT scheduled_ts FROM reminders WHERE id = 'new'").fetchone()[0]
+        assert scheduled == to_epoch(datetime(2025, 3, 1, 9, 0))
+
+
+def scheduled_columns(store, reminder_id):
+    row = store._connect().execute(
+        "SELECT scheduled_ts, next_run_ts FROM reminders WHERE id = ?", (reminder_id,)
+    ).fetchone()
+    return row['scheduled_ts'], row['next_run_ts']
+
+
+def test_scheduled_at_maintained_on_write():
+    """scheduled_ts/next_run_ts are stored as UTC epoch seconds and recomputed when the due fields change"""
+    print("🧪 Testing precomputed schedule columns")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None)
+        store.save_reminders(sample_reminders())
+
+        scheduled, next_run = scheduled_columns(store, 'r1')
+        assert scheduled == to_epoch(datetime(2025, 1, 15, 9, 0))
+        assert isinstance(scheduled, int)
+        assert next_run is None
+
+        store.update_reminder('r1', {'Due Time': '14:15', 'Recurrence': 'monthly'})
+        scheduled, next_run = scheduled_columns(store, 'r1')
+        assert scheduled == to_epoch(datetime(2025, 1, 15, 14, 15))
+        assert next_run == to_epoch(datetime(2025, 2, 15, 14, 15))
+
+        store.add_reminder({'ID': 'r3', 'Name': 'Weekly', 'Email': 'w@example.com', 'Due Date': '2025-01-30',
+                            'Recurrence': 'weekly'})
+        assert scheduled_columns(store, 'r3') == (to_epoch(datetime(2025, 1, 30, 9, 0)), to_epoch(datetime(2025, 2, 6, 9, 0)))
+
+        # Due lookups are integer range queries on scheduled_ts
+        assert [r['ID'] for r in store.get_due_reminders(datetime(2025, 1, 15, 14, 15))] == ['r1']
+        assert store.count_pending(after=datetime(2025, 1, 20)) == 1
+        print("  ✅ Schedule columns kept in sync with Due Date/Time")
+
+
+def test_due_date_normalization():
+    """Bulk saves normalize the Due Date column in one pass, matching the per-row rules"""
+    print("🧪 Testing Due Date normalization")
+    values = ['2025-01-15', ' 2025-01-16 ', '2025-01-17 00:00:00', datetime(2025, 1, 18, 8, 30), date(2025, 1, 19),
+              pd.Timestamp('2025-01-20'), 'Jan 21, 2025', None, 'not a date']
+    expected = ['2025-01-15', '2025-01-16', '2025-01-17', '2025-01-18', '2025-01-19', '2025-01-20', '2025-01-21',
+                None, 'not a date']
+    assert [normalize_due_date(value) for value in values] == expected
+    bulk = normalize_due_dates(pd.Series(values, dtype=object))
+    assert [normalize_due_date(value) for value in bulk] == expected
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None)
+        store.save_reminders(pd.DataFrame([
+            {'ID': reminder_id, 'Name': 'Client', 'Email': 'client@example.com', 'Due Date': due_date, 'Due Time': '09:00'}
+            for reminder_id, due_date in [('a', '2025-01-15'), ('b', 'Jan 16, 2025'), ('c', datetime(2025, 1, 17)), ('d', None)]
+        ]))
+        assert store.get_reminder('b')['Due Date'] == '2025-01-16'
+        assert scheduled_columns(store, 'b')[0] == to_epoch(datetime(2025, 1, 16, 9, 0))
+        assert store.get_reminder('d')['Due Date'] is None and scheduled_columns(store, 'd')[0] is None
+    print("  ✅ Bulk and per-row normalization agree")
+
+
+def test_next_occurrence_rules():
+    """Monthly runs clamp to short months and stay on the same wall-clock time"""
+    jan_31 = scheduled_at_for('2025-01-31', '09:00')
+    assert next_occurrence(jan_31, 'monthly') == scheduled_at_for('2025-02-28', '09:00')
+    assert next_occurrence(scheduled_at_for('2025-12-15', '09:00'), 'Monthly') == scheduled_at_for('2026-01-15', '09:00')
+    assert next_occurrence(scheduled_at_for('2025-03-29', '09:00'), 'daily') == scheduled_at_for('2025-03-30', '09:00')
+    assert next_occurrence(jan_31, None) is None
+    assert scheduled_at_for(None, '09:00') is None
+    assert scheduled_at_for('2025-01-31', None).tzinfo == timezone.utc
+
+
+def test_per_reminder_timezones():
+    """Reminders fire at their own wall-clock time, converted to UTC once at write time"""
+    print("🧪 Testing per-reminder timezones")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None)
+        for reminder_id, tz_name in [('ny', 'America/New_York'), ('india', 'Asia/Kolkata'), ('utc', 'UTC')]:
+            store.add_reminder({'ID': reminder_id, 'Name': reminder_id, 'Email': f"{reminder_id}@example.com",
+                                'Due Date': '2025-07-01', 'Due Time': '09:00', 'Timezone': tz_name})
+
+        # 09:00 in each zone: 03:30 UTC (India), 09:00 UTC, 13:00 UTC (New York, EDT)
+        assert scheduled_columns(store, 'india')[0] == to_epoch(datetime(2025, 7, 1, 3, 30, tzinfo=timezone.utc))
+        assert scheduled_columns(store, 'ny')[0] == to_epoch(datetime(2025, 7, 1, 13, 0, tzinfo=timezone.utc))
+
+        at_ten_utc = datetime(2025, 7, 1, 10, 0, tzinfo=timezone.utc)
+        assert [r['ID'] for r in store.get_due_reminders(at_ten_utc)] == ['india', 'utc']
+
+        # The vectorized DataFrame scan agrees with the SQL range query
+        due = select_due_reminders(store.load_reminders(), until=at_ten_utc)
+        assert list(due['ID']) == ['india', 'utc']
+        assert list(due['Scheduled TS']) == [scheduled_columns(store, 'india')[0], scheduled_columns(store, 'utc')[0]]
+
+        # Changing the timezone moves the stored instant
+        store.update_reminder('ny', {'Timezone': 'Europe/London'})
+        assert scheduled_columns(store, 'ny')[0] == to_epoch(datetime(2025, 7, 1, 8, 0, tzinfo=timezone.utc))
+        print("  ✅ Each reminder scheduled in its own timezone")
+
+
+def test_recurrence_keeps_wall_clock_across_dst():
+    """A 09:00 New York reminder stays at 09:00 local when DST ends"""
+    october = scheduled_at_for('2025-10-15', '09:00', 'America/New_York')
+    november = next_occurrence(october, 'monthly', 'America/New_York')
+    assert october.hour == 13 and november.hour == 14
+    assert november == scheduled_at_for('2025-11-15', '09:00', 'America/New_York')
+
+    # DataFrame conversion matches the write path on both sides of the change
+    df = pd.DataFrame([{'ID': m, 'Due Date': d, 'Due Time': '09:00', 'Timezone': 'America/New_York'}
+                       for m, d in [('oct', '2025-10-15'), ('nov', '2025-11-15'), ('gap', '2025-03-09')]])
+    df.loc[df['ID'] == 'gap', 'Due Time'] = '02:30'
+    due = select_due_reminders(df, pending_only=False).set_index('ID')['Scheduled TS']
+    assert due['oct'] == to_epoch(october) and due['nov'] == to_epoch(november)
+    assert due['gap'] == to_epoch(scheduled_at_for('2025-03-09', '02:30', 'America/New_York'))
+
+
+def check_recurring_advance(store):
+    store.add_reminder({'ID': 'rec', 'Name': 'Rent', 'Email': 'rent@example.com', 'Due Date': '2025-01-15',
+                        'Due Time': '09:00', 'Recurrence': 'monthly'})
+    store.add_reminder({'ID': 'once', 'Name': 'Once', 'Email': 'once@example.com', 'Due Date': '2025-01-15',
+                        'Due Time': '09:00'})
+    for reminder_id in ('rec', 'once'):
+        assert store.begin_send(reminder_id)
+        assert store.complete_send(reminder_id)
+
+    # Nothing to do before the run has happened
+    assert store.advance_recurring(datetime(2025, 1, 15, 8, 0)) == 0
+
+    # Missed months are skipped, one-off reminders are left alone
+    assert store.advance_recurring(datetime(2025, 3, 20, 12, 0)) == 1
+    rec = store.get_reminder('rec')
+    assert (rec['Due Date'], rec['Due Time'], rec['Send State']) == ('2025-04-15', '09:00', SEND_PENDING)
+    assert store.get_reminder('once')['Send State'] == SEND_SENT
+    assert [r['ID'] for r in store.get_due_reminders(datetime(2025, 4, 15, 9, 0))] == ['rec']
+
+
+def test_sqlite_recurring_advance():
+    """Sent recurring reminders roll forward to their stored next run"""
+    print("🧪 Testing SQLite recurring reminders")
+    with tempfile.TemporaryDirectory() as tmp:
+        check_recurring_advance(SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None))
+        print("  ✅ Recurring reminder moved to its next run")
+
+
+def test_excel_recurring_advance():
+    """The Excel backend rolls recurring reminders forward the same way"""
+    print("🧪 Testing Excel recurring reminders")
+    with tempfile.TemporaryDirectory() as tmp:
+        check_recurring_advance(ExcelReminderStore(os.path.join(tmp, 'reminders.xlsx')))
+        print("  ✅ Excel backend matches SQLite")
+
+
+def check_cached_loads(store, external_write):
+    store.save_reminders(sample_reminders())
+    reads = []
+    original = store.load_reminders
+    store.load_reminders = lambda: reads.append(1) or original()
+
+    def cached():
+        """Cached load plus whether it had to read the backend"""
+        before = len(reads)
+        return store.load_reminders_cached(), len(reads) > before
+
+    first, read = cached()
+    assert read
+    first.loc[0, 'Name'] = 'Changed by caller'
+    again, read = cached()
+    assert not read
+    assert again.loc[0, 'Name'] == 'John Smith'
+
+    # Writes through the store invalidate the cache
+    store.update_reminder('r1', {'Name': 'John S.'})
+    df, read = cached()
+    assert read and df.loc[0, 'Name'] == 'John S.'
+    store.delete_reminders(['r2'])
+    df, read = cached()
+    assert read and len(df) == 1
+    assert not cached()[1]
+
+    # So do writes by another process, seen through the file signature
+    external_write()
+    df, read = cached()
+    assert read and df.loc[0, 'Name'] == 'Outside'
+
+
+def test_sqlite_cached_loads():
+    """Cached loads on SQLite are reused until a write"""
+    print("🧪 Testing SQLite reminder cache")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, 'reminders.db')
+        store = SQLiteReminderStore(db_file, excel_file=None)
+
+        def external_write():
+            other = SQLiteReminderStore(db_file, excel_file=None)
+            other.update_reminder('r1', {'Name': 'Outside'})
+
+        check_cached_loads(store, external_write)
+        print("  ✅ SQLite cache invalidated by local and external writes")
+
+
+def test_excel_cached_loads():
+    """Cached loads on Excel skip re-parsing the workbook until it changes"""
+    print("🧪 Testing Excel reminder cache")
+    with tempfile.TemporaryDirectory() as tmp:
+        excel_file = os.path.join(tmp, 'reminders.xlsx')
+        store = ExcelReminderStore(excel_file)
+
+        def external_write():
+            ExcelReminderStore(excel_file).update_reminder('r1', {'Name': 'Outside', 'Message': 'Edited elsewhere'})
+
+        check_cached_loads(store, external_write)
+        print("  ✅ Excel cache invalidated by local and external writes")
+
+
+if __name__ == "__main__":
+    print("🚀 Starting Reminder Store Tests")
+    print("=" * 50)
+
+    test_sqlite_round_trip()
+    test_sqlite_row_level_operations()
+    test_excel_import_and_export()
+    test_backend_selection()
+    test_sqlite_send_transitions()
+    test_excel_send_transitions()
+    test_sqlite_send_ledger()
+    test_excel_send_ledger()
+    test_concurrent_claims_send_once()
+    test_legacy_database_upgrade()
+    test_scheduled_at_maintained_on_write()
+    test_due_date_normalization()
+    test_next_occurrence_rules()
+    test_per_reminder_timezones()
+    test_recurrence_keeps_wall_clock_across_dst()
+    test_sqlite_recurring_advance()
+    test_excel_recurring_advance()
+    test_sqlite_cached_loads()
+    test_excel_cached_loads()
+
+    print("\n✅ All reminder store tests passed!")
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Test Batched Reminder Dispatch
+Tests the due-window query and the single-tick dispatcher in EmailScheduler
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime, time, timedelta
+from unittest import mock
+
+# Add current directory to path to import scheduler modules
+sys.path.append('.')
+
+import pandas as pd
+
+import reminder_store
+from reminder_store import SQLiteReminderStore, ExcelReminderStore, SEND_SENT, SEND_PENDING
+
+
+def reminder(reminder_id, due_date, due_time, status='Active'):
+    return {
+        'ID': reminder_id, 'Name': f"Client {reminder_id}", 'Email': f"{reminder_id}@example.com",
+        'Header Name': 'Invoice', 'Due Date': due_date, 'Due Time': due_time,
+        'Message': 'Payment is due', 'Status': status
+    }
+
+
+def seed(store):
+    for record in [
+        reminder('old', '2025-03-01', '08:00'),
+        reminder('due1', '2025-03-01', '09:00'),
+        reminder('due2', '2025-03-01', '09:02'),
+        reminder('inactive', '2025-03-01', '09:01', status='Inactive'),
+        reminder('future', '2025-03-01', '09:30'),
+        reminder('tomorrow', '2025-03-02', '08:00'),
+    ]:
+        store.add_reminder(record)
+
+
+def check_due_window(store):
+    seed(store)
+    now = datetime(2025, 3, 1, 9, 3)
+    since = datetime(2025, 3, 1, 8, 58)
+
+    assert [r['ID'] for r in store.get_due_reminders(now, since=since)] == ['due1', 'due2']
+    assert [r['ID'] for r in store.get_due_reminders(now)] == ['old', 'due1', 'due2']
+    assert store.count_pending(after=now) == 2
+
+    # Sent reminders drop out of the due set
+    store.begin_send('due1')
+    store.complete_send('due1')
+    assert [r['ID'] for r in store.get_due_reminders(now, since=since)] == ['due2']
+
+
+def test_due_window_sqlite():
+    """Indexed due-window query on SQLite"""
+    print("🧪 Testing SQLite due window")
+    with tempfile.TemporaryDirectory() as tmp:
+        check_due_window(SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None))
+        print("  ✅ Only active, pending reminders inside the window were returned")
+
+
+def test_due_window_excel():
+    """Same results from the DataFrame scan used by the Excel backend"""
+    print("🧪 Testing Excel due window")
+    with tempfile.TemporaryDirectory() as tmp:
+        check_due_window(ExcelReminderStore(os.path.join(tmp, 'reminders.xlsx')))
+        print("  ✅ Excel backend matches SQLite")
+
+
+def test_select_due_reminders_vectorized():
+    """Shared due-set query over a raw DataFrame with mixed cell types"""
+    print("🧪 Testing vectorized due set")
+    df = pd.DataFrame([
+        reminder('string', '2025-03-01', '09:00'),
+        reminder('excel_time', pd.Timestamp('2025-03-01'), time(9, 1)),
+        reminder('seconds', '2025-03-01', '09:02:00'),
+        reminder('no_time', '2025-03-01', None),
+        reminder('inactive', '2025-03-01', '09:01', status='Inactive'),
+        reminder('no_date', None, '09:00'),
+        reminder('later', '2025-03-01', '17:00'),
+    ])
+    df['Last Sent'] = None
+    df.loc[df['ID'] == 'seconds', 'Last Sent'] = '2025-03-01 09:02:10'
+
+    due = reminder_store.select_due_reminders(df, until=datetime(2025, 3, 1, 9, 5), since=datetime(2025, 3, 1, 9, 0))
+    assert list(due['ID']) == ['string', 'no_time', 'excel_time']
+    assert due.iloc[2]['Scheduled At'] == pd.Timestamp('2025-03-01 09:01')
+
+    # Open-ended windows and the unfiltered view
+    assert list(reminder_store.select_due_reminders(df, since=datetime(2025, 3, 1, 9, 30))['ID']) == ['later']
+    everything = reminder_store.select_due_reminders(df, pending_only=False)
+    assert len(everything) == 6 and 'no_date' not in set(everything['ID'])
+
+    # An explicit send state wins over Last Sent
+    df['Send State'] = None
+    df.loc[df['ID'] == 'string', 'Send State'] = SEND_SENT
+    df.loc[df['ID'] == 'seconds', 'Send State'] = SEND_PENDING
+    due = reminder_store.select_due_reminders(df, until=datetime(2025, 3, 1, 9, 5))
+    assert list(due['ID']) == ['no_time', 'excel_time', 'seconds']
+
+    assert reminder_store.select_due_reminders(reminder_store.empty_reminders_frame(), until=datetime.now()).empty
+    print("  ✅ Due set parsed once and filtered in bulk")
+
+
+def test_dispatcher_sends_due_batch():
+    """One dispatcher tick sends every due reminder and marks each sent"""
+    print("🧪 Testing batch dispatcher")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None)
+        seed(store)
+        previous = reminder_store._store
+        # Swap the store in before the scheduler's first tick can touch the real one
+        reminder_store.set_reminder_store(store)
+        try:
+            from scheduler_manager import get_scheduler, DISPATCHER_JOB_ID
+
+            scheduler = get_scheduler()
+            config = {'sender_email': 'sender@example.com', 'app_password': 'secret'}
+            with mock.patch.object(scheduler, 'load_email_config', return_value=config), \
+                 mock.patch.object(scheduler, 'send_email', return_value=True) as send_email:
+                sent = scheduler.dispatch_due_reminders(now=datetime(2025, 3, 1, 9, 3))
+
+                assert sent == 2
+                assert sorted(call.args[0] for call in send_email.call_args_list) == ['due1@example.com', 'due2@example.com']
+                assert store.get_reminder('due1')['Send State'] == SEND_SENT
+                assert store.get_reminder('future')['Send State'] == SEND_PENDING
+
+                # A second tick in the same window finds nothing left to send
+                assert scheduler.dispatch_due_reminders(now=datetime(2025, 3, 1, 9, 3)) == 0
+
+            if scheduler.dispatch_mode == 'batch':
+                assert scheduler.scheduler.get_job(DISPATCHER_JOB_ID) is not None
+            print("  ✅ Due reminders sent once from a single tick")
+        finally:
+            reminder_store.set_reminder_store(previous)
+
+
+def test_pending_schedule_matches_across_backends():
+    """Both backends list the same upcoming (ID, epoch) pairs in due order"""
+    print("🧪 Testing pending schedule")
+    with tempfile.TemporaryDirectory() as tmp:
+        stores = [SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None),
+                  ExcelReminderStore(os.path.join(tmp, 'reminders.xlsx'))]
+        for store in stores:
+            seed(store)
+        after = datetime(2025, 3, 1, 9, 0)
+        schedules = [store.pending_schedule(after=after) for store in stores]
+        assert schedules[0] == schedules[1]
+        assert [reminder_id for reminder_id, _ in schedules[0]] == ['due2', 'future', 'tomorrow']
+        assert schedules[0][0][1] == reminder_store.to_epoch(
+            reminder_store.scheduled_at_for('2025-03-01', '09:02'))
+        print("  ✅ Upcoming schedule identical on SQLite and Excel")
+
+
+def test_per_job_reschedule_is_a_diff():
+    """Per-job startup rescheduling only touches jobs whose reminder changed"""
+    print("🧪 Testing per-job reschedule diff")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None)
+        tomorrow = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
+        for reminder_id in ('a', 'b', 'c'):
+            store.add_reminder(reminder(reminder_id, tomorrow, '10:00'))
+        store.add_reminder(reminder('past', '2025-03-01', '09:00'))
+        store.add_reminder(reminder('off', tomorrow, '10:00', status='Inactive'))
+        previous = reminder_store._store
+        reminder_store.set_reminder_store(store)
+        try:
+            from scheduler_manager import get_scheduler
+
+            scheduler = get_scheduler()
+            with mock.patch.object(scheduler, 'dispatch_mode', 'per_job'), \
+                 mock.patch.object(scheduler, '_rescheduled_signature', None):
+                try:
+                    assert scheduler.reschedule_all_active_reminders() == \
+                        {'added': 3, 'removed': 0, 'rescheduled': 0, 'unchanged': 0}
+                    # A new session with nothing changed does no work at all
+                    assert scheduler.reschedule_all_active_reminders() is None
+
+                    store.update_reminder('b', {'Due Time': '11:30'})
+                    store.delete_reminders(['c'])
+                    assert scheduler.reschedule_all_active_reminders() == \
+                        {'added': 0, 'removed': 1, 'rescheduled': 1, 'unchanged': 1}
+                    run_date = scheduler.scheduler.get_job('reminder_b').trigger.run_date
+                    assert run_date == reminder_store.scheduled_at_for(tomorrow, '11:30')
+                    assert scheduler.get_scheduled_count() == 2
+                finally:
+                    for job in scheduler.scheduler.get_jobs():
+                        if job.id.startswith('reminder_'):
+                            job.remove()
+            print("  ✅ Only changed reminders were rescheduled")
+        finally:
+            reminder_store.set_reminder_store(previous)
+
+
+if __name__ == "__main__":
+    print("🚀 Starting Batched Dispatch Tests")
+    print("=" * 50)
+
+    test_due_window_sqlite()
+    test_due_window_excel()
+    test_select_due_reminders_vectorized()
+    test_dispatcher_sends_due_batch()
+    test_pending_schedule_matches_across_backends()
+    test_per_job_reschedule_is_a_diff()
+
+    print("\n✅ All dispatch tests passed!")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test Send Engine
+Tests concurrent dispatch and per-account token bucket rate limiting
+"""
+
+import sys
+import threading
+import time
+
+# Add current directory to path to import send_engine module
+sys.path.append('.')
+
+from send_engine import SendEngine, TokenBucket
+
+
+def test_token_bucket_limits_rate():
+    """A bucket allows its burst immediately, then refills at the configured rate"""
+    print("🧪 Testing token bucket")
+    bucket = TokenBucket(rate=50, capacity=5)
+    start = time.monotonic()
+    for _ in range(10):
+        assert bucket.acquire()
+    elapsed = time.monotonic() - start
+
+    # 5 burst tokens free, 5 more at 50/s is ~0.1s
+    assert 0.07 <= elapsed < 1.0
+    empty = TokenBucket(rate=0.5, capacity=1)
+    empty.acquire()
+    assert not empty.acquire(timeout=0.05)
+    print(f"  ✅ 10 tokens took {elapsed:.2f}s")
+
+
+def test_slow_sends_run_in_parallel():
+    """A slow SMTP round trip doesn't serialize the batch"""
+    print("🧪 Testing concurrent dispatch")
+    engine = SendEngine(max_workers=8, rate_limits={}, default_rate_per_minute=6000, burst=100)
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def slow_send(item):
+        with lock:
+            active.append(item)
+            peak.append(len(active))
+        time.sleep(0.1)
+        with lock:
+            active.remove(item)
+        return True
+
+    start = time.monotonic()
+    results = engine.send_all(range(16), slow_send, lambda item: "sender@example.com")
+    elapsed = time.monotonic() - start
+
+    assert [r['item'] for r in results] == list(range(16))
+    assert all(r['success'] for r in results)
+    assert max(peak) == 8
+    assert elapsed < 1.0  # sequential would be 1.6s
+    print(f"  ✅ 16 slow sends finished in {elapsed:.2f}s with 8 workers")
+
+
+def test_rate_limit_is_per_account():
+    """A throttled account doesn't hold back other accounts"""
+    print("🧪 Testing per-account limits")
+    engine = SendEngine(max_workers=4, rate_limits={'slow@example.com': 60}, default_rate_per_minute=6000, burst=2)
+    sent_at = {}
+
+    def record(item):
+        sent_at[item] = time.monotonic()
+        return True
+
+    items = [('slow@example.com', i) for i in range(3)] + [('fast@example.com', i) for i in range(3)]
+    start = time.monotonic()
+    engine.send_all(items, record, lambda item: item[0])
+
+    # slow account: burst of 2, third message waits ~1s for a token
+    assert sent_at[('slow@example.com', 2)] - start >= 0.9
+    assert max(sent_at[('fast@example.com', i)] for i in range(3)) - start < 0.5
+    print("  ✅ Only the throttled account waited")
+
+
+def test_failures_are_reported_per_item():
+    """Exceptions and False returns become failed results without stopping the batch"""
+    engine = SendEngine(max_workers=2, rate_limits={}, default_rate_per_minute=6000)
+
+    def flaky(item):
+        if item == 1:
+            raise ConnectionError("SMTP down")
+        return item != 2
+
+    results = engine.send_all([0, 1, 2, 3], flaky, lambda item: "sender@example.com")
+    assert [r['success'] for r in results] == [True, False, False, True]
+    assert results[1]['error'] == "SMTP down"
+    assert engine.send_all([], flaky, lambda item: "sender@example.com") == []
+
+
+if __name__ == "__main__":
+    print("🚀 Starting Send Engine Tests")
+    print("=" * 50)
+
+    test_token_bucket_limits_rate()
+    test_slow_sends_run_in_parallel()
+    test_rate_limit_is_per_account()
+    test_failures_are_reported_per_item()
+
+    print("\n✅ All send engine tests passed!")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Test Send Statistics
+Tests buffered per-sender counters and their periodic flush into email_accounts.json
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime
+from unittest import mock
+
+# Add current directory to path to import modules
+sys.path.append('.')
+
+import auth
+import send_stats
+from send_stats import SendStatsAccumulator
+
+
+def _accounts_file(tmp):
+    path = os.path.join(tmp, 'email_accounts.json')
+    with open(path, 'w') as f:
+        json.dump({
+            "sender@example.com": {"email": "sender@example.com", "total_sent": 7, "last_used": None},
+            "other@example.com": {"email": "other@example.com", "total_sent": 0, "last_used": None},
+        }, f)
+    return path
+
+
+def test_record_send_does_not_touch_file():
+    """Recording a send only updates memory until flush"""
+    print("🧪 Testing hot path...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = _accounts_file(tmp)
+        with mock.patch.object(auth, 'EMAIL_ACCOUNTS_FILE', path):
+            auth._registries.invalidate()
+            stats = SendStatsAccumulator(flush_interval=0)
+            before = os.stat(path).st_mtime_ns
+            for _ in range(3):
+                stats.record_send("sender@example.com")
+            assert os.stat(path).st_mtime_ns == before
+            assert stats.pending() == {"sender@example.com": 3}
+
+            assert stats.flush() == 3
+            account = auth.load_email_accounts()["sender@example.com"]
+            assert account['total_sent'] == 10
+            assert account['last_used']
+            assert account['daily_sent'] == {datetime.now().strftime('%Y-%m-%d'): 3}
+            assert stats.pending() == {}
+            assert stats.flush() == 0
+    print("✅ Sends are buffered and merged on flush")
+
+
+def test_concurrent_sends_and_daily_counters():
+    """Counts from many threads are exact and split per day"""
+    print("🧪 Testing concurrent sends...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = _accounts_file(tmp)
+        with mock.patch.object(auth, 'EMAIL_ACCOUNTS_FILE', path):
+            auth._registries.invalidate()
+            stats = SendStatsAccumulator(flush_interval=0)
+
+            def worker():
+                for _ in range(250):
+                    stats.record_send("other@example.com")
+
+            threads = [threading.Thread(target=worker) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            stats.record_send("other@example.com", datetime(2026, 1, 1, 9, 0))
+            stats.record_send("unknown@example.com")
+            stats.flush()
+            account = auth.load_email_accounts()["other@example.com"]
+            assert account['total_sent'] == 2001
+            assert account['daily_sent']['2026-01-01'] == 1
+            assert account['daily_sent'][datetime.now().strftime('%Y-%m-%d')] == 2000
+            assert "unknown@example.com" not in auth.load_email_accounts()
+    print("✅ Concurrent counts are exact")
+
+
+def test_failed_flush_keeps_counts():
+    """A flush that cannot save keeps the deltas for the next attempt"""
+    print("🧪 Testing failed flush...")
+    saved = {}
+    accounts = {"sender@example.com": {"total_sent": 1}}
+    stats = SendStatsAccumulator(flush_interval=0,
+                                 load_accounts=lambda: json.loads(json.dumps(accounts)),
+                                 save_accounts=lambda data: False)
+    stats.record_send("sender@example.com")
+    assert stats.flush() == 0
+    stats.record_send("sender@example.com")
+    assert stats.pending() == {"sender@example.com": 2}
+
+    stats._save_accounts = lambda data: saved.update(data) or True
+    assert stats.flush() == 2
+    assert saved["sender@example.com"]['total_sent'] == 3
+    print("✅ Counts survive a failed flush")
+
+
+def test_background_flusher():
+    """The flusher thread writes pending counts on its own"""
+    print("🧪 Testing background flush...")
+    flushed = threading.Event()
+    stats = SendStatsAccumulator(flush_interval=0.05,
+                                 load_accounts=lambda: {"sender@example.com": {}},
+                                 save_accounts=lambda data: flushed.set() or True)
+    with mock.patch.object(send_stats, '_stats', stats):
+        send_stats.record_send("sender@example.com")
+        assert flushed.wait(5)
+        assert stats.pending() == {}
+    stats.close()
+    print("✅ Background flush works")
+
+
+if __name__ == "__main__":
+    print("🧪 Send Statistics Test Suite")
+    print("=" * 50)
+
+    test_record_send_does_not_touch_file()
+    test_concurrent_sends_and_daily_counters()
+    test_failed_flush_keeps_counts()
+    test_background_flusher()
+
+    print("\n🎉 All send statistics tests passed!")
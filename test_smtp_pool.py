@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Test SMTP Connection Pool
+Tests connection reuse, recycling, health checks and reconnects without a real SMTP server
+"""
+
+import smtplib
+import sys
+import time
+from email.mime.text import MIMEText
+from unittest import mock
+
+# Add current directory to path to import smtp_pool module
+sys.path.append('.')
+
+import smtp_pool
+from smtp_pool import SMTPConnectionPool
+
+
+class FakeSMTP:
+    """Stand-in for smtplib.SMTP that records what the pool does with it"""
+
+    instances = []
+    fail_next_send = []
+
+    def __init__(self, host, port, timeout=None):
+        self.host = host
+        self.port = port
+        self.logins = 0
+        self.sent = []
+        self.closed = False
+        self.noop_code = 250
+        FakeSMTP.instances.append(self)
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        if password != 'app-password':
+            raise smtplib.SMTPAuthenticationError(535, b'bad credentials')
+        self.logins += 1
+
+    def sendmail(self, sender, recipient, message):
+        if FakeSMTP.fail_next_send:
+            raise FakeSMTP.fail_next_send.pop(0)
+        self.sent.append(recipient)
+
+    def noop(self):
+        return (self.noop_code, b'OK')
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+# Single STARTTLS config so a failed login doesn't fall through to SMTP_SSL
+TLS_ONLY = [{'host': 'smtp.example.com', 'port': 587, 'use_tls': True}]
+
+
+def make_message(recipient):
+    msg = MIMEText("Payment is due")
+    msg['Subject'] = "Reminder"
+    msg['From'] = "sender@example.com"
+    msg['To'] = recipient
+    return msg
+
+
+def send(pool, recipient, password='app-password'):
+    return pool.send_message("sender@example.com", password, recipient, make_message(recipient))
+
+
+def reset_fake():
+    FakeSMTP.instances = []
+    FakeSMTP.fail_next_send = []
+
+
+def test_connection_reused_across_messages():
+    """Many messages to one account share a single login"""
+    print("🧪 Testing connection reuse")
+    reset_fake()
+    with mock.patch.object(smtp_pool.smtplib, 'SMTP', FakeSMTP):
+        pool = SMTPConnectionPool()
+        for i in range(10):
+            assert send(pool, f"user{i}@example.com")
+
+        assert len(FakeSMTP.instances) == 1
+        assert FakeSMTP.instances[0].logins == 1
+        assert len(FakeSMTP.instances[0].sent) == 10
+        assert pool.stats['connections_opened'] == 1
+        print("  ✅ 10 messages sent over 1 connection")
+
+
+def test_connection_recycled_after_max_messages():
+    """Connections are closed after max_messages_per_connection"""
+    print("🧪 Testing connection recycling")
+    reset_fake()
+    with mock.patch.object(smtp_pool.smtplib, 'SMTP', FakeSMTP):
+        pool = SMTPConnectionPool(max_messages_per_connection=3)
+        for i in range(7):
+            send(pool, f"user{i}@example.com")
+
+        assert len(FakeSMTP.instances) == 3
+        assert FakeSMTP.instances[0].closed and FakeSMTP.instances[1].closed
+        assert not FakeSMTP.instances[2].closed
+        print("  ✅ Connections recycled every 3 messages")
+
+
+def test_reconnect_on_dropped_connection():
+    """A dropped session is replaced and the message retried once"""
+    print("🧪 Testing reconnect on failure")
+    reset_fake()
+    with mock.patch.object(smtp_pool.smtplib, 'SMTP', FakeSMTP):
+        pool = SMTPConnectionPool()
+        send(pool, "first@example.com")
+
+        FakeSMTP.fail_next_send = [smtplib.SMTPServerDisconnected("Connection unexpectedly closed")]
+        assert send(pool, "second@example.com")
+
+        assert len(FakeSMTP.instances) == 2
+        assert FakeSMTP.instances[1].sent == ["second@example.com"]
+        assert pool.stats['reconnects'] == 1
+        print("  ✅ Message delivered over a fresh connection")
+
+
+def test_stale_connection_fails_health_check():
+    """Idle connections that fail NOOP are discarded on checkout"""
+    print("🧪 Testing NOOP health check")
+    reset_fake()
+    with mock.patch.object(smtp_pool.smtplib, 'SMTP', FakeSMTP):
+        pool = SMTPConnectionPool(health_check_after=0)
+        send(pool, "first@example.com")
+        FakeSMTP.instances[0].noop_code = 421
+        time.sleep(0.01)
+        send(pool, "second@example.com")
+
+        assert len(FakeSMTP.instances) == 2
+        assert FakeSMTP.instances[0].closed
+        print("  ✅ Unhealthy connection replaced")
+
+
+def test_idle_connections_evicted():
+    """Connections idle past idle_timeout are closed"""
+    reset_fake()
+    with mock.patch.object(smtp_pool.smtplib, 'SMTP', FakeSMTP):
+        pool = SMTPConnectionPool(idle_timeout=0)
+        send(pool, "first@example.com")
+        time.sleep(0.01)
+        pool.evict_idle()
+
+        assert FakeSMTP.instances[0].closed
+        send(pool, "second@example.com")
+        assert len(FakeSMTP.instances) == 2
+
+
+def test_accounts_do_not_share_connections():
+    """Connections are keyed by account credentials"""
+    reset_fake()
+    with mock.patch.object(smtp_pool.smtplib, 'SMTP', FakeSMTP):
+        pool = SMTPConnectionPool(smtp_configs=TLS_ONLY)
+        send(pool, "a@example.com")
+        try:
+            send(pool, "b@example.com", password='wrong-password')
+            assert False, "login with the wrong password should fail"
+        except smtplib.SMTPAuthenticationError:
+            pass
+
+        # The failed login released its slot and the good session is still pooled
+        send(pool, "c@example.com")
+        assert FakeSMTP.instances[0].sent == ["a@example.com", "c@example.com"]
+
+
+if __name__ == "__main__":
+    print("🚀 Starting SMTP Pool Tests")
+    print("=" * 50)
+
+    test_connection_reused_across_messages()
+    test_connection_recycled_after_max_messages()
+    test_reconnect_on_dropped_connection()
+    test_stale_connection_fails_health_check()
+    test_idle_connections_evicted()
+    test_accounts_do_not_share_connections()
+
+    print("\n✅ All SMTP pool tests passed!")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test Standalone Scheduler
+Tests scheduler.py's daily send against the current reminder schema, and the sent reminder log
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime
+from unittest import mock
+
+# Add current directory to path to import modules
+sys.path.append('.')
+
+import reminder_store
+import scheduler
+from reminder_store import SQLiteReminderStore, SEND_SENT
+
+CONFIG = {'sender_email': "sender@example.com", 'app_password': "secret"}
+
+
+def reminder(reminder_id):
+    return {
+        'ID': reminder_id, 'Name': f"Client {reminder_id}", 'Email': f"{reminder_id}@example.com",
+        'Header Name': 'Invoice', 'Due Date': datetime.now().strftime('%Y-%m-%d'), 'Due Time': '00:00',
+        'Message': 'Payment is due', 'Status': 'Active'
+    }
+
+
+def test_check_and_send_reminders():
+    """Reminders due today are sent with the shared subject and logged with their header name"""
+    print("🧪 Testing daily send...")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteReminderStore(os.path.join(tmp, 'reminders.db'), excel_file=None)
+        for reminder_id in ('r1', 'r2'):
+            store.add_reminder(reminder(reminder_id))
+        log_file = os.path.join(tmp, 'sent_reminders.log')
+        previous = reminder_store._store
+        reminder_store.set_reminder_store(store)
+        try:
+            with mock.patch.object(scheduler, 'LOG_FILE', log_file), \
+                 mock.patch.object(scheduler, 'load_email_config', return_value=CONFIG), \
+                 mock.patch.object(scheduler, 'send_email', return_value=True) as send_email:
+                scheduler.check_and_send_reminders()
+
+            assert sorted(call.args[0] for call in send_email.call_args_list) == ['r1@example.com', 'r2@example.com']
+            assert {call.args[1] for call in send_email.call_args_list} == {'Reminder - Invoice'}
+            assert all(store.get_reminder(reminder_id)['Send State'] == SEND_SENT for reminder_id in ('r1', 'r2'))
+
+            with open(log_file) as f:
+                lines = sorted(line.strip().split(',')[1:] for line in f)
+            assert lines == [['Client r1', 'r1@example.com', 'Invoice'], ['Client r2', 'r2@example.com', 'Invoice']]
+        finally:
+            reminder_store.set_reminder_store(previous)
+    print("✅ Due reminders sent and logged")
+
+
+def test_sent_log_without_reminder():
+    """A sent message whose reminder can't be read is still logged, from the outbox message"""
+    print("🧪 Testing sent log fallback...")
+    with tempfile.TemporaryDirectory() as tmp:
+        log_file = os.path.join(tmp, 'sent_reminders.log')
+        message = {'reminder_id': 'gone', 'recipient': 'gone@example.com', 'subject': 'Reminder - Invoice',
+                   'body': 'Payment is due'}
+        with mock.patch.object(scheduler, 'LOG_FILE', log_file), \
+             mock.patch.object(scheduler, 'send_email', return_value=True), \
+             mock.patch.object(reminder_store, 'get_reminder', side_effect=RuntimeError("database is locked")):
+            assert scheduler.deliver_message(message, CONFIG)
+
+        with open(log_file) as f:
+            assert f.read().strip().split(',')[1:] == ['gone@example.com', 'gone@example.com', 'Reminder - Invoice']
+    print("✅ Logged from the outbox message")
+
+
+if __name__ == "__main__":
+    print("🧪 Standalone Scheduler Test Suite")
+    print("=" * 50)
+
+    test_check_and_send_reminders()
+    test_sent_log_without_reminder()
+
+    print("\n🎉 All standalone scheduler tests passed!")